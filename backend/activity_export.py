@@ -0,0 +1,125 @@
+"""
+Streaming serializers for activity event exports.
+
+Each format turns an iterator of event dicts into an iterator of text
+chunks, so an export can be sent with chunked transfer encoding while only
+one chunk of rows is held in memory.
+
+The status line is sent before the first event is read, so an export that
+fails partway cannot turn into an error response. The serializers log the
+failure, end the body with a marker (an {"error": ...} line, or a CSV row
+starting with "#ERROR") and re-raise, which aborts the chunked transfer.
+
+Usage:
+    from activity_export import EXPORT_FORMATS
+
+    fmt = EXPORT_FORMATS["csv"]
+    body = fmt.serialize(db.stream_user_events(user_id))
+"""
+
+import csv
+import io
+import json
+import logging
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple
+
+from json_encoding import dumps
+
+
+logger = logging.getLogger(__name__)
+
+# Rows buffered into each chunk sent to the client
+CHUNK_ROWS = 200
+
+# Spreadsheet apps evaluate cells starting with these as formulas
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+TRUNCATED_MESSAGE = "export truncated: reading events failed"
+
+# CSV columns; the free-form "data" field is written as JSON
+CSV_COLUMNS = [
+    "id",
+    "timestamp",
+    "event_type",
+    "demo_id",
+    "session_id",
+    "page_url",
+    "ip_address",
+    "user_agent",
+    "data",
+]
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str, separators=(",", ":"))
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        # Quote user-controlled text so it is shown, not evaluated
+        return "'" + value
+    return value
+
+
+def ndjson_chunks(events: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """Serialize events as newline-delimited JSON, one event per line."""
+    lines: List[str] = []
+    written = 0
+    try:
+        for event in events:
+            lines.append(dumps(event))
+            written += 1
+            if len(lines) >= CHUNK_ROWS:
+                yield "\n".join(lines) + "\n"
+                lines = []
+    except Exception:
+        logger.exception("Activity export truncated after %d events", written)
+        lines.append(dumps({"error": TRUNCATED_MESSAGE, "events_written": written}))
+        yield "\n".join(lines) + "\n"
+        raise
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def csv_chunks(events: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """Serialize events as CSV with a header row (columns: CSV_COLUMNS)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    rows = 0
+    written = 0
+
+    try:
+        for event in events:
+            writer.writerow([_csv_value(event.get(column)) for column in CSV_COLUMNS])
+            rows += 1
+            written += 1
+
+            if rows >= CHUNK_ROWS:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+                rows = 0
+    except Exception:
+        logger.exception("Activity export truncated after %d events", written)
+        writer.writerow([f"#ERROR: {TRUNCATED_MESSAGE} after {written} events"])
+        yield buffer.getvalue()
+        raise
+
+    # Always flush, so an empty export still has its header
+    yield buffer.getvalue()
+
+
+class ExportFormat(NamedTuple):
+    content_type: str
+    extension: str
+    serialize: Callable[[Iterable[Dict[str, Any]]], Iterator[str]]
+
+
+EXPORT_FORMATS = {
+    "ndjson": ExportFormat("application/x-ndjson", "ndjson", ndjson_chunks),
+    "csv": ExportFormat("text/csv; charset=utf-8", "csv", csv_chunks),
+}
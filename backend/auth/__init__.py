@@ -4,15 +4,37 @@ from .jwt_handler import (
     create_access_token,
     verify_token,
     decode_token,
+    get_jwt_expiration_hours,
+    set_revocation_check,
+    token_cache_stats,
     TokenPayload,
 )
-from .password import hash_password, verify_password
+from .password import (
+    get_pwd_context,
+    hash_password,
+    verify_password,
+    password_hash_stats,
+    PasswordHashBusy,
+)
+
+
+def preload_auth() -> None:
+    """Import PyJWT and build the bcrypt context, both deferred at import time."""
+    import jwt  # noqa: F401
+    get_pwd_context()
+
 
 __all__ = [
     "create_access_token",
     "verify_token", 
     "decode_token",
+    "get_jwt_expiration_hours",
+    "set_revocation_check",
+    "token_cache_stats",
     "TokenPayload",
     "hash_password",
     "verify_password",
+    "password_hash_stats",
+    "PasswordHashBusy",
+    "preload_auth",
 ]
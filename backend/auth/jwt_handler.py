@@ -1,14 +1,37 @@
 """
 JWT Token handling for authentication.
 Uses PyJWT for token creation and validation.
+
+Verified tokens are cached per instance until they expire, so a token
+presented on every request is only verified once.
 """
 
-import jwt
+import hashlib
+import time
+import uuid
 from datetime import datetime, timedelta, timezone
 from dataclasses import dataclass
-from typing import Optional, List
+from functools import lru_cache
+from typing import Callable, Optional, List
+
+from cache import TTLCache
+from secret_manager import add_refresh_listener, get_secret, get_secret_int
+from tracing import traced
+
 
-from secret_manager import get_secret, get_secret_int
+# Verified tokens, keyed by token digest and kept until the token's `exp`
+# (capped at TOKEN_CACHE_MAX_TTL_SECONDS). Payloads are shared between
+# callers and must be treated as read-only.
+TOKEN_CACHE_MAX_ENTRIES = 4096
+TOKEN_CACHE_MAX_TTL_SECONDS = 24 * 3600.0
+_verified_tokens = TTLCache(
+    max_entries=TOKEN_CACHE_MAX_ENTRIES,
+    ttl_seconds=TOKEN_CACHE_MAX_TTL_SECONDS,
+    copy_values=False,
+)
+
+# Server-side revocation check run on every decode (see set_revocation_check)
+_revocation_check: Optional[Callable[["TokenPayload"], bool]] = None
 
 
 @dataclass
@@ -20,6 +43,13 @@ class TokenPayload:
     is_admin: bool
     exp: datetime
     iat: datetime
+    # The user's perm_version when the token was issued; access claims are
+    # only trusted while it is still current
+    perm_version: int = 0
+    # None in tokens issued before quick_access was a claim
+    quick_access: Optional[bool] = None
+    # Token ID, used to revoke a single token; None in older tokens
+    jti: Optional[str] = None
     
     def to_dict(self) -> dict:
         """Convert payload to dictionary for JWT encoding."""
@@ -28,6 +58,9 @@ class TokenPayload:
             "name": self.name,
             "access": self.access,
             "is_admin": self.is_admin,
+            "quick_access": self.quick_access,
+            "perm_version": self.perm_version,
+            "jti": self.jti,
             "exp": self.exp,
             "iat": self.iat,
         }
@@ -42,16 +75,21 @@ class TokenPayload:
             is_admin=data.get("is_admin", False),
             exp=datetime.fromtimestamp(data["exp"], tz=timezone.utc),
             iat=datetime.fromtimestamp(data["iat"], tz=timezone.utc),
+            perm_version=data.get("perm_version", 0),
+            quick_access=data.get("quick_access"),
+            jti=data.get("jti"),
         )
 
 
+@lru_cache(maxsize=1)
 def get_jwt_secret() -> str:
-    """Get JWT secret from GCP Secret Manager."""
+    """Get JWT secret from GCP Secret Manager (resolved once per process)."""
     return get_secret("JWT_SECRET")
 
 
+@lru_cache(maxsize=1)
 def get_jwt_algorithm() -> str:
-    """Get JWT algorithm from GCP Secret Manager."""
+    """Get JWT algorithm from GCP Secret Manager (resolved once per process)."""
     return get_secret("JWT_ALGORITHM", default="HS256")
 
 
@@ -60,12 +98,15 @@ def get_jwt_expiration_hours() -> int:
     return get_secret_int("JWT_EXPIRATION_HOURS", default=2)
 
 
+@traced("jwt.create")
 def create_access_token(
     user_id: str,
     name: str,
     access: List[str],
     is_admin: bool = False,
     expires_delta: Optional[timedelta] = None,
+    quick_access: bool = True,
+    perm_version: int = 0,
 ) -> str:
     """
     Create a new JWT access token.
@@ -76,6 +117,8 @@ def create_access_token(
         access: List of demo IDs the user can access
         is_admin: Whether user has admin privileges
         expires_delta: Optional custom expiration time
+        quick_access: Whether to show the quick access section
+        perm_version: The user's current permission version
         
     Returns:
         Encoded JWT token string
@@ -94,8 +137,13 @@ def create_access_token(
         is_admin=is_admin,
         exp=expire,
         iat=now,
+        perm_version=perm_version,
+        quick_access=quick_access,
+        jti=uuid.uuid4().hex,
     )
     
+    import jwt  # deferred: PyJWT pulls in cryptography at import
+    
     token = jwt.encode(
         payload.to_dict(),
         get_jwt_secret(),
@@ -115,29 +163,55 @@ def verify_token(token: str) -> bool:
     Returns:
         True if token is valid, False otherwise
     """
-    try:
-        jwt.decode(
-            token,
-            get_jwt_secret(),
-            algorithms=[get_jwt_algorithm()],
-        )
-        return True
-    except jwt.ExpiredSignatureError:
-        return False
-    except jwt.InvalidTokenError:
-        return False
+    return decode_token(token) is not None
 
 
+@traced("jwt.decode")
 def decode_token(token: str) -> Optional[TokenPayload]:
     """
     Decode and validate a JWT token.
     
+    Tokens that verified before are served from the per-instance cache
+    until they expire. Revocation is checked on every call, cached or not.
+    
     Args:
         token: JWT token string
         
     Returns:
         TokenPayload if valid, None otherwise
     """
+    key = hashlib.sha256(token.encode("utf-8")).digest()
+    payload = _verified_tokens.get(key)
+    
+    if payload is None:
+        payload = _decode_token_uncached(token)
+        if payload is None:
+            return None
+        remaining = payload.exp.timestamp() - time.time()
+        _verified_tokens.set(key, payload, ttl_seconds=min(remaining, TOKEN_CACHE_MAX_TTL_SECONDS))
+    
+    if _revocation_check is not None and _revocation_check(payload):
+        return None
+    return payload
+
+
+def set_revocation_check(check: Optional[Callable[[TokenPayload], bool]]) -> None:
+    """
+    Install the server-side revocation check used by decode_token.
+    
+    It runs on every decode, so it must answer from memory.
+    
+    Args:
+        check: Returns True if a verified token has been revoked (None disables the check)
+    """
+    global _revocation_check
+    _revocation_check = check
+
+
+def _decode_token_uncached(token: str) -> Optional[TokenPayload]:
+    """Verify a JWT token's signature and expiry, bypassing the cache."""
+    import jwt
+    
     try:
         payload = jwt.decode(
             token,
@@ -149,3 +223,29 @@ def decode_token(token: str) -> Optional[TokenPayload]:
         return None
     except jwt.InvalidTokenError:
         return None
+
+
+def token_cache_stats() -> dict:
+    """Get verified-token cache statistics."""
+    return _verified_tokens.stats()
+
+
+def clear_token_cache() -> None:
+    """
+    Clear verified tokens and the resolved JWT settings.
+    
+    Runs automatically when secret_manager refreshes a rotated JWT secret
+    or algorithm, so tokens are verified against the new values.
+    """
+    _verified_tokens.clear()
+    get_jwt_secret.cache_clear()
+    get_jwt_algorithm.cache_clear()
+
+
+def _on_secret_refreshed(secret_id: str) -> None:
+    """Drop JWT state derived from a rotated secret."""
+    if secret_id in ("JWT_SECRET", "JWT_ALGORITHM"):
+        clear_token_cache()
+
+
+add_refresh_listener(_on_secret_refreshed)
@@ -1,11 +1,126 @@
 """
 Password hashing and verification using bcrypt.
+
+bcrypt calls run on a dedicated thread pool sized to the available cores
+(bcrypt releases the GIL while hashing). Requests beyond the pool plus a
+bounded queue are rejected instead of piling up, so a login burst degrades
+into fast 503s rather than timeouts.
 """
 
-from passlib.context import CryptContext
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable, Dict
+
+from tracing import span
+
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
+
+@lru_cache(maxsize=1)
+def get_pwd_context() -> "CryptContext":
+    """Password hashing context using bcrypt (passlib is imported on first use)."""
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+# Hashing pool limits
+HASH_WORKERS = os.cpu_count() or 1
+HASH_MAX_QUEUED = 4 * HASH_WORKERS
+HASH_TIMEOUT_SECONDS = 10.0
+
+
+class PasswordHashBusy(RuntimeError):
+    """Raised when the hashing pool is saturated or a hash times out."""
+
+
+class _HashPool:
+    """Bounded executor for bcrypt work, with queue and latency metrics."""
+
+    def __init__(self, workers: int, max_queued: int, timeout_seconds: float):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.timeout_seconds = timeout_seconds
+
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._slots = threading.BoundedSemaphore(workers + max_queued)
+        self._lock = threading.Lock()
 
-# Password hashing context using bcrypt
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+        self.in_flight = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.peak_queue_depth = 0
+        self.total_hash_seconds = 0.0
+        self.max_hash_seconds = 0.0
+        self.total_wait_seconds = 0.0
+
+    def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run a bcrypt call on the pool and wait for its result.
+
+        Raises:
+            PasswordHashBusy: If the queue is full or the call times out
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordHashBusy("Password hashing queue is full")
+
+        submitted_at = time.monotonic()
+        with self._lock:
+            self.in_flight += 1
+            self.peak_queue_depth = max(self.peak_queue_depth, self.in_flight - self.running)
+
+        def task():
+            started_at = time.monotonic()
+            with self._lock:
+                self.running += 1
+                self.total_wait_seconds += started_at - submitted_at
+            try:
+                return fn(*args)
+            finally:
+                elapsed = time.monotonic() - started_at
+                with self._lock:
+                    self.running -= 1
+                    self.in_flight -= 1
+                    self.completed += 1
+                    self.total_hash_seconds += elapsed
+                    self.max_hash_seconds = max(self.max_hash_seconds, elapsed)
+                self._slots.release()
+
+        future = self._executor.submit(task)
+        try:
+            return future.result(timeout=self.timeout_seconds)
+        except TimeoutError:
+            with self._lock:
+                self.timed_out += 1
+            raise PasswordHashBusy("Password hashing timed out")
+
+    def stats(self) -> Dict[str, Any]:
+        """Get pool statistics."""
+        with self._lock:
+            completed = self.completed
+            return {
+                "workers": self.workers,
+                "max_queued": self.max_queued,
+                "running": self.running,
+                "queue_depth": self.in_flight - self.running,
+                "peak_queue_depth": self.peak_queue_depth,
+                "completed": completed,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "avg_hash_ms": round(self.total_hash_seconds / completed * 1000, 2) if completed else 0.0,
+                "max_hash_ms": round(self.max_hash_seconds * 1000, 2),
+                "avg_wait_ms": round(self.total_wait_seconds / completed * 1000, 2) if completed else 0.0,
+            }
+
+
+_hash_pool = _HashPool(HASH_WORKERS, HASH_MAX_QUEUED, HASH_TIMEOUT_SECONDS)
 
 
 def hash_password(password: str) -> str:
@@ -17,8 +132,12 @@ def hash_password(password: str) -> str:
         
     Returns:
         Hashed password string
+        
+    Raises:
+        PasswordHashBusy: If the hashing pool is saturated
     """
-    return pwd_context.hash(password)
+    with span("bcrypt.hash"):
+        return _hash_pool.run(get_pwd_context().hash, password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -31,5 +150,14 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         
     Returns:
         True if password matches, False otherwise
+        
+    Raises:
+        PasswordHashBusy: If the hashing pool is saturated
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    with span("bcrypt.verify"):
+        return _hash_pool.run(get_pwd_context().verify, plain_password, hashed_password)
+
+
+def password_hash_stats() -> Dict[str, Any]:
+    """Get hashing pool queue depth and latency statistics."""
+    return _hash_pool.stats()
@@ -0,0 +1,164 @@
+"""
+In-process caching helpers shared by the backend modules.
+
+Cloud Functions instances handle many requests over their lifetime, so
+small per-instance caches avoid repeating the same remote lookups.
+Entries expire after a TTL so changes made by other instances are picked
+up within a bounded delay.
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Thread-safe, size-bounded LRU cache with per-entry expiry.
+
+    Values are deep-copied on the way in and out so callers can mutate
+    what they get back without corrupting the cached copy.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 30.0,
+        copy_values: bool = True,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of entries (least recently used are evicted)
+            ttl_seconds: Default time-to-live for entries; 0 disables caching
+            copy_values: Whether to deep-copy values on set and get
+            clock: Monotonic time source (overridable for testing)
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._copy_values = copy_values
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        """Whether the cache stores anything at all."""
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    def _copy(self, value: Any) -> Any:
+        return copy.deepcopy(value) if self._copy_values else value
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get a cached value.
+
+        Args:
+            key: Cache key
+            default: Value returned on a miss or expired entry
+
+        Returns:
+            Cached value or default
+        """
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return self._copy(value)
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        """
+        Store a value.
+
+        Args:
+            key: Cache key
+            value: Value to cache
+            ttl_seconds: Optional TTL overriding the cache default
+        """
+        if not self.enabled:
+            return
+
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        if ttl <= 0:
+            return
+
+        value = self._copy(value)
+        with self._lock:
+            self._entries[key] = (value, self._clock() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def update(self, key: Hashable, fields: Dict[str, Any]) -> bool:
+        """
+        Apply field updates to a cached dict value, keeping its expiry.
+
+        Used for write-through when a mutation only touches a few fields.
+
+        Args:
+            key: Cache key
+            fields: Fields to set on the cached dict
+
+        Returns:
+            True if a live entry was updated, False if nothing was cached
+        """
+        fields = self._copy(fields)
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                return False
+
+            value, expires_at = entry
+            if expires_at <= self._clock() or not isinstance(value, dict):
+                del self._entries[key]
+                return False
+
+            value.update(fields)
+            return True
+
+    def invalidate(self, key: Hashable) -> None:
+        """Remove a single entry."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove all entries (hit/miss counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dictionary with hits, misses, hit_rate, size and limits
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+            }
@@ -1,9 +1,11 @@
 """
 Configuration management for the Automatia Booking API.
-All sensitive values are loaded from GCP Secret Manager.
+All sensitive values are loaded from GCP Secret Manager, when the
+configuration is first used rather than at import.
 """
 
 from dataclasses import dataclass
+from functools import lru_cache
 from typing import List
 
 from secret_manager import get_secret, get_secret_int
@@ -53,5 +55,14 @@ class Config:
             raise ValueError("GCP_PROJECT_ID is required in Secret Manager")
 
 
-# Global config instance
-config = Config.from_secrets()
+@lru_cache(maxsize=1)
+def get_config() -> Config:
+    """Load the configuration on first use (no Secret Manager calls at import)."""
+    return Config.from_secrets()
+
+
+def __getattr__(name: str):
+    # `from config import config` still works, loading on first access
+    if name == "config":
+        return get_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
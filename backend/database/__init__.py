@@ -1,5 +1,30 @@
-"""Database module for Firestore operations."""
+"""
+Database module for Firestore operations.
 
-from .firestore import FirestoreDB, get_db
+The Firestore client library takes most of the backend's import time, so
+`.firestore` is imported when the database is first used, not when this
+package is imported.
+"""
 
-__all__ = ["FirestoreDB", "get_db"]
+from typing import TYPE_CHECKING, Any
+
+from .errors import StateConflict
+
+if TYPE_CHECKING:
+    from .firestore import FirestoreDB
+
+__all__ = ["FirestoreDB", "StateConflict", "get_db"]
+
+
+def get_db() -> "FirestoreDB":
+    """Get the singleton database instance (see database.firestore.get_db)."""
+    from .firestore import get_db as get_firestore_db
+    return get_firestore_db()
+
+
+def __getattr__(name: str) -> Any:
+    # `from database import FirestoreDB` keeps working without an eager import
+    if name == "FirestoreDB":
+        from .firestore import FirestoreDB
+        return FirestoreDB
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
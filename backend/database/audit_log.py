@@ -0,0 +1,187 @@
+"""
+Buffered audit-log writer.
+
+Audit entries are queued in memory and committed with Firestore batched
+writes, so logging an action does not add a round trip to the request that
+performed it. Buffered entries are flushed by a background thread when the
+buffer fills up or on a timer, after the response has been sent (see
+main.py) and at shutdown.
+"""
+
+import atexit
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from google.cloud import firestore
+
+
+logger = logging.getLogger(__name__)
+
+
+class AuditLogWriter:
+    """Queues audit-log entries and commits them in batches."""
+
+    # Firestore allows at most 500 writes per batch
+    MAX_BATCH_WRITES = 500
+
+    def __init__(
+        self,
+        get_client: Callable[[], firestore.Client],
+        collection: str,
+        flush_size: int = 50,
+        flush_interval_seconds: float = 2.0,
+        max_buffered: int = 5000,
+    ):
+        """
+        Initialize the writer.
+
+        Args:
+            get_client: Callable returning the Firestore client
+            collection: Audit-log collection name
+            flush_size: Number of buffered entries that triggers a flush
+            flush_interval_seconds: Maximum time an entry waits in the buffer
+            max_buffered: Upper bound on buffered entries if commits keep failing
+        """
+        self._get_client = get_client
+        self.collection = collection
+        self.flush_size = flush_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_buffered = max_buffered
+
+        self._buffer: List[Tuple[Any, Dict[str, Any]]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        # Set when the buffer reaches flush_size, so the flusher runs early
+        self._wake = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+        self.written = 0
+        self.dropped = 0
+        self.failed_flushes = 0
+
+        atexit.register(self.close)
+
+    @property
+    def pending(self) -> int:
+        """Number of entries waiting to be committed."""
+        return len(self._buffer)
+
+    def write(self, entry: Dict[str, Any], sync: bool = False) -> str:
+        """
+        Record an audit-log entry.
+
+        The document ID is allocated client-side, so it is known before the
+        entry is committed.
+
+        Args:
+            entry: Audit-log document data
+            sync: Commit immediately instead of buffering (for security-critical actions)
+
+        Returns:
+            Audit-log document ID
+        """
+        doc_ref = self._get_client().collection(self.collection).document()
+
+        if sync:
+            doc_ref.set(entry)
+            self.written += 1
+            return doc_ref.id
+
+        with self._lock:
+            self._buffer.append((doc_ref, entry))
+            if len(self._buffer) >= self.flush_size:
+                self._wake.set()
+            self._ensure_flusher()
+
+        return doc_ref.id
+
+    def flush(self) -> int:
+        """
+        Commit all buffered entries.
+
+        Entries from a failed commit are put back in the buffer and retried
+        on the next flush.
+
+        Returns:
+            Number of entries committed
+        """
+        with self._flush_lock:
+            with self._lock:
+                entries, self._buffer = self._buffer, []
+
+            if not entries:
+                return 0
+
+            committed = 0
+            for start in range(0, len(entries), self.MAX_BATCH_WRITES):
+                chunk = entries[start:start + self.MAX_BATCH_WRITES]
+                batch = self._get_client().batch()
+                for doc_ref, entry in chunk:
+                    batch.set(doc_ref, entry)
+
+                try:
+                    batch.commit()
+                except Exception:
+                    logger.exception("Failed to commit %d audit-log entries", len(entries) - start)
+                    self.failed_flushes += 1
+                    self._requeue(entries[start:])
+                    break
+
+                committed += len(chunk)
+
+            self.written += committed
+            return committed
+
+    def _requeue(self, entries: List[Tuple[Any, Dict[str, Any]]]) -> None:
+        """Put uncommitted entries back at the front of the buffer."""
+        with self._lock:
+            self._buffer = entries + self._buffer
+            overflow = len(self._buffer) - self.max_buffered
+            if overflow > 0:
+                # Drop the oldest entries rather than growing without bound
+                del self._buffer[:overflow]
+                self.dropped += overflow
+                logger.error("Dropped %d audit-log entries after repeated commit failures", overflow)
+
+    def _ensure_flusher(self) -> None:
+        """Start the background flush thread (caller holds the lock)."""
+        if self._flusher is None or not self._flusher.is_alive():
+            self._flusher = threading.Thread(
+                target=self._run_flusher,
+                name="audit-log-flusher",
+                daemon=True,
+            )
+            self._flusher.start()
+
+    def _run_flusher(self) -> None:
+        """Flush the buffer periodically, or once it fills up, until the writer is closed."""
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval_seconds)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            if self._buffer:
+                try:
+                    self.flush()
+                except Exception:
+                    logger.exception("Audit-log flush failed")
+
+    def close(self) -> None:
+        """Stop the background thread and commit any remaining entries."""
+        self._stop.set()
+        self._wake.set()
+        if self._buffer:
+            self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get writer counters."""
+        return {
+            "pending": self.pending,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed_flushes": self.failed_flushes,
+            "flush_size": self.flush_size,
+            "flush_interval_seconds": self.flush_interval_seconds,
+        }
@@ -0,0 +1,5 @@
+"""Exceptions raised by database operations (importable without the Firestore client)."""
+
+
+class StateConflict(ValueError):
+    """Raised when a record is already in the state a mutation would move it to."""
@@ -1,13 +1,32 @@
 """
 Firestore database operations for user management and sessions.
+
+Methods that talk to Firestore are traced as `firestore.<method>` spans.
 """
 
+from google.api_core.exceptions import AlreadyExists, FailedPrecondition, NotFound
 from google.cloud import firestore
 from google.cloud.firestore_v1.base_query import FieldFilter
-from datetime import datetime, timezone
-from typing import Optional, List, Dict, Any
+from google.cloud.firestore_v1.field_path import FieldPath
+from datetime import datetime, timedelta, timezone
+import base64
+import functools
+import hashlib
+import heapq
+import json
+import os
+import random
+import threading
+from typing import Optional, List, Dict, Any, Iterator, Tuple
 
+from cache import TTLCache
 from secret_manager import get_secret
+from tracing import discard_span, traced
+
+from .audit_log import AuditLogWriter
+from .errors import StateConflict
+from .ingest import ActivityIngestQueue, FileSpool
+from .revocations import RevocationList
 
 
 class FirestoreDB:
@@ -18,47 +37,234 @@ class FirestoreDB:
     SESSIONS_COLLECTION = "sessions"
     AUDIT_LOGS_COLLECTION = "audit_logs"
     DEMOS_COLLECTION = "demos"
+    REVOKED_TOKENS_COLLECTION = "revoked_tokens"
+    
+    # User record cache (per instance). Changes made by other instances
+    # become visible after at most USER_CACHE_TTL_SECONDS.
+    USER_CACHE_TTL_SECONDS = 30.0
+    USER_CACHE_MAX_ENTRIES = 1024
+    
+    # Demo catalog cache (per instance). Local demo mutations invalidate it;
+    # changes made by other instances show up within DEMO_CATALOG_TTL_SECONDS.
+    DEMO_CATALOG_TTL_SECONDS = 60.0
+    
+    # Map of user -> (perm_version, is_active), refreshed in bulk by one
+    # projected query over all users at most every PERMISSION_VERSIONS_TTL_SECONDS
+    PERMISSION_VERSIONS_TTL_SECONDS = 30.0
+    
+    # Changing any of these bumps the user's perm_version, so access claims
+    # in tokens issued before the change are no longer trusted
+    PERMISSION_FIELDS = ["access", "is_admin", "quick_access", "is_active"]
+    
+    # Activity summaries sum several counter shards, so they are cached
+    # briefly (per instance). Local activity writes invalidate them.
+    ACTIVITY_SUMMARY_TTL_SECONDS = 5.0
+    ACTIVITY_SUMMARY_MAX_ENTRIES = 1024
+    
+    # Each user's list of monthly event partitions is cached (per instance).
+    # Local writes add new months to it; the current month is always read.
+    EVENT_PARTITIONS_TTL_SECONDS = 60.0
+    EVENT_PARTITIONS_MAX_ENTRIES = 1024
     
-    def __init__(self, project_id: Optional[str] = None):
+    # Whether each user still has events in the unpartitioned collection
+    # (written before partitioning and not migrated yet) is cached (per
+    # instance). Those events are read along with the partitions until
+    # migrate_legacy_events has moved them.
+    LEGACY_EVENTS_TTL_SECONDS = 600.0
+    LEGACY_EVENTS_MAX_ENTRIES = 1024
+    
+    # Users whose activity document this instance has ensured exists, so the
+    # parent document is merged once per user and period, not on every write
+    ACTIVITY_DOC_ENSURED_TTL_SECONDS = 3600.0
+    ACTIVITY_DOC_ENSURED_MAX_ENTRIES = 4096
+    
+    # Buffered audit-log writes are committed once this many entries are
+    # queued, or after at most AUDIT_LOG_FLUSH_INTERVAL_SECONDS.
+    AUDIT_LOG_FLUSH_SIZE = 50
+    AUDIT_LOG_FLUSH_INTERVAL_SECONDS = 2.0
+    
+    # Revocations made on other instances take effect here within
+    # REVOCATION_REFRESH_SECONDS (local ones immediately).
+    REVOCATION_REFRESH_SECONDS = 10.0
+    
+    # Read-check-write attempts when a state change races another writer
+    CONDITIONAL_UPDATE_ATTEMPTS = 3
+    
+    def __init__(
+        self,
+        project_id: Optional[str] = None,
+        user_cache_ttl_seconds: Optional[float] = None,
+        user_cache_max_entries: Optional[int] = None,
+        activity_retention_days: Optional[int] = None,
+    ):
         """
         Initialize Firestore client.
         
         Args:
             project_id: GCP project ID (uses Secret Manager if not provided)
+            user_cache_ttl_seconds: TTL for cached user records (0 disables the cache)
+            user_cache_max_entries: Maximum number of cached user records
+            activity_retention_days: Keep activity events this long (None keeps them forever)
         """
         self.project_id = project_id or get_secret("GCP_PROJECT_ID")
+        self.activity_retention_days = activity_retention_days
         self._client: Optional[firestore.Client] = None
+        self._client_lock = threading.Lock()
+        self._user_cache = TTLCache(
+            max_entries=(
+                self.USER_CACHE_MAX_ENTRIES
+                if user_cache_max_entries is None else user_cache_max_entries
+            ),
+            ttl_seconds=(
+                self.USER_CACHE_TTL_SECONDS
+                if user_cache_ttl_seconds is None else user_cache_ttl_seconds
+            ),
+        )
+        # Keyed by include_inactive; values are shared and must not be mutated
+        self._demo_catalog_cache = TTLCache(
+            max_entries=2,
+            ttl_seconds=self.DEMO_CATALOG_TTL_SECONDS,
+            copy_values=False,
+        )
+        # Single entry holding the whole map; shared, do not mutate
+        self._permission_versions = TTLCache(
+            max_entries=1,
+            ttl_seconds=self.PERMISSION_VERSIONS_TTL_SECONDS,
+            copy_values=False,
+        )
+        self._activity_summary_cache = TTLCache(
+            max_entries=self.ACTIVITY_SUMMARY_MAX_ENTRIES,
+            ttl_seconds=self.ACTIVITY_SUMMARY_TTL_SECONDS,
+        )
+        # Sorted partition ID lists; replaced, never mutated
+        self._event_partitions_cache = TTLCache(
+            max_entries=self.EVENT_PARTITIONS_MAX_ENTRIES,
+            ttl_seconds=self.EVENT_PARTITIONS_TTL_SECONDS,
+            copy_values=False,
+        )
+        self._legacy_events_cache = TTLCache(
+            max_entries=self.LEGACY_EVENTS_MAX_ENTRIES,
+            ttl_seconds=self.LEGACY_EVENTS_TTL_SECONDS,
+            copy_values=False,
+        )
+        self._activity_docs_ensured = TTLCache(
+            max_entries=self.ACTIVITY_DOC_ENSURED_MAX_ENTRIES,
+            ttl_seconds=self.ACTIVITY_DOC_ENSURED_TTL_SECONDS,
+            copy_values=False,
+        )
+        self.audit_log = AuditLogWriter(
+            get_client=lambda: self.client,
+            collection=self.AUDIT_LOGS_COLLECTION,
+            flush_size=self.AUDIT_LOG_FLUSH_SIZE,
+            flush_interval_seconds=self.AUDIT_LOG_FLUSH_INTERVAL_SECONDS,
+        )
+        # Set by enable_activity_spool (ACTIVITY_INGEST=spool)
+        self.activity_queue: Optional[ActivityIngestQueue] = None
+        self.revocations = RevocationList(
+            get_client=lambda: self.client,
+            collection=self.REVOKED_TOKENS_COLLECTION,
+            refresh_interval_seconds=self.REVOCATION_REFRESH_SECONDS,
+        )
     
     @property
     def client(self) -> firestore.Client:
         """Lazy-load Firestore client."""
         if self._client is None:
-            self._client = firestore.Client(project=self.project_id)
+            # The startup warm-up thread may be creating it concurrently
+            with self._client_lock:
+                if self._client is None:
+                    self._client = firestore.Client(project=self.project_id)
         return self._client
     
+    def warm_up(self) -> None:
+        """
+        Open the Firestore channel and load the token revocation list.
+        
+        Runs off the request path at startup, so the first request does not
+        pay for credentials, the gRPC handshake and the first revocation check.
+        """
+        self.revocations.refresh()
+    
     # ============================================
     # User Operations
     # ============================================
     
-    def get_user_by_id(self, user_id: str) -> Optional[Dict[str, Any]]:
+    @traced("firestore.get_user_by_id")
+    def get_user_by_id(self, user_id: str, use_cache: bool = True) -> Optional[Dict[str, Any]]:
         """
         Get a user by their ID.
         
+        Served from the in-process user cache when possible.
+        
         Args:
             user_id: User's unique identifier (e.g., 'admin-automatia')
+            use_cache: Set to False to read Firestore (and refresh the cache)
             
         Returns:
             User document data or None if not found
         """
+        if use_cache:
+            cached = self._user_cache.get(user_id)
+            if cached is not None:
+                discard_span()
+                return cached
+        
         doc_ref = self.client.collection(self.USERS_COLLECTION).document(user_id)
         doc = doc_ref.get()
         
         if doc.exists:
             data = doc.to_dict()
             data["id"] = doc.id
+            self._user_cache.set(user_id, data)
             return data
         return None
     
+    def user_cache_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and size of the user record cache."""
+        return self._user_cache.stats()
+    
+    @traced("firestore.get_permission_versions")
+    def get_permission_versions(self) -> Dict[str, Tuple[int, bool]]:
+        """
+        Get every user's current permission version and active flag.
+        
+        Refreshed in bulk with one query that only returns those two
+        fields, then served from memory for PERMISSION_VERSIONS_TTL_SECONDS.
+        
+        Returns:
+            Dict of user_id -> (perm_version, is_active). Shared; do not mutate.
+        """
+        versions = self._permission_versions.get("users")
+        if versions is not None:
+            discard_span()
+            return versions
+        
+        query = self.client.collection(self.USERS_COLLECTION).select(["perm_version", "is_active"])
+        versions = {}
+        for doc in query.stream():
+            data = doc.to_dict() or {}
+            versions[doc.id] = (data.get("perm_version", 0), data.get("is_active", True))
+        
+        self._permission_versions.set("users", versions)
+        return versions
+    
+    def get_permission_state(self, user_id: str) -> Optional[Tuple[int, bool]]:
+        """
+        Get a user's (perm_version, is_active) from the bulk-refreshed map.
+        
+        Returns:
+            The pair, or None if the user was not in the last refresh
+        """
+        return self.get_permission_versions().get(user_id)
+    
+    def _permission_updates(self, updates: Dict[str, Any]) -> Dict[str, Any]:
+        """Add a perm_version bump to a user update that changes permissions."""
+        if not any(field in updates for field in self.PERMISSION_FIELDS):
+            return updates
+        self._permission_versions.clear()
+        return {**updates, "perm_version": firestore.Increment(1)}
+    
+    @traced("firestore.create_user")
     def create_user(
         self,
         user_id: str,
@@ -94,14 +300,18 @@ class FirestoreDB:
             "updated_at": now,
             "last_login": None,
             "is_active": True,
+            "perm_version": 0,
         }
         
         doc_ref = self.client.collection(self.USERS_COLLECTION).document(user_id)
         doc_ref.set(user_data)
+        self._permission_versions.clear()
         
         user_data["id"] = user_id
+        self._user_cache.set(user_id, user_data)
         return user_data
     
+    @traced("firestore.update_user")
     def update_user(
         self,
         user_id: str,
@@ -110,6 +320,11 @@ class FirestoreDB:
         """
         Update a user's data.
         
+        update() fails with NotFound when the user does not exist. The
+        result is merged into the cached record, or re-read when the user
+        is not cached or the update bumped perm_version (the new version
+        is only known to Firestore).
+        
         Args:
             user_id: User's unique identifier
             updates: Dictionary of fields to update
@@ -118,16 +333,22 @@ class FirestoreDB:
             Updated user data or None if not found
         """
         doc_ref = self.client.collection(self.USERS_COLLECTION).document(user_id)
-        doc = doc_ref.get()
-        
-        if not doc.exists:
-            return None
         
         updates["updated_at"] = datetime.now(timezone.utc)
-        doc_ref.update(updates)
+        permission_updates = self._permission_updates(updates)
+        try:
+            doc_ref.update(permission_updates)
+        except NotFound:
+            self._user_cache.invalidate(user_id)
+            return None
         
-        return self.get_user_by_id(user_id)
+        if permission_updates is updates and self._user_cache.update(user_id, updates):
+            user = self._user_cache.get(user_id)
+            if user is not None:
+                return user
+        return self.get_user_by_id(user_id, use_cache=False)
     
+    @traced("firestore.deactivate_user")
     def deactivate_user(self, user_id: str) -> bool:
         """
         Deactivate a user (soft delete).
@@ -138,20 +359,27 @@ class FirestoreDB:
             
         Returns:
             True if deactivated, False if not found
+            
+        Raises:
+            StateConflict: If the user is already deactivated
         """
         doc_ref = self.client.collection(self.USERS_COLLECTION).document(user_id)
-        doc = doc_ref.get()
         
-        if not doc.exists:
+        now = datetime.now(timezone.utc)
+        updates = {
+            "is_active": False,
+            "deactivated_at": now,
+            "updated_at": now,
+        }
+        if not self._set_active_state(doc_ref, False, self._permission_updates(updates)):
+            self._user_cache.invalidate(user_id)
             return False
         
-        doc_ref.update({
-            "is_active": False,
-            "deactivated_at": datetime.now(timezone.utc),
-            "updated_at": datetime.now(timezone.utc),
-        })
+        # perm_version was bumped, so the cached record is stale
+        self._user_cache.invalidate(user_id)
         return True
     
+    @traced("firestore.reactivate_user")
     def reactivate_user(self, user_id: str) -> bool:
         """
         Reactivate a deactivated user.
@@ -161,20 +389,62 @@ class FirestoreDB:
             
         Returns:
             True if reactivated, False if not found
+            
+        Raises:
+            StateConflict: If the user is already active
         """
         doc_ref = self.client.collection(self.USERS_COLLECTION).document(user_id)
-        doc = doc_ref.get()
         
-        if not doc.exists:
+        now = datetime.now(timezone.utc)
+        updates = {
+            "is_active": True,
+            "reactivated_at": now,
+            "updated_at": now,
+        }
+        if not self._set_active_state(doc_ref, True, self._permission_updates(updates)):
+            self._user_cache.invalidate(user_id)
             return False
         
-        doc_ref.update({
-            "is_active": True,
-            "reactivated_at": datetime.now(timezone.utc),
-            "updated_at": datetime.now(timezone.utc),
-        })
+        # perm_version was bumped, so the cached record is stale
+        self._user_cache.invalidate(user_id)
         return True
     
+    def _set_active_state(self, doc_ref, is_active: bool, updates: Dict[str, Any]) -> bool:
+        """
+        Apply an activation change only if the record is not already in that state.
+        
+        Reads the document, then writes with a last-update-time precondition,
+        so a change made in between fails the write and the check is
+        repeated (up to CONDITIONAL_UPDATE_ATTEMPTS times).
+        
+        Args:
+            doc_ref: User or demo document
+            is_active: Target value of is_active
+            updates: Fields to write, including is_active
+            
+        Returns:
+            True if updated, False if the document does not exist
+            
+        Raises:
+            StateConflict: If is_active already has the target value
+        """
+        for attempt in range(self.CONDITIONAL_UPDATE_ATTEMPTS):
+            doc = doc_ref.get()
+            if not doc.exists:
+                return False
+            if (doc.to_dict() or {}).get("is_active", True) == is_active:
+                raise StateConflict("already active" if is_active else "already deactivated")
+            
+            try:
+                doc_ref.update(updates, option=self.client.write_option(last_update_time=doc.update_time))
+                return True
+            except NotFound:
+                return False
+            except FailedPrecondition:
+                if attempt == self.CONDITIONAL_UPDATE_ATTEMPTS - 1:
+                    raise
+        return False
+    
     def list_users(self, include_inactive: bool = False) -> List[Dict[str, Any]]:
         """
         List all users.
@@ -185,6 +455,29 @@ class FirestoreDB:
         Returns:
             List of user documents
         """
+        return self.list_users_page(include_inactive=include_inactive)[0]
+    
+    @traced("firestore.list_users")
+    def list_users_page(
+        self,
+        include_inactive: bool = False,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        List users one page at a time, ordered by user ID.
+        
+        Args:
+            include_inactive: Whether to include inactive users
+            limit: Maximum number of users to return (None for all)
+            cursor: next_cursor from the previous page
+            
+        Returns:
+            Tuple of (user documents, cursor for the next page or None)
+            
+        Raises:
+            ValueError: If the cursor is invalid
+        """
         collection_ref = self.client.collection(self.USERS_COLLECTION)
         
         if not include_inactive:
@@ -192,27 +485,28 @@ class FirestoreDB:
         else:
             query = collection_ref
         
-        users = []
-        for doc in query.stream():
+        def to_user(doc) -> Dict[str, Any]:
             data = doc.to_dict()
             data["id"] = doc.id
             # Don't expose password hash in list
             data.pop("password_hash", None)
-            users.append(data)
+            return data
         
-        return users
+        return self._paginate("users", query, [], limit, cursor, to_user)
     
+    @traced("firestore.update_last_login")
     def update_last_login(self, user_id: str) -> None:
         """Update user's last login timestamp."""
+        updates = {"last_login": datetime.now(timezone.utc)}
         doc_ref = self.client.collection(self.USERS_COLLECTION).document(user_id)
-        doc_ref.update({
-            "last_login": datetime.now(timezone.utc),
-        })
+        doc_ref.update(updates)
+        self._user_cache.update(user_id, updates)
     
     # ============================================
     # Demo Operations
     # ============================================
     
+    @traced("firestore.get_demo_by_id")
     def get_demo_by_id(self, demo_id: str) -> Optional[Dict[str, Any]]:
         """
         Get a demo by its ID.
@@ -232,6 +526,7 @@ class FirestoreDB:
             return data
         return None
     
+    @traced("firestore.create_demo")
     def create_demo(
         self,
         demo_id: str,
@@ -294,9 +589,12 @@ class FirestoreDB:
         doc_ref = self.client.collection(self.DEMOS_COLLECTION).document(demo_id)
         doc_ref.set(demo_data)
         
+        self.invalidate_demo_catalog()
+        
         demo_data["id"] = demo_id
         return demo_data
     
+    @traced("firestore.update_demo")
     def update_demo(
         self,
         demo_id: str,
@@ -313,16 +611,22 @@ class FirestoreDB:
             Updated demo data or None if not found
         """
         doc_ref = self.client.collection(self.DEMOS_COLLECTION).document(demo_id)
-        doc = doc_ref.get()
         
-        if not doc.exists:
+        updates["updated_at"] = datetime.now(timezone.utc)
+        try:
+            doc_ref.update(updates)
+        except NotFound:
             return None
         
-        updates["updated_at"] = datetime.now(timezone.utc)
-        doc_ref.update(updates)
+        # Merge into the cached copy before the catalog is dropped
+        demo = self._cached_demo(demo_id)
+        self.invalidate_demo_catalog()
         
-        return self.get_demo_by_id(demo_id)
+        if demo is None:
+            return self.get_demo_by_id(demo_id)
+        return {**demo, **updates, "id": demo_id}
     
+    @traced("firestore.delete_demo")
     def delete_demo(self, demo_id: str) -> bool:
         """
         Soft delete a demo (deactivate it).
@@ -333,20 +637,24 @@ class FirestoreDB:
             
         Returns:
             True if deactivated, False if not found
+            
+        Raises:
+            StateConflict: If the demo is already deactivated
         """
         doc_ref = self.client.collection(self.DEMOS_COLLECTION).document(demo_id)
-        doc = doc_ref.get()
         
-        if not doc.exists:
+        now = datetime.now(timezone.utc)
+        if not self._set_active_state(doc_ref, False, {
+            "is_active": False,
+            "deactivated_at": now,
+            "updated_at": now,
+        }):
             return False
         
-        doc_ref.update({
-            "is_active": False,
-            "deactivated_at": datetime.now(timezone.utc),
-            "updated_at": datetime.now(timezone.utc),
-        })
+        self.invalidate_demo_catalog()
         return True
     
+    @traced("firestore.reactivate_demo")
     def reactivate_demo(self, demo_id: str) -> bool:
         """
         Reactivate a deactivated demo.
@@ -356,18 +664,21 @@ class FirestoreDB:
             
         Returns:
             True if reactivated, False if not found
+            
+        Raises:
+            StateConflict: If the demo is already active
         """
         doc_ref = self.client.collection(self.DEMOS_COLLECTION).document(demo_id)
-        doc = doc_ref.get()
         
-        if not doc.exists:
+        now = datetime.now(timezone.utc)
+        if not self._set_active_state(doc_ref, True, {
+            "is_active": True,
+            "reactivated_at": now,
+            "updated_at": now,
+        }):
             return False
         
-        doc_ref.update({
-            "is_active": True,
-            "reactivated_at": datetime.now(timezone.utc),
-            "updated_at": datetime.now(timezone.utc),
-        })
+        self.invalidate_demo_catalog()
         return True
     
     def list_demos(self, include_inactive: bool = False) -> List[Dict[str, Any]]:
@@ -380,6 +691,29 @@ class FirestoreDB:
         Returns:
             List of demo documents
         """
+        return self.list_demos_page(include_inactive=include_inactive)[0]
+    
+    @traced("firestore.list_demos")
+    def list_demos_page(
+        self,
+        include_inactive: bool = False,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        List demos one page at a time, ordered by sort_order, then title.
+        
+        Args:
+            include_inactive: Whether to include inactive demos
+            limit: Maximum number of demos to return (None for all)
+            cursor: next_cursor from the previous page
+            
+        Returns:
+            Tuple of (demo documents, cursor for the next page or None)
+            
+        Raises:
+            ValueError: If the cursor is invalid
+        """
         collection_ref = self.client.collection(self.DEMOS_COLLECTION)
         
         if not include_inactive:
@@ -388,35 +722,86 @@ class FirestoreDB:
             query = collection_ref
         
         # Order by sort_order, then by title
-        query = query.order_by("sort_order").order_by("title")
+        orders = [
+            ("sort_order", firestore.Query.ASCENDING),
+            ("title", firestore.Query.ASCENDING),
+        ]
         
-        demos = []
-        for doc in query.stream():
+        def to_demo(doc) -> Dict[str, Any]:
             data = doc.to_dict()
             data["id"] = doc.id
-            demos.append(data)
+            return data
+        
+        return self._paginate("demos", query, orders, limit, cursor, to_demo)
+    
+    def get_demo_catalog(self, include_inactive: bool = False) -> Dict[str, Any]:
+        """
+        Get the demo list with its ETag, served from the per-instance cache.
         
-        return demos
+        The ETag is a digest of the catalog contents, so every instance
+        derives the same tag for the same catalog.
+        
+        Args:
+            include_inactive: Whether to include inactive demos
+            
+        Returns:
+            Dict with "demos" (as from list_demos) and "etag" (quoted strong ETag).
+            Shared with other callers; do not mutate.
+        """
+        catalog = self._demo_catalog_cache.get(include_inactive)
+        if catalog is not None:
+            return catalog
+        
+        demos = self.list_demos(include_inactive=include_inactive)
+        digest = hashlib.sha256(
+            json.dumps(demos, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+        catalog = {"demos": demos, "etag": f'"{digest[:32]}"'}
+        
+        self._demo_catalog_cache.set(include_inactive, catalog)
+        return catalog
+    
+    def invalidate_demo_catalog(self) -> None:
+        """Drop the cached demo catalog after a demo mutation."""
+        self._demo_catalog_cache.clear()
+    
+    def _cached_demo(self, demo_id: str) -> Optional[Dict[str, Any]]:
+        """Get a copy of a demo from the cached catalog, without reading Firestore."""
+        for include_inactive in (True, False):
+            catalog = self._demo_catalog_cache.get(include_inactive)
+            if catalog is None:
+                continue
+            for demo in catalog["demos"]:
+                if demo.get("id") == demo_id:
+                    return dict(demo)
+        return None
     
     # ============================================
     # Audit Log Operations (System-level)
     # ============================================
     
+    @traced("firestore.log_action")
     def log_action(
         self,
         action: str,
         user_id: Optional[str],
         details: Optional[Dict[str, Any]] = None,
         ip_address: Optional[str] = None,
+        sync: bool = False,
     ) -> str:
         """
         Log a system action for audit purposes.
         
+        Entries are buffered and committed in batches by the audit-log
+        writer. Pass sync=True for security-critical actions that must be
+        persisted before the response goes out.
+        
         Args:
             action: Type of action (e.g., 'login', 'logout', 'access_demo')
             user_id: User who performed the action
             details: Additional details about the action
             ip_address: Client IP address
+            sync: Commit the entry immediately instead of buffering it
             
         Returns:
             Created log document ID
@@ -429,24 +814,122 @@ class FirestoreDB:
             "timestamp": datetime.now(timezone.utc),
         }
         
-        doc_ref = self.client.collection(self.AUDIT_LOGS_COLLECTION).add(log_data)
-        return doc_ref[1].id
+        return self.audit_log.write(log_data, sync=sync)
+    
+    @traced("firestore.flush_audit_log")
+    def flush_audit_log(self) -> int:
+        """
+        Commit buffered audit-log entries.
+        
+        Returns:
+            Number of entries committed
+        """
+        return self.audit_log.flush()
+    
+    # ============================================
+    # Token Revocation
+    # ============================================
+    
+    @traced("firestore.revoke_token")
+    def revoke_token(self, jti: str, user_id: str, expires_at: datetime) -> None:
+        """
+        Revoke a single token (e.g. on logout).
+        
+        Args:
+            jti: Token ID
+            user_id: Token owner
+            expires_at: Token expiry
+        """
+        self.revocations.revoke_token(jti, user_id, expires_at)
+    
+    @traced("firestore.revoke_user_tokens")
+    def revoke_user_tokens(self, user_id: str, max_token_lifetime: timedelta) -> None:
+        """
+        Revoke every token issued to a user so far (e.g. on deactivation).
+        
+        Args:
+            user_id: User's unique identifier
+            max_token_lifetime: Longest validity of a token
+        """
+        self.revocations.revoke_user(user_id, max_token_lifetime)
+    
+    def is_token_revoked(self, jti: Optional[str], user_id: str, issued_at: datetime) -> bool:
+        """
+        Check a token against the in-memory revocation list (no RPC in the common case).
+        
+        Args:
+            jti: Token ID (None for tokens issued without one)
+            user_id: Token owner
+            issued_at: Token iat
+            
+        Returns:
+            True if the token was revoked
+        """
+        return self.revocations.is_revoked(jti, user_id, issued_at)
     
     # ============================================
     # User Activity Tracking (Per-user collections)
     # ============================================
     
     USER_ACTIVITY_COLLECTION = "user_activity"
+    EVENT_PARTITIONS_SUBCOLLECTION = "event_partitions"
     EVENTS_SUBCOLLECTION = "events"
+    DAILY_ROLLUPS_SUBCOLLECTION = "daily"
+    COUNTER_SHARDS_SUBCOLLECTION = "counter_shards"
+    
+    # Activity totals are spread over this many shard documents, so a busy
+    # account's writes stay under Firestore's sustained per-document rate.
+    # Shards are summed on read, so the count can be changed at any time.
+    ACTIVITY_COUNTER_SHARDS = 10
+    ACTIVITY_COUNTERS = ["total_events", "total_sessions", "total_time_seconds"]
+    
+    # Rollup counters kept per (user, day) and per demo within the day
+    ROLLUP_COUNTERS = ["events", "sessions", "time_seconds", "chat_messages", "views", "launches"]
+    
+    # The same counters summed over all users per day, plus the day's active
+    # users. Every event updates them, so each day is spread over this many
+    # shard documents ({date}_{shard}), summed on read.
+    ACTIVITY_DAILY_COLLECTION = "activity_daily"
+    ACTIVITY_DAILY_SHARDS = 10
+    
+    # Session summaries, one document per client session ID, kept up to date
+    # as events are written. A session without a session_end closes after
+    # SESSION_TIMEOUT_SECONDS without events.
+    SESSIONS_SUBCOLLECTION = "sessions"
+    SESSION_COUNTERS = ["events", "page_views", "chat_messages"]
+    SESSION_TIMEOUT_SECONDS = 30 * 60
+    
+    # Session IDs are document IDs, so they are limited to short strings
+    # Firestore accepts as IDs
+    MAX_SESSION_ID_LENGTH = 128
     
     def _get_user_activity_ref(self, user_id: str):
         """Get reference to a user's activity document."""
         return self.client.collection(self.USER_ACTIVITY_COLLECTION).document(user_id)
     
-    def _get_user_events_ref(self, user_id: str):
-        """Get reference to a user's events subcollection."""
+    def _get_user_events_ref(self, user_id: str, partition_id: str):
+        """Get reference to the events subcollection of one of a user's monthly partitions."""
+        return self._get_user_activity_ref(user_id).collection(
+            self.EVENT_PARTITIONS_SUBCOLLECTION
+        ).document(partition_id).collection(self.EVENTS_SUBCOLLECTION)
+    
+    def _get_user_legacy_events_ref(self, user_id: str):
+        """Get reference to a user's unpartitioned events subcollection (before partitioning)."""
         return self._get_user_activity_ref(user_id).collection(self.EVENTS_SUBCOLLECTION)
     
+    def _get_user_rollups_ref(self, user_id: str):
+        """Get reference to a user's daily rollups subcollection."""
+        return self._get_user_activity_ref(user_id).collection(self.DAILY_ROLLUPS_SUBCOLLECTION)
+    
+    def _get_user_sessions_ref(self, user_id: str):
+        """Get reference to a user's session summaries subcollection."""
+        return self._get_user_activity_ref(user_id).collection(self.SESSIONS_SUBCOLLECTION)
+    
+    def _get_user_counter_shards_ref(self, user_id: str):
+        """Get reference to a user's activity counter shards subcollection."""
+        return self._get_user_activity_ref(user_id).collection(self.COUNTER_SHARDS_SUBCOLLECTION)
+    
+    @traced("firestore.initialize_user_activity")
     def initialize_user_activity(self, user_id: str, name: str) -> None:
         """
         Initialize activity tracking for a new user.
@@ -470,8 +953,12 @@ class FirestoreDB:
             "total_time_seconds": 0,
             "demos_visited": [],
             "is_tracking_active": True,
+            # No history to build session summaries from
+            "sessions_built_at": now,
         })
+        self._activity_summary_cache.invalidate(user_id)
     
+    @traced("firestore.log_user_activity")
     def log_user_activity(
         self,
         user_id: str,
@@ -518,24 +1005,29 @@ class FirestoreDB:
         """
         now = datetime.now(timezone.utc)
         
-        event_doc = {
-            "event_type": event_type,
-            "timestamp": now,
-            "session_id": session_id,
-            "page_url": page_url,
-            "demo_id": demo_id,
-            "data": event_data or {},
-            "ip_address": ip_address,
-            "user_agent": user_agent,
-        }
+        event_doc = self._build_event_doc(
+            event_type, now, event_data, page_url, demo_id, session_id, ip_address, user_agent,
+        )
         
-        # Add event to user's events subcollection
-        events_ref = self._get_user_events_ref(user_id)
-        doc_ref = events_ref.add(event_doc)
-        event_id = doc_ref[1].id
+        # The event, its rollup and its counter changes are committed together
+        batch = self.client.batch()
         
-        # Update user's activity metadata
-        user_activity_ref = self._get_user_activity_ref(user_id)
+        # Add event to the month's partition of the user's events
+        partition_id = self._event_partition_id(now)
+        doc_ref = self._get_user_events_ref(user_id, partition_id).document()
+        batch.set(doc_ref, event_doc)
+        event_id = doc_ref.id
+        
+        # Update the day's rollup and the session's summary
+        duration = self._event_duration(event_type, event_data)
+        rollups = {}
+        self._add_to_rollup(rollups, now, event_type, demo_id, duration)
+        self._write_rollups(user_id, rollups, batch=batch)
+        
+        if session_id:
+            sessions = {}
+            self._add_to_session(sessions, session_id, now, event_type, demo_id, duration)
+            self._write_session_updates(user_id, sessions, batch=batch)
         
         # Build update data
         update_data = {
@@ -548,136 +1040,1225 @@ class FirestoreDB:
             update_data["total_sessions"] = firestore.Increment(1)
         
         # Track time spent (from page_exit or session_end events)
-        if event_type in ["page_exit", "session_end"]:
-            duration = (event_data or {}).get("duration_seconds", 0)
-            if duration > 0:
-                update_data["total_time_seconds"] = firestore.Increment(duration)
+        if duration > 0:
+            update_data["total_time_seconds"] = firestore.Increment(duration)
         
         # Track demos visited
         if demo_id and event_type == "page_view":
             update_data["demos_visited"] = firestore.ArrayUnion([demo_id])
         
-        try:
-            user_activity_ref.update(update_data)
-        except Exception:
-            # If user activity doc doesn't exist, create it
-            user = self.get_user_by_id(user_id)
-            if user:
-                self.initialize_user_activity(user_id, user.get("name", user_id))
-                user_activity_ref.update(update_data)
+        self._write_counter_shard(user_id, update_data, batch=batch)
+        self._commit_activity(user_id, batch)
+        self._note_event_partitions(user_id, [partition_id])
         
         return event_id
     
-    def get_user_activity_summary(self, user_id: str) -> Optional[Dict[str, Any]]:
-        """
-        Get a user's activity summary/metadata.
-        
-        Args:
-            user_id: User's unique identifier
-            
-        Returns:
-            User activity metadata or None if not found
-        """
-        doc = self._get_user_activity_ref(user_id).get()
-        if doc.exists:
-            return doc.to_dict()
-        return None
-    
-    def get_user_events(
+    @traced("firestore.log_user_activity_batch")
+    def log_user_activity_batch(
         self,
         user_id: str,
-        limit: int = 100,
-        event_type: Optional[str] = None,
-        demo_id: Optional[str] = None,
-        session_id: Optional[str] = None,
-        start_time: Optional[datetime] = None,
-        end_time: Optional[datetime] = None,
-    ) -> List[Dict[str, Any]]:
+        events: List[Dict[str, Any]],
+        ip_address: Optional[str] = None,
+        user_agent: Optional[str] = None,
+        received_at: Optional[List[datetime]] = None,
+        event_ids: Optional[List[str]] = None,
+        raise_commit_errors: bool = False,
+    ) -> Tuple[List[str], List[Dict[str, Any]]]:
         """
-        Get a user's activity events with optional filtering.
+        Log several activity events for one user in a single batched write.
+        
+        All events, their daily rollup changes and their counter changes
+        (folded into a single counter shard update) are committed with one
+        WriteBatch, instead of several round trips per event.
         
         Args:
             user_id: User's unique identifier
-            limit: Maximum number of events to return
-            event_type: Filter by event type
-            demo_id: Filter by demo ID
-            session_id: Filter by session ID
-            start_time: Filter events after this time
-            end_time: Filter events before this time
+            events: Event dicts with event_type, data, page_url, demo_id and session_id
+            ip_address: Client IP address
+            user_agent: Browser user agent string
+            received_at: Per-event timestamps (for events accepted earlier; default now)
+            event_ids: Per-event document IDs allocated in advance (default auto-IDs)
+            raise_commit_errors: Raise a failed commit instead of reporting it as
+                an error for every event (per-event errors then only mean rejected events)
             
         Returns:
-            List of event documents
+            Tuple of (created event document IDs, per-event errors as {"index", "error"})
         """
-        query = self._get_user_events_ref(user_id)
-        
-        # Apply filters
-        if event_type:
-            query = query.where(filter=FieldFilter("event_type", "==", event_type))
-        if demo_id:
-            query = query.where(filter=FieldFilter("demo_id", "==", demo_id))
-        if session_id:
-            query = query.where(filter=FieldFilter("session_id", "==", session_id))
-        if start_time:
-            query = query.where(filter=FieldFilter("timestamp", ">=", start_time))
-        if end_time:
-            query = query.where(filter=FieldFilter("timestamp", "<=", end_time))
+        batch = self.client.batch()
+        
+        preallocated_ids = event_ids
+        event_ids = []
+        indexes = []
+        errors = []
+        partition_ids = set()
+        
+        total_sessions = 0
+        total_time_seconds = 0
+        demos_visited = []
+        rollups = {}
+        sessions = {}
+        
+        for i, event in enumerate(events):
+            error = self.validate_activity_event(event)
+            if error:
+                errors.append({"index": i, "error": error})
+                continue
+            
+            try:
+                event_type = event["event_type"]
+                event_data = event.get("data", {})
+                demo_id = event.get("demo_id")
+                duration = self._event_duration(event_type, event_data)
+                
+                timestamp = received_at[i] if received_at else datetime.now(timezone.utc)
+                event_doc = self._build_event_doc(
+                    event_type,
+                    timestamp,
+                    event_data,
+                    event.get("page_url"),
+                    demo_id,
+                    event.get("session_id"),
+                    ip_address,
+                    user_agent,
+                )
+                partition_id = self._event_partition_id(timestamp)
+                doc_ref = self._get_user_events_ref(user_id, partition_id).document(
+                    preallocated_ids[i] if preallocated_ids else None
+                )
+                batch.set(doc_ref, event_doc)
+            except Exception as e:
+                errors.append({"index": i, "error": str(e)})
+                continue
+            
+            event_ids.append(doc_ref.id)
+            indexes.append(i)
+            partition_ids.add(partition_id)
+            
+            if event_type == "session_start":
+                total_sessions += 1
+            if duration > 0:
+                total_time_seconds += duration
+            if demo_id and event_type == "page_view" and demo_id not in demos_visited:
+                demos_visited.append(demo_id)
+            self._add_to_rollup(rollups, timestamp, event_type, demo_id, duration)
+            if event.get("session_id"):
+                self._add_to_session(
+                    sessions, event["session_id"], timestamp, event_type, demo_id, duration,
+                )
+        
+        if not event_ids:
+            return event_ids, errors
+        
+        # Rollups, sessions and counters are committed atomically with the events
+        self._write_rollups(user_id, rollups, batch=batch)
+        self._write_session_updates(user_id, sessions, batch=batch)
         
-        # Order by timestamp descending and limit
-        query = query.order_by("timestamp", direction=firestore.Query.DESCENDING).limit(limit)
+        update_data = {
+            "last_activity": datetime.now(timezone.utc),
+            "total_events": firestore.Increment(len(event_ids)),
+        }
+        if total_sessions:
+            update_data["total_sessions"] = firestore.Increment(total_sessions)
+        if total_time_seconds:
+            update_data["total_time_seconds"] = firestore.Increment(total_time_seconds)
+        if demos_visited:
+            update_data["demos_visited"] = firestore.ArrayUnion(demos_visited)
         
-        events = []
-        for doc in query.stream():
-            event = doc.to_dict()
-            event["id"] = doc.id
-            events.append(event)
+        self._write_counter_shard(user_id, update_data, batch=batch)
         
-        return events
+        try:
+            self._commit_activity(user_id, batch)
+        except Exception as e:
+            # Nothing in the batch was written, so every queued event failed
+            if raise_commit_errors:
+                raise
+            errors.extend({"index": i, "error": str(e)} for i in indexes)
+            errors.sort(key=lambda error: error["index"])
+            return [], errors
+        
+        self._note_event_partitions(user_id, partition_ids)
+        return event_ids, errors
     
-    def get_user_sessions(self, user_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+    def enable_activity_spool(self, directory: str, fsync: bool = False) -> ActivityIngestQueue:
         """
-        Get a user's sessions with aggregated data.
+        Accept tracked activity into a local spool drained in the background.
         
         Args:
-            user_id: User's unique identifier
-            limit: Maximum number of sessions to return
+            directory: Spool directory
+            fsync: fsync every append
             
         Returns:
-            List of session summaries
+            The activity queue (also set as activity_queue)
         """
-        # Get session_start events
-        events_ref = self._get_user_events_ref(user_id)
-        query = events_ref.where(
-            filter=FieldFilter("event_type", "==", "session_start")
-        ).order_by("timestamp", direction=firestore.Query.DESCENDING).limit(limit)
-        
-        sessions = []
-        for doc in query.stream():
-            session = doc.to_dict()
-            session["id"] = doc.id
-            sessions.append(session)
-        
-        return sessions
+        self.activity_queue = ActivityIngestQueue(
+            write_batch=functools.partial(self.log_user_activity_batch, raise_commit_errors=True),
+            backend=FileSpool(directory, fsync=fsync),
+            validate_event=self.validate_activity_event,
+        )
+        return self.activity_queue
     
-    def pause_user_activity_tracking(self, user_id: str) -> bool:
+    @classmethod
+    def validate_activity_event(cls, event: Any) -> Optional[str]:
         """
-        Pause activity tracking for a user (when deactivated).
-        Activity data is preserved, just stops new events.
+        Check an activity event before it is accepted.
         
         Args:
-            user_id: User's unique identifier
+            event: Event dict with event_type, data, page_url, demo_id and session_id
             
         Returns:
-            True if updated successfully
+            Why the event cannot be stored, or None if it is valid
         """
-        try:
-            self._get_user_activity_ref(user_id).update({
-                "is_tracking_active": False,
-                "tracking_paused_at": datetime.now(timezone.utc),
-            })
-            return True
-        except Exception:
-            return False
-    
+        if not isinstance(event, dict):
+            return "event must be an object"
+        
+        event_type = event.get("event_type")
+        if not isinstance(event_type, str) or not event_type:
+            return "event_type is required"
+        
+        event_data = event.get("data")
+        if event_data is not None and not isinstance(event_data, dict):
+            return "data must be an object"
+        
+        duration = (event_data or {}).get("duration_seconds")
+        if duration is not None and (
+            isinstance(duration, bool) or not isinstance(duration, (int, float))
+        ):
+            return "data.duration_seconds must be a number"
+        
+        for field in ("page_url", "demo_id"):
+            if event.get(field) is not None and not isinstance(event[field], str):
+                return f"{field} must be a string"
+        
+        session_id = event.get("session_id")
+        if session_id is not None and session_id != "" and not cls._is_valid_session_id(session_id):
+            return (
+                f"session_id must be a string of at most {cls.MAX_SESSION_ID_LENGTH} "
+                "characters, without '/' and not starting with '__'"
+            )
+        
+        return None
+    
+    @classmethod
+    def _is_valid_session_id(cls, session_id: Any) -> bool:
+        """Check that a session ID can be used as a session summary document ID."""
+        return (
+            isinstance(session_id, str)
+            and 0 < len(session_id) <= cls.MAX_SESSION_ID_LENGTH
+            and "/" not in session_id
+            and not session_id.startswith("__")
+            and session_id not in (".", "..")
+        )
+    
+    def _build_event_doc(
+        self,
+        event_type: str,
+        timestamp: datetime,
+        event_data: Optional[Dict[str, Any]],
+        page_url: Optional[str],
+        demo_id: Optional[str],
+        session_id: Optional[str],
+        ip_address: Optional[str],
+        user_agent: Optional[str],
+    ) -> Dict[str, Any]:
+        """
+        Build an event document for a user's events subcollection.
+        
+        With a retention period, the document gets an `expires_at` for a
+        Firestore TTL policy on the events collection group.
+        """
+        event_doc = {
+            "event_type": event_type,
+            "timestamp": timestamp,
+            "session_id": session_id,
+            "page_url": page_url,
+            "demo_id": demo_id,
+            "data": event_data or {},
+            "ip_address": ip_address,
+            "user_agent": user_agent,
+        }
+        if self.activity_retention_days:
+            event_doc["expires_at"] = timestamp + timedelta(days=self.activity_retention_days)
+        return event_doc
+    
+    @staticmethod
+    def _event_partition_id(timestamp: datetime) -> str:
+        """Get the monthly partition (YYYYMM, UTC) an event time falls in."""
+        return timestamp.astimezone(timezone.utc).strftime("%Y%m")
+    
+    def _retention_cutoff(self) -> Optional[datetime]:
+        """Get the time before which events are past retention (None keeps everything)."""
+        if not self.activity_retention_days:
+            return None
+        return datetime.now(timezone.utc) - timedelta(days=self.activity_retention_days)
+    
+    def _retained_since(self, start_time: Optional[datetime]) -> Optional[datetime]:
+        """Get the start of a time range, moved up to the retention cutoff."""
+        cutoff = self._retention_cutoff()
+        if cutoff and (start_time is None or start_time < cutoff):
+            return cutoff
+        return start_time
+    
+    @traced("firestore.list_event_partitions")
+    def _list_event_partitions(self, user_id: str, use_cache: bool = True) -> List[str]:
+        """
+        Get the IDs of a user's event partitions, oldest first.
+        
+        Partition documents are never written (only their events are), so
+        they are listed with list_documents, which includes missing parents.
+        """
+        if use_cache:
+            cached = self._event_partitions_cache.get(user_id)
+            if cached is not None:
+                discard_span()
+                return cached
+        
+        partitions_ref = self._get_user_activity_ref(user_id).collection(
+            self.EVENT_PARTITIONS_SUBCOLLECTION
+        )
+        partition_ids = sorted(ref.id for ref in partitions_ref.list_documents())
+        self._event_partitions_cache.set(user_id, partition_ids)
+        return partition_ids
+    
+    def _note_event_partitions(self, user_id: str, partition_ids) -> None:
+        """Add partitions just written to to the user's cached partition list."""
+        cached = self._event_partitions_cache.get(user_id)
+        if cached is not None and not set(partition_ids) <= set(cached):
+            self._event_partitions_cache.set(user_id, sorted(set(cached) | set(partition_ids)))
+    
+    def _event_partitions(
+        self,
+        user_id: str,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+    ) -> List[str]:
+        """
+        Get the user's event partitions that overlap a time range, oldest first.
+        
+        Partitions entirely past the retention period are left out, even
+        before the purge job deletes them.
+        """
+        partition_ids = set(self._list_event_partitions(user_id))
+        # Another instance may have opened this month's partition since the
+        # list was cached
+        partition_ids.add(self._event_partition_id(datetime.now(timezone.utc)))
+        
+        cutoff = self._retention_cutoff()
+        if cutoff and (start_time is None or start_time < cutoff):
+            start_time = cutoff
+        
+        first = self._event_partition_id(start_time) if start_time else None
+        last = self._event_partition_id(end_time) if end_time else None
+        return sorted(
+            partition_id for partition_id in partition_ids
+            if (first is None or partition_id >= first) and (last is None or partition_id <= last)
+        )
+    
+    @traced("firestore.has_legacy_events")
+    def _has_legacy_events(self, user_id: str) -> bool:
+        """Check whether a user has events not yet migrated into partitions."""
+        cached = self._legacy_events_cache.get(user_id)
+        if cached is not None:
+            discard_span()
+            return cached
+        
+        query = self._get_user_legacy_events_ref(user_id).select([FieldPath.document_id()]).limit(1)
+        has_events = bool(list(query.stream()))
+        self._legacy_events_cache.set(user_id, has_events)
+        return has_events
+    
+    @staticmethod
+    def _event_duration(event_type: str, event_data: Optional[Dict[str, Any]]) -> float:
+        """Get time spent reported by a page_exit or session_end event."""
+        if event_type not in ["page_exit", "session_end"]:
+            return 0
+        duration = event_data.get("duration_seconds", 0) if isinstance(event_data, dict) else 0
+        # Events stored before they were validated may hold anything
+        if isinstance(duration, bool) or not isinstance(duration, (int, float)):
+            return 0
+        return duration if duration > 0 else 0
+    
+    def _write_counter_shard(
+        self,
+        user_id: str,
+        update_data: Dict[str, Any],
+        batch: firestore.WriteBatch,
+    ) -> None:
+        """
+        Add activity counter changes to one randomly chosen counter shard.
+        
+        Shards are merged (created on first write), so the user's activity
+        document itself is not written per event. The first write for a user
+        on this instance also merges the document's base fields, creating it
+        for users whose activity was never initialized (until a batch doing
+        so is committed, see _commit_activity).
+        
+        Args:
+            user_id: User's unique identifier
+            update_data: last_activity, ACTIVITY_COUNTERS increments and demos_visited union
+            batch: Batch to add the write to
+        """
+        shard_id = str(random.randrange(self.ACTIVITY_COUNTER_SHARDS))
+        shard_ref = self._get_user_counter_shards_ref(user_id).document(shard_id)
+        batch.set(shard_ref, update_data, merge=True)
+        
+        if self._activity_docs_ensured.get(user_id) is None:
+            # Only fields an existing document already agrees with, so a
+            # paused user's tracking state is left alone
+            user = self.get_user_by_id(user_id)
+            batch.set(self._get_user_activity_ref(user_id), {
+                "user_id": user_id,
+                "name": (user or {}).get("name", user_id),
+            }, merge=True)
+        self._activity_summary_cache.invalidate(user_id)
+    
+    def _commit_activity(self, user_id: str, batch: firestore.WriteBatch) -> None:
+        """
+        Commit a batch built with _write_counter_shard.
+        
+        The user's activity document is only known to exist once the batch
+        is committed; a failed commit raises and the next write merges the
+        document again.
+        """
+        batch.commit()
+        self._activity_docs_ensured.set(user_id, True)
+    
+    @classmethod
+    def _add_to_rollup(
+        cls,
+        rollups: Dict[str, Dict[str, Any]],
+        timestamp: datetime,
+        event_type: str,
+        demo_id: Optional[str],
+        duration: float,
+    ) -> None:
+        """Accumulate an event's counter changes into per-day rollup deltas."""
+        day = timestamp.strftime("%Y-%m-%d")
+        rollup = rollups.setdefault(day, {
+            "totals": dict.fromkeys(cls.ROLLUP_COUNTERS, 0),
+            "demos": {},
+        })
+        
+        changes = {
+            "events": 1,
+            "sessions": 1 if event_type == "session_start" else 0,
+            "time_seconds": duration,
+            "chat_messages": 1 if event_type == "chat_message_sent" else 0,
+            "views": 1 if event_type == "page_view" else 0,
+            "launches": 1 if event_type == "demo_launched" else 0,
+        }
+        
+        targets = [rollup["totals"]]
+        if demo_id:
+            targets.append(rollup["demos"].setdefault(
+                demo_id, dict.fromkeys(cls.ROLLUP_COUNTERS, 0),
+            ))
+        
+        for counters in targets:
+            for name, value in changes.items():
+                counters[name] += value
+    
+    @traced("firestore.write_rollups")
+    def _write_rollups(
+        self,
+        user_id: str,
+        rollups: Dict[str, Dict[str, Any]],
+        batch: Optional[firestore.WriteBatch] = None,
+    ) -> None:
+        """
+        Apply per-day rollup deltas as merged increments.
+        
+        Each day's deltas go to the user's rollup and to one randomly chosen
+        shard of the global daily aggregate, which also records the user as
+        active that day.
+        
+        Args:
+            user_id: User's unique identifier
+            rollups: Deltas built with _add_to_rollup, keyed by YYYY-MM-DD
+            batch: Add the writes to this batch instead of committing them
+        """
+        def increments(counters: Dict[str, float]) -> Dict[str, Any]:
+            return {
+                name: firestore.Increment(value)
+                for name, value in counters.items()
+                if value
+            }
+        
+        rollups_ref = self._get_user_rollups_ref(user_id)
+        daily_ref = self.client.collection(self.ACTIVITY_DAILY_COLLECTION)
+        for day, rollup in rollups.items():
+            data = {
+                "date": day,
+                "updated_at": datetime.now(timezone.utc),
+                **increments(rollup["totals"]),
+            }
+            if rollup["demos"]:
+                data["demos"] = {
+                    demo_id: increments(counters)
+                    for demo_id, counters in rollup["demos"].items()
+                }
+            
+            shard_ref = daily_ref.document(f"{day}_{random.randrange(self.ACTIVITY_DAILY_SHARDS)}")
+            shard_data = {**data, "active_users": firestore.ArrayUnion([user_id])}
+            
+            if batch is not None:
+                batch.set(rollups_ref.document(day), data, merge=True)
+                batch.set(shard_ref, shard_data, merge=True)
+            else:
+                rollups_ref.document(day).set(data, merge=True)
+                shard_ref.set(shard_data, merge=True)
+    
+    @traced("firestore.get_user_daily_rollups")
+    def get_user_daily_rollups(
+        self,
+        user_id: str,
+        start_date: str,
+        end_date: str,
+    ) -> List[Dict[str, Any]]:
+        """
+        Get a user's daily activity rollups for a date range.
+        
+        Reads one document per day with activity, however many events
+        were logged.
+        
+        Args:
+            user_id: User's unique identifier
+            start_date: First day, as YYYY-MM-DD (inclusive)
+            end_date: Last day, as YYYY-MM-DD (inclusive)
+            
+        Returns:
+            Rollup documents ordered by date
+        """
+        query = self._get_user_rollups_ref(user_id).where(
+            filter=FieldFilter("date", ">=", start_date)
+        ).where(
+            filter=FieldFilter("date", "<=", end_date)
+        ).order_by("date")
+        
+        return [doc.to_dict() for doc in query.stream()]
+    
+    def get_user_activity_range_summary(
+        self,
+        user_id: str,
+        start_date: str,
+        end_date: str,
+        demo_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Summarize a user's activity over a date range from daily rollups.
+        
+        Args:
+            user_id: User's unique identifier
+            start_date: First day, as YYYY-MM-DD (inclusive)
+            end_date: Last day, as YYYY-MM-DD (inclusive)
+            demo_id: Only count activity on this demo
+            
+        Returns:
+            Range totals, per-demo totals and per-day counters
+        """
+        totals = dict.fromkeys(self.ROLLUP_COUNTERS, 0)
+        demos = {}
+        days = []
+        
+        for rollup in self.get_user_daily_rollups(user_id, start_date, end_date):
+            rollup_demos = rollup.get("demos", {})
+            if demo_id:
+                day_counters = rollup_demos.get(demo_id)
+                if not day_counters:
+                    continue
+                rollup_demos = {demo_id: day_counters}
+            else:
+                day_counters = rollup
+            
+            day = {"date": rollup["date"]}
+            for name in self.ROLLUP_COUNTERS:
+                day[name] = day_counters.get(name, 0)
+                totals[name] += day[name]
+            days.append(day)
+            
+            for rollup_demo_id, counters in rollup_demos.items():
+                demo_totals = demos.setdefault(
+                    rollup_demo_id, dict.fromkeys(self.ROLLUP_COUNTERS, 0),
+                )
+                for name in self.ROLLUP_COUNTERS:
+                    demo_totals[name] += counters.get(name, 0)
+        
+        return {
+            "user_id": user_id,
+            "start_date": start_date,
+            "end_date": end_date,
+            "demo_id": demo_id,
+            "totals": totals,
+            "demos": demos,
+            "days": days,
+        }
+    
+    @traced("firestore.get_activity_engagement")
+    def get_activity_engagement(self, start_date: str, end_date: str) -> Dict[str, Any]:
+        """
+        Summarize activity across all users over a date range.
+        
+        Reads the global daily aggregate shards with one query (at most
+        ACTIVITY_DAILY_SHARDS documents per day), however many users and
+        events there were.
+        
+        Args:
+            start_date: First day, as YYYY-MM-DD (inclusive)
+            end_date: Last day, as YYYY-MM-DD (inclusive)
+            
+        Returns:
+            Range totals (with distinct active users), per-demo totals
+            ordered by views, and per-day counters with active users
+        """
+        query = self.client.collection(self.ACTIVITY_DAILY_COLLECTION).where(
+            filter=FieldFilter("date", ">=", start_date)
+        ).where(
+            filter=FieldFilter("date", "<=", end_date)
+        )
+        
+        days = {}
+        day_users = {}
+        demos = {}
+        
+        for shard in query.stream():
+            shard = shard.to_dict()
+            day = days.setdefault(shard["date"], dict.fromkeys(self.ROLLUP_COUNTERS, 0))
+            for name in self.ROLLUP_COUNTERS:
+                day[name] += shard.get(name, 0)
+            day_users.setdefault(shard["date"], set()).update(shard.get("active_users", []))
+            
+            for demo_id, counters in shard.get("demos", {}).items():
+                demo_totals = demos.setdefault(demo_id, dict.fromkeys(self.ROLLUP_COUNTERS, 0))
+                for name in self.ROLLUP_COUNTERS:
+                    demo_totals[name] += counters.get(name, 0)
+        
+        totals = dict.fromkeys(self.ROLLUP_COUNTERS, 0)
+        for day in days.values():
+            for name in self.ROLLUP_COUNTERS:
+                totals[name] += day[name]
+        totals["active_users"] = len(set().union(*day_users.values()))
+        
+        return {
+            "start_date": start_date,
+            "end_date": end_date,
+            "totals": totals,
+            "demos": [
+                {"demo_id": demo_id, **counters}
+                for demo_id, counters in sorted(
+                    demos.items(), key=lambda item: (-item[1]["views"], item[0]),
+                )
+            ],
+            "days": [
+                {"date": date, "active_users": len(day_users[date]), **days[date]}
+                for date in sorted(days)
+            ],
+        }
+    
+    @traced("firestore.get_user_activity_summary")
+    def get_user_activity_summary(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a user's activity summary/metadata.
+        
+        Totals are the activity document's own counters (written before
+        counters were sharded) plus the sum of its counter shards.
+        
+        Args:
+            user_id: User's unique identifier
+            
+        Returns:
+            User activity metadata or None if not found
+        """
+        cached = self._activity_summary_cache.get(user_id)
+        if cached is not None:
+            discard_span()
+            return cached
+        
+        doc = self._get_user_activity_ref(user_id).get()
+        shards = [shard.to_dict() for shard in self._get_user_counter_shards_ref(user_id).stream()]
+        if not doc.exists and not shards:
+            return None
+        
+        summary = doc.to_dict() if doc.exists else {"user_id": user_id}
+        # Documents created by the first tracked event have no tracking state
+        summary.setdefault("is_tracking_active", True)
+        
+        for name in self.ACTIVITY_COUNTERS:
+            summary[name] = summary.get(name, 0) + sum(shard.get(name, 0) for shard in shards)
+        
+        demos_visited = list(summary.get("demos_visited", []))
+        for shard in shards:
+            if shard.get("last_activity") and (
+                not summary.get("last_activity") or shard["last_activity"] > summary["last_activity"]
+            ):
+                summary["last_activity"] = shard["last_activity"]
+            for demo_id in shard.get("demos_visited", []):
+                if demo_id not in demos_visited:
+                    demos_visited.append(demo_id)
+        summary["demos_visited"] = demos_visited
+        
+        self._activity_summary_cache.set(user_id, summary)
+        return summary
+    
+    def activity_summary_cache_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and size of the activity summary cache."""
+        return self._activity_summary_cache.stats()
+    
+    def get_user_events(
+        self,
+        user_id: str,
+        limit: int = 100,
+        event_type: Optional[str] = None,
+        demo_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Get a user's activity events with optional filtering.
+        
+        Args:
+            user_id: User's unique identifier
+            limit: Maximum number of events to return
+            event_type: Filter by event type
+            demo_id: Filter by demo ID
+            session_id: Filter by session ID
+            start_time: Filter events after this time
+            end_time: Filter events before this time
+            
+        Returns:
+            List of event documents
+        """
+        return self.get_user_events_page(
+            user_id=user_id,
+            limit=limit,
+            event_type=event_type,
+            demo_id=demo_id,
+            session_id=session_id,
+            start_time=start_time,
+            end_time=end_time,
+        )[0]
+    
+    @traced("firestore.get_user_events")
+    def get_user_events_page(
+        self,
+        user_id: str,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        event_type: Optional[str] = None,
+        demo_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Get a page of a user's activity events, newest first.
+        
+        Only the monthly partitions inside the time range are queried,
+        newest first, until the page is full. Events not yet migrated out
+        of the unpartitioned collection are merged in.
+        
+        Args:
+            user_id: User's unique identifier
+            limit: Maximum number of events to return
+            cursor: next_cursor from the previous page
+            event_type: Filter by event type
+            demo_id: Filter by demo ID
+            session_id: Filter by session ID
+            start_time: Filter events after this time
+            end_time: Filter events before this time
+            
+        Returns:
+            Tuple of (event documents, cursor for the next page or None)
+            
+        Raises:
+            ValueError: If the cursor is invalid
+        """
+        events, next_cursor = self._get_partitioned_events_page(
+            user_id, limit, cursor, event_type, demo_id, session_id, start_time, end_time,
+        )
+        if not self._has_legacy_events(user_id):
+            return events, next_cursor
+        
+        query = self._filter_events(
+            self._get_user_legacy_events_ref(user_id),
+            event_type, demo_id, session_id, self._retained_since(start_time), end_time,
+        )
+        legacy, legacy_cursor = self._paginate(
+            "events",
+            query,
+            [("timestamp", firestore.Query.DESCENDING)],
+            limit,
+            cursor,
+            self._to_event,
+        )
+        
+        # Both lists continue after the same cursor; a page ends at the
+        # limit or where either of them was cut off
+        merged = {event["id"]: event for event in events + legacy}
+        events = sorted(merged.values(), key=lambda event: (event["timestamp"], event["id"]), reverse=True)
+        has_more = bool(next_cursor or legacy_cursor)
+        if limit is not None and len(events) > limit:
+            events = events[:limit]
+            has_more = True
+        if not has_more or not events:
+            return events, None
+        last = events[-1]
+        return events, self._encode_cursor("events", [last["timestamp"], last["id"]])
+    
+    @staticmethod
+    def _to_event(doc) -> Dict[str, Any]:
+        """Convert an event snapshot to a dict with its "id"."""
+        event = doc.to_dict()
+        event["id"] = doc.id
+        return event
+    
+    def _get_partitioned_events_page(
+        self,
+        user_id: str,
+        limit: Optional[int],
+        cursor: Optional[str],
+        event_type: Optional[str],
+        demo_id: Optional[str],
+        session_id: Optional[str],
+        start_time: Optional[datetime],
+        end_time: Optional[datetime],
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Get a page of a user's events from their monthly partitions only."""
+        partition_ids = self._event_partitions(user_id, start_time, end_time)
+        
+        # The cursor's timestamp tells which partition the previous page ended in
+        cursor_partition = None
+        if cursor:
+            cursor_partition = self._event_partition_id(self._decode_cursor("events", cursor, 2)[0])
+            partition_ids = [p for p in partition_ids if p <= cursor_partition]
+        
+        # Order by timestamp descending
+        orders = [("timestamp", firestore.Query.DESCENDING)]
+        
+        events = []
+        next_cursor = None
+        for partition_id in reversed(partition_ids):
+            query = self._filter_events(
+                self._get_user_events_ref(user_id, partition_id),
+                event_type, demo_id, session_id, start_time, end_time,
+            )
+            page, next_cursor = self._paginate(
+                "events",
+                query,
+                orders,
+                None if limit is None else limit - len(events),
+                cursor if partition_id == cursor_partition else None,
+                self._to_event,
+            )
+            events.extend(page)
+            if next_cursor:
+                break
+            
+            if limit is not None and len(events) >= limit:
+                # The page ended with this partition; older ones may have more
+                if partition_id != partition_ids[0]:
+                    last = events[-1]
+                    next_cursor = self._encode_cursor("events", [last["timestamp"], last["id"]])
+                break
+        
+        return events, next_cursor
+    
+    @staticmethod
+    def _filter_events(
+        query,
+        event_type: Optional[str] = None,
+        demo_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+    ):
+        """Apply the optional event filters to an events query."""
+        if event_type:
+            query = query.where(filter=FieldFilter("event_type", "==", event_type))
+        if demo_id:
+            query = query.where(filter=FieldFilter("demo_id", "==", demo_id))
+        if session_id:
+            query = query.where(filter=FieldFilter("session_id", "==", session_id))
+        if start_time:
+            query = query.where(filter=FieldFilter("timestamp", ">=", start_time))
+        if end_time:
+            query = query.where(filter=FieldFilter("timestamp", "<=", end_time))
+        return query
+    
+    @traced("firestore.get_activity_feed")
+    def get_activity_feed_page(
+        self,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        event_type: Optional[str] = None,
+        demo_id: Optional[str] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Get a page of activity events across all users, newest first.
+        
+        One collection group query over every `events` subcollection, so
+        the cost does not depend on the number of users.
+        
+        Args:
+            limit: Maximum number of events to return
+            cursor: next_cursor from the previous page
+            event_type: Filter by event type
+            demo_id: Filter by demo ID
+            start_time: Filter events at or after this time
+            end_time: Filter events at or before this time
+            
+        Returns:
+            Tuple of (event documents with "user_id", cursor for the next page or None)
+            
+        Raises:
+            ValueError: If the cursor is invalid
+        """
+        cutoff = self._retention_cutoff()
+        if cutoff and (start_time is None or start_time < cutoff):
+            start_time = cutoff
+        
+        query = self._filter_events(
+            self.client.collection_group(self.EVENTS_SUBCOLLECTION),
+            event_type=event_type,
+            demo_id=demo_id,
+            start_time=start_time,
+            end_time=end_time,
+        )
+        
+        def to_event(doc) -> Dict[str, Any]:
+            event = doc.to_dict()
+            event["id"] = doc.id
+            # user_activity/{user_id}/...
+            event["user_id"] = doc.reference.path.split("/")[1]
+            return event
+        
+        orders = [("timestamp", firestore.Query.DESCENDING)]
+        return self._paginate("feed", query, orders, limit, cursor, to_event, collection_group=True)
+    
+    # Events read per query while streaming an export; bounded pages keep
+    # every query well inside the RPC deadline
+    EVENT_EXPORT_PAGE_SIZE = 1000
+    
+    def stream_user_events(
+        self,
+        user_id: str,
+        event_type: Optional[str] = None,
+        demo_id: Optional[str] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over all of a user's activity events, oldest first.
+        
+        Documents are read lazily, one monthly partition at a time, in pages
+        of EVENT_EXPORT_PAGE_SIZE, so memory use does not grow with the
+        number of events and no single query runs for the whole export.
+        Events not yet migrated out of the unpartitioned collection are
+        merged in by time.
+        
+        Args:
+            user_id: User's unique identifier
+            event_type: Filter by event type
+            demo_id: Filter by demo ID
+            start_time: Filter events at or after this time
+            end_time: Filter events at or before this time
+            
+        Yields:
+            Event documents (with "id")
+        """
+        partitioned = (
+            event
+            for partition_id in self._event_partitions(user_id, start_time, end_time)
+            for event in self._stream_events_query(self._filter_events(
+                self._get_user_events_ref(user_id, partition_id),
+                event_type=event_type,
+                demo_id=demo_id,
+                start_time=start_time,
+                end_time=end_time,
+            ))
+        )
+        if not self._has_legacy_events(user_id):
+            yield from partitioned
+            return
+        
+        legacy = self._stream_events_query(self._filter_events(
+            self._get_user_legacy_events_ref(user_id),
+            event_type=event_type,
+            demo_id=demo_id,
+            start_time=self._retained_since(start_time),
+            end_time=end_time,
+        ))
+        
+        # An event moved by a concurrent migration can be read from both
+        seen = set()
+        for event in heapq.merge(partitioned, legacy, key=lambda event: (event["timestamp"], event["id"])):
+            if event["id"] not in seen:
+                seen.add(event["id"])
+                yield event
+    
+    def _stream_events_query(self, query) -> Iterator[Dict[str, Any]]:
+        """Iterate over an events query oldest first, in pages of EVENT_EXPORT_PAGE_SIZE."""
+        orders = [("timestamp", firestore.Query.ASCENDING)]
+        cursor = None
+        while True:
+            page, cursor = self._paginate(
+                "export", query, orders, self.EVENT_EXPORT_PAGE_SIZE, cursor, self._to_event,
+            )
+            yield from page
+            if not cursor:
+                break
+    
+    @traced("firestore.get_user_sessions")
+    def get_user_sessions(self, user_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Get a user's sessions with aggregated data, most recent first.
+        
+        Reads the stored session summaries with one query. The first call
+        for a user whose history predates session summaries builds them
+        with build_user_sessions.
+        
+        Args:
+            user_id: User's unique identifier
+            limit: Maximum number of sessions to return
+            
+        Returns:
+            Session summaries (see _session_summary)
+        """
+        summary = self.get_user_activity_summary(user_id)
+        if summary is None:
+            return []
+        if not summary.get("sessions_built_at"):
+            self.build_user_sessions(user_id)
+        
+        query = self._get_user_sessions_ref(user_id).order_by(
+            "last_event_at", direction=firestore.Query.DESCENDING
+        ).limit(limit)
+        
+        now = datetime.now(timezone.utc)
+        return [self._session_summary(doc.to_dict(), now) for doc in query.stream()]
+    
+    @traced("firestore.build_user_sessions")
+    def build_user_sessions(self, user_id: str) -> int:
+        """
+        Build session summaries from one ordered scan of a user's events.
+        
+        Every session is stored whole. Closed sessions (ended, or idle past
+        SESSION_TIMEOUT_SECONDS) are simply overwritten. Open sessions may
+        get events while the scan runs, so each is written with a
+        precondition on the summary's update time read before the scan;
+        a summary changed in between fails it and the scan is repeated for
+        that session (up to CONDITIONAL_UPDATE_ATTEMPTS times, after which
+        it keeps its incremental updates). Marks the user's activity
+        document with sessions_built_at.
+        
+        Args:
+            user_id: User's unique identifier
+            
+        Returns:
+            Number of session summaries written
+        """
+        now = datetime.now(timezone.utc)
+        sessions_ref = self._get_user_sessions_ref(user_id)
+        written = 0
+        pending = None
+        
+        for attempt in range(self.CONDITIONAL_UPDATE_ATTEMPTS):
+            update_times = {doc.id: doc.update_time for doc in sessions_ref.stream()}
+            sessions = self._scan_sessions(user_id)
+            if pending is not None:
+                sessions = {session_id: sessions[session_id] for session_id in pending if session_id in sessions}
+            
+            closed = []
+            open_sessions = []
+            for session_id, session in sessions.items():
+                is_open = self._session_summary(self._session_doc(session_id, session), now)["is_open"]
+                (open_sessions if is_open else closed).append((session_id, session))
+            
+            for start in range(0, len(closed), self.EVENT_MAINTENANCE_BATCH_SIZE):
+                batch = self.client.batch()
+                for session_id, session in closed[start:start + self.EVENT_MAINTENANCE_BATCH_SIZE]:
+                    batch.set(sessions_ref.document(session_id), self._session_doc(session_id, session))
+                batch.commit()
+            written += len(closed)
+            
+            pending = []
+            for session_id, session in open_sessions:
+                doc_ref = sessions_ref.document(session_id)
+                session_doc = self._session_doc(session_id, session)
+                try:
+                    if session_id in update_times:
+                        doc_ref.update(session_doc, option=self.client.write_option(
+                            last_update_time=update_times[session_id],
+                        ))
+                    else:
+                        doc_ref.create(session_doc)
+                except (AlreadyExists, FailedPrecondition, NotFound):
+                    # Written to since it was read
+                    pending.append(session_id)
+                    continue
+                written += 1
+            
+            if not pending:
+                break
+        
+        self._get_user_activity_ref(user_id).set({"sessions_built_at": now}, merge=True)
+        self._activity_summary_cache.invalidate(user_id)
+        return written
+    
+    def _scan_sessions(self, user_id: str) -> Dict[str, Dict[str, Any]]:
+        """Accumulate all of a user's events into per-session summaries."""
+        sessions = {}
+        for event in self.stream_user_events(user_id):
+            # Events stored before session IDs were validated may not be usable as IDs
+            if self._is_valid_session_id(event.get("session_id")):
+                self._add_to_session(
+                    sessions,
+                    event["session_id"],
+                    event["timestamp"],
+                    event["event_type"],
+                    event.get("demo_id"),
+                    self._event_duration(event["event_type"], event.get("data")),
+                )
+        return sessions
+    
+    @classmethod
+    def _add_to_session(
+        cls,
+        sessions: Dict[str, Dict[str, Any]],
+        session_id: str,
+        timestamp: datetime,
+        event_type: str,
+        demo_id: Optional[str],
+        duration: float,
+    ) -> None:
+        """Accumulate an event into per-session summary deltas."""
+        session = sessions.setdefault(session_id, {
+            "counters": dict.fromkeys(cls.SESSION_COUNTERS, 0),
+            "demos": [],
+            "started_at": None,
+            "last_event_at": None,
+            "ended_at": None,
+            "duration_seconds": None,
+        })
+        
+        counters = session["counters"]
+        counters["events"] += 1
+        if event_type == "page_view":
+            counters["page_views"] += 1
+        if event_type == "chat_message_sent":
+            counters["chat_messages"] += 1
+        if demo_id and demo_id not in session["demos"]:
+            session["demos"].append(demo_id)
+        
+        if event_type == "session_start" and (
+            session["started_at"] is None or timestamp < session["started_at"]
+        ):
+            session["started_at"] = timestamp
+        if event_type == "session_end":
+            session["ended_at"] = timestamp
+            if duration > 0:
+                session["duration_seconds"] = duration
+        if session["last_event_at"] is None or timestamp > session["last_event_at"]:
+            session["last_event_at"] = timestamp
+    
+    def _session_doc(self, session_id: str, session: Dict[str, Any]) -> Dict[str, Any]:
+        """Build a complete session summary document from accumulated deltas."""
+        return {
+            "session_id": session_id,
+            "started_at": session["started_at"],
+            "last_event_at": session["last_event_at"],
+            "ended_at": session["ended_at"],
+            "duration_seconds": session["duration_seconds"],
+            "demos": session["demos"],
+            **session["counters"],
+        }
+    
+    def _write_session_updates(
+        self,
+        user_id: str,
+        sessions: Dict[str, Dict[str, Any]],
+        batch: firestore.WriteBatch,
+    ) -> None:
+        """
+        Apply per-session deltas as merged increments.
+        
+        last_event_at is overwritten with the batch's latest event, so
+        events written out of order can move it back slightly.
+        
+        Args:
+            user_id: User's unique identifier
+            sessions: Deltas built with _add_to_session, keyed by session ID
+            batch: Batch to add the writes to
+        """
+        sessions_ref = self._get_user_sessions_ref(user_id)
+        for session_id, session in sessions.items():
+            data = {
+                "session_id": session_id,
+                "last_event_at": session["last_event_at"],
+                **{
+                    name: firestore.Increment(value)
+                    for name, value in session["counters"].items()
+                    if value
+                },
+            }
+            if session["demos"]:
+                data["demos"] = firestore.ArrayUnion(session["demos"])
+            for field in ("started_at", "ended_at", "duration_seconds"):
+                if session[field] is not None:
+                    data[field] = session[field]
+            
+            batch.set(sessions_ref.document(session_id), data, merge=True)
+    
+    def _session_summary(self, session: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+        """
+        Complete a stored session summary for output.
+        
+        Sets is_open (no session_end and an event within the timeout) and,
+        when the client did not report one, a duration measured from
+        session_start to the last event.
+        """
+        last_event_at = session.get("last_event_at")
+        session["is_open"] = bool(
+            session.get("ended_at") is None
+            and last_event_at
+            and (now - last_event_at).total_seconds() < self.SESSION_TIMEOUT_SECONDS
+        )
+        if not session.get("duration_seconds"):
+            started_at = session.get("started_at")
+            session["duration_seconds"] = (
+                (last_event_at - started_at).total_seconds()
+                if started_at and last_event_at else 0
+            )
+        for name in self.SESSION_COUNTERS:
+            session.setdefault(name, 0)
+        session.setdefault("demos", [])
+        return session
+    
+    @traced("firestore.pause_user_activity_tracking")
+    def pause_user_activity_tracking(self, user_id: str) -> bool:
+        """
+        Pause activity tracking for a user (when deactivated).
+        Activity data is preserved, just stops new events.
+        
+        Args:
+            user_id: User's unique identifier
+            
+        Returns:
+            True if updated successfully
+        """
+        try:
+            self._get_user_activity_ref(user_id).set({
+                "user_id": user_id,
+                "is_tracking_active": False,
+                "tracking_paused_at": datetime.now(timezone.utc),
+            }, merge=True)
+            self._activity_summary_cache.invalidate(user_id)
+            return True
+        except Exception:
+            return False
+    
+    @traced("firestore.resume_user_activity_tracking")
     def resume_user_activity_tracking(self, user_id: str) -> bool:
         """
         Resume activity tracking for a user (when reactivated).
@@ -689,22 +2270,291 @@ class FirestoreDB:
             True if updated successfully
         """
         try:
-            self._get_user_activity_ref(user_id).update({
+            self._get_user_activity_ref(user_id).set({
+                "user_id": user_id,
                 "is_tracking_active": True,
                 "tracking_resumed_at": datetime.now(timezone.utc),
-            })
+            }, merge=True)
+            self._activity_summary_cache.invalidate(user_id)
             return True
         except Exception:
             return False
+    
+    # ============================================
+    # Activity Retention
+    # ============================================
+    
+    # Documents deleted or moved per write batch by the maintenance jobs
+    EVENT_MAINTENANCE_BATCH_SIZE = 200
+    
+    def list_activity_user_ids(self) -> List[str]:
+        """
+        Get the IDs of all users with activity data.
+        
+        Includes users whose activity document was never written (only its
+        subcollections were).
+        """
+        activity_ref = self.client.collection(self.USER_ACTIVITY_COLLECTION)
+        return sorted(ref.id for ref in activity_ref.list_documents())
+    
+    @traced("firestore.purge_user_events")
+    def purge_user_events(self, user_id: str, before: datetime) -> int:
+        """
+        Delete a user's activity events older than a time.
+        
+        Only partitions that start before the time are queried, plus
+        events not yet migrated out of the unpartitioned collection. Daily
+        rollups and totals are kept.
+        
+        Args:
+            user_id: User's unique identifier
+            before: Delete events with an earlier timestamp
+            
+        Returns:
+            Number of events deleted
+        """
+        last_partition = self._event_partition_id(before)
+        deleted = 0
+        for partition_id in self._list_event_partitions(user_id, use_cache=False):
+            if partition_id > last_partition:
+                break
+            query = self._get_user_events_ref(user_id, partition_id).where(
+                filter=FieldFilter("timestamp", "<", before)
+            )
+            deleted += self._delete_query(query)
+        
+        if self._has_legacy_events(user_id):
+            deleted += self._delete_query(self._get_user_legacy_events_ref(user_id).where(
+                filter=FieldFilter("timestamp", "<", before)
+            ))
+            self._legacy_events_cache.invalidate(user_id)
+        
+        self._event_partitions_cache.invalidate(user_id)
+        return deleted
+    
+    def purge_expired_activity(self) -> Dict[str, int]:
+        """
+        Delete every user's activity events past the retention period.
+        
+        Run periodically (see scripts/manage_activity.py). A Firestore TTL
+        policy on `expires_at` does the same without a job.
+        
+        Returns:
+            Dict with the number of users scanned and events deleted
+            
+        Raises:
+            ValueError: If no retention period is configured
+        """
+        cutoff = self._retention_cutoff()
+        if cutoff is None:
+            raise ValueError("No activity retention period is configured")
+        
+        user_ids = self.list_activity_user_ids()
+        deleted = sum(self.purge_user_events(user_id, cutoff) for user_id in user_ids)
+        return {"users": len(user_ids), "events_deleted": deleted}
+    
+    @traced("firestore.migrate_legacy_events")
+    def migrate_legacy_events(self, user_id: str) -> int:
+        """
+        Move a user's events from the unpartitioned events subcollection
+        into monthly partitions, keeping their IDs.
+        
+        Run once per user for data written before partitioning. Until then
+        those events are read from both places, which costs an extra query
+        per read. Each batch copies and deletes its events atomically, so
+        the move can be resumed after a failure.
+        
+        Args:
+            user_id: User's unique identifier
+            
+        Returns:
+            Number of events moved
+        """
+        legacy_ref = self._get_user_legacy_events_ref(user_id)
+        moved = 0
+        while True:
+            docs = list(legacy_ref.limit(self.EVENT_MAINTENANCE_BATCH_SIZE).stream())
+            if not docs:
+                break
+            
+            batch = self.client.batch()
+            partition_ids = set()
+            for doc in docs:
+                event = doc.to_dict()
+                partition_id = self._event_partition_id(event["timestamp"])
+                if self.activity_retention_days and "expires_at" not in event:
+                    event["expires_at"] = event["timestamp"] + timedelta(days=self.activity_retention_days)
+                batch.set(self._get_user_events_ref(user_id, partition_id).document(doc.id), event)
+                batch.delete(doc.reference)
+                partition_ids.add(partition_id)
+            batch.commit()
+            
+            moved += len(docs)
+            self._note_event_partitions(user_id, partition_ids)
+        
+        self._legacy_events_cache.set(user_id, False)
+        return moved
+    
+    def _delete_query(self, query) -> int:
+        """Delete every document a query matches, one batch at a time."""
+        query = query.select([FieldPath.document_id()]).limit(self.EVENT_MAINTENANCE_BATCH_SIZE)
+        deleted = 0
+        while True:
+            docs = list(query.stream())
+            if not docs:
+                return deleted
+            
+            batch = self.client.batch()
+            for doc in docs:
+                batch.delete(doc.reference)
+            batch.commit()
+            deleted += len(docs)
+    
+    # ============================================
+    # Pagination
+    # ============================================
+    
+    def _paginate(
+        self,
+        kind: str,
+        query,
+        orders: List[Tuple[str, str]],
+        limit: Optional[int],
+        cursor: Optional[str],
+        to_item,
+        collection_group: bool = False,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Run an ordered query for one page, continuing after a cursor.
+        
+        The document ID is appended as the last ordering (in the direction of
+        the previous one), so cursors are unambiguous even when the ordered
+        fields tie. It adds no index requirements: Firestore orders by it
+        implicitly. Collection group queries order by the full document
+        path, so their cursors hold the path instead of the ID.
+        
+        Args:
+            kind: Listing name, stored in the cursor so it cannot be replayed elsewhere
+            query: Filtered query
+            orders: (field, direction) orderings
+            limit: Page size (None for everything)
+            cursor: Opaque cursor from a previous page
+            to_item: Converts a document snapshot to a result dict
+            collection_group: Whether query is a collection group query
+            
+        Returns:
+            Tuple of (items, cursor for the next page or None)
+        """
+        direction = orders[-1][1] if orders else firestore.Query.ASCENDING
+        orders = orders + [(FieldPath.document_id(), direction)]
+        
+        for field, field_direction in orders:
+            query = query.order_by(field, direction=field_direction)
+        
+        if cursor:
+            values = self._decode_cursor(kind, cursor, len(orders))
+            if collection_group:
+                values[-1] = self.client.document(values[-1])
+            query = query.start_after(values)
+        
+        # Fetch one extra document to learn whether another page exists
+        if limit is not None:
+            query = query.limit(limit + 1)
+        
+        docs = list(query.stream())
+        has_more = limit is not None and len(docs) > limit
+        if has_more:
+            docs = docs[:limit]
+        
+        next_cursor = None
+        if has_more and docs:
+            last = docs[-1]
+            values = [last.get(field) for field, _ in orders[:-1]]
+            values.append(last.reference.path if collection_group else last.id)
+            next_cursor = self._encode_cursor(kind, values)
+        
+        return [to_item(doc) for doc in docs], next_cursor
+    
+    @staticmethod
+    def _encode_cursor(kind: str, values: List[Any]) -> str:
+        """Encode ordered-field values and a document ID as an opaque cursor."""
+        def encode(value: Any) -> Any:
+            if isinstance(value, datetime):
+                return {"ts": value.isoformat()}
+            return value
+        
+        raw = json.dumps({"k": kind, "v": [encode(value) for value in values]}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+    
+    @staticmethod
+    def _decode_cursor(kind: str, cursor: str, length: int) -> List[Any]:
+        """
+        Decode a cursor made by _encode_cursor.
+        
+        Raises:
+            ValueError: If the cursor is malformed or belongs to another listing
+        """
+        def decode(value: Any) -> Any:
+            if isinstance(value, dict) and "ts" in value:
+                return datetime.fromisoformat(value["ts"])
+            return value
+        
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+            values = [decode(value) for value in data["v"]]
+        except (ValueError, TypeError, KeyError):
+            raise ValueError("Invalid cursor")
+        
+        if data.get("k") != kind or len(values) != length:
+            raise ValueError("Invalid cursor")
+        return values
 
 
 # Singleton instance
 _db_instance: Optional[FirestoreDB] = None
+_db_instance_lock = threading.Lock()
 
 
 def get_db() -> FirestoreDB:
-    """Get the singleton Firestore database instance."""
+    """
+    Get the singleton Firestore database instance.
+    
+    Set DB_BACKEND=memory to use the in-memory stand-in (for benchmarks and
+    load tests), with MEMORY_DB_LATENCY_MS simulated latency per RPC.
+    
+    Set ACTIVITY_INGEST=spool to accept tracked activity into a local spool
+    (ACTIVITY_SPOOL_DIR, ACTIVITY_SPOOL_FSYNC) instead of writing it inline.
+    
+    Set ACTIVITY_RETENTION_DAYS to expire activity events after that many
+    days (unset or 0 keeps them forever).
+    """
     global _db_instance
-    if _db_instance is None:
-        _db_instance = FirestoreDB()
+    if _db_instance is not None:
+        return _db_instance
+    
+    with _db_instance_lock:
+        if _db_instance is not None:
+            return _db_instance
+        
+        retention_days = int(os.getenv("ACTIVITY_RETENTION_DAYS", "0")) or None
+        
+        if os.getenv("DB_BACKEND", "firestore").lower() == "memory":
+            from .memory import InMemoryFirestoreDB
+            latency_ms = float(os.getenv("MEMORY_DB_LATENCY_MS", "0"))
+            db = InMemoryFirestoreDB(
+                latency_seconds=latency_ms / 1000,
+                activity_retention_days=retention_days,
+            )
+        else:
+            db = FirestoreDB(activity_retention_days=retention_days)
+        
+        if os.getenv("ACTIVITY_INGEST", "sync").lower() == "spool":
+            db.enable_activity_spool(
+                os.getenv("ACTIVITY_SPOOL_DIR", "/tmp/activity-spool"),
+                fsync=os.getenv("ACTIVITY_SPOOL_FSYNC", "false").lower() == "true",
+            )
+        
+        # Published last, so callers skipping the lock see a finished instance
+        _db_instance = db
     return _db_instance
@@ -0,0 +1,506 @@
+"""
+Asynchronous activity ingestion through a local spool.
+
+With ACTIVITY_INGEST=spool, tracking endpoints validate events, append them
+to a spool and answer 202 Accepted; a background drainer later commits them
+to Firestore in large batches, retrying with backoff while Firestore is
+unavailable. The request path then costs a local append instead of
+Firestore round trips.
+
+FileSpool, the default backend, writes append-only segment files (one JSON
+record per line) under ACTIVITY_SPOOL_DIR. Another queue (e.g. Pub/Sub) can
+be plugged in by implementing SpoolBackend.
+
+Delivery is at least once. The IDs committed from a segment are recorded
+next to it, so a segment retried after a partial drain skips what was
+already written. Event IDs are allocated when an event is accepted, so if
+a crash lands between a commit and its record, the replayed events
+overwrite themselves instead of duplicating (only their counters are
+added twice).
+
+Events are validated when accepted. Events Firestore still rejects
+individually are moved to a dead-letter file instead of being retried, so
+one bad event cannot hold up the events behind it; only failed commits
+are retried.
+"""
+
+import atexit
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+class SpoolBackend(ABC):
+    """
+    Where accepted events wait until they are written to Firestore.
+
+    Records are appended to an open segment; sealed segments are drained,
+    then removed.
+    """
+
+    @abstractmethod
+    def append(self, records: List[Dict[str, Any]]) -> None:
+        """Durably append records to the open segment."""
+
+    @abstractmethod
+    def seal(self) -> None:
+        """Close the open segment (if it has records) so it can be drained."""
+
+    @abstractmethod
+    def ready_segments(self) -> List[str]:
+        """Sealed segments, oldest first."""
+
+    @abstractmethod
+    def read(self, segment: str) -> List[Dict[str, Any]]:
+        """All records of a sealed segment."""
+
+    @abstractmethod
+    def committed_ids(self, segment: str) -> Set[str]:
+        """IDs of the segment's records already written to Firestore."""
+
+    @abstractmethod
+    def mark_committed(self, segment: str, record_ids: List[str]) -> None:
+        """Record that these records were written to Firestore."""
+
+    @abstractmethod
+    def dead_letter(self, records: List[Dict[str, Any]]) -> None:
+        """Keep records Firestore rejected (each with its "error") for inspection."""
+
+    @abstractmethod
+    def remove(self, segment: str) -> None:
+        """Delete a fully drained segment."""
+
+
+class FileSpool(SpoolBackend):
+    """
+    Append-only segment files in a local directory.
+
+    Files are named `{owner}-{n}.open` while written and `{owner}-{n}.ready`
+    once sealed, with committed record IDs in `{segment}.done`. The owner is
+    a random ID per spool instance, which holds an exclusive lock on
+    `{owner}.lock` while it runs; the lock is released when the process
+    exits, however it exits. Segments whose owner's lock can be taken are
+    adopted on startup (process IDs are not used, since a restarted
+    container reuses them). Rejected records are appended to
+    `rejected.jsonl`.
+    """
+
+    DEAD_LETTER_FILE = "rejected.jsonl"
+
+    SEGMENT_MAX_BYTES = 4 * 1024 * 1024
+
+    def __init__(self, directory: str, fsync: bool = False):
+        """
+        Initialize the spool.
+
+        Args:
+            directory: Spool directory (created if missing)
+            fsync: fsync every append (survives machine crashes, costs a disk flush)
+        """
+        self.directory = directory
+        self.fsync = fsync
+        self._owner = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._file = None
+        self._path: Optional[str] = None
+
+        os.makedirs(directory, exist_ok=True)
+        # Held until this process exits
+        self._owner_lock = open(self._segment_path(f"{self._owner}.lock"), "w")
+        fcntl.flock(self._owner_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self._adopt_orphans()
+
+    def _segment_path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _adopt_orphans(self) -> None:
+        """Take over segments of spools whose process is gone."""
+        owners: Dict[str, List[str]] = {}
+        for name in sorted(os.listdir(self.directory)):
+            base, ext = os.path.splitext(name)
+            if ext in (".open", ".ready"):
+                owners.setdefault(base.split("-", 1)[0], []).append(name)
+            elif ext == ".lock":
+                # Also clears the lock files of owners that left no segments
+                owners.setdefault(base, [])
+
+        for owner, names in owners.items():
+            if owner == self._owner:
+                continue
+            with self._owner_gone(owner) as gone:
+                if not gone:
+                    continue
+                for name in names:
+                    self._adopt(name)
+
+    def _owner_gone(self, owner: str):
+        """Context holding the owner's lock if its process has exited (yields True)."""
+        spool = self
+
+        class OwnerLock:
+            def __enter__(self) -> bool:
+                self.path = spool._segment_path(f"{owner}.lock")
+                try:
+                    self.file = open(self.path, "r+")
+                except FileNotFoundError:
+                    # No lock file: left by a process that has exited
+                    self.file = None
+                    return True
+                try:
+                    fcntl.flock(self.file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    self.file.close()
+                    self.file = None
+                    return False
+                return True
+
+            def __exit__(self, *exc_info) -> None:
+                if self.file is not None:
+                    # Adopted: the lock file is no longer needed
+                    try:
+                        os.remove(self.path)
+                    except FileNotFoundError:
+                        pass
+                    self.file.close()
+
+        return OwnerLock()
+
+    def _adopt(self, name: str) -> None:
+        """Move another owner's segment under this spool, sealed."""
+        base = os.path.splitext(name)[0]
+        adopted = self._segment_path(f"{self._owner}-{base.replace('-', '_')}.ready")
+        try:
+            if os.path.exists(self._segment_path(name) + ".done"):
+                os.rename(self._segment_path(name) + ".done", adopted + ".done")
+            os.rename(self._segment_path(name), adopted)
+        except FileNotFoundError:
+            # Another process adopted it first
+            return
+        logger.info("Adopted activity spool segment %s", name)
+
+    def append(self, records: List[Dict[str, Any]]) -> None:
+        data = "".join(
+            json.dumps(record, separators=(",", ":")) + "\n" for record in records
+        ).encode("utf-8")
+
+        with self._lock:
+            if self._file is None:
+                self._path = self._segment_path(f"{self._owner}-{time.time_ns()}.open")
+                self._file = open(self._path, "ab")
+
+            self._file.write(data)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+            if self._file.tell() >= self.SEGMENT_MAX_BYTES:
+                self._seal_locked()
+
+    def seal(self) -> None:
+        with self._lock:
+            if self._file is not None and self._file.tell() > 0:
+                self._seal_locked()
+
+    def _seal_locked(self) -> None:
+        self._file.close()
+        os.rename(self._path, self._path[:-len(".open")] + ".ready")
+        self._file = None
+        self._path = None
+
+    def ready_segments(self) -> List[str]:
+        prefix = f"{self._owner}-"
+        return sorted(
+            self._segment_path(name)
+            for name in os.listdir(self.directory)
+            if name.startswith(prefix) and name.endswith(".ready")
+        )
+
+    def read(self, segment: str) -> List[Dict[str, Any]]:
+        records = []
+        with open(segment, "rb") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # A torn final line from a crash mid-append
+                    logger.warning("Skipping unreadable record in %s", segment)
+        return records
+
+    def committed_ids(self, segment: str) -> Set[str]:
+        try:
+            with open(segment + ".done", "r", encoding="utf-8") as f:
+                return {line.strip() for line in f if line.strip()}
+        except FileNotFoundError:
+            return set()
+
+    def mark_committed(self, segment: str, record_ids: List[str]) -> None:
+        with open(segment + ".done", "a", encoding="utf-8") as f:
+            f.write("".join(record_id + "\n" for record_id in record_ids))
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+
+    def dead_letter(self, records: List[Dict[str, Any]]) -> None:
+        data = "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records)
+        with self._lock:
+            with open(self._segment_path(self.DEAD_LETTER_FILE), "a", encoding="utf-8") as f:
+                f.write(data)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+
+    def remove(self, segment: str) -> None:
+        for path in (segment + ".done", segment):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+# Writes accepted events: (user_id, events, ip_address, user_agent,
+# received_at, event_ids) -> (written IDs, per-event errors); raises when
+# the commit fails
+BatchWriter = Callable[..., Tuple[List[str], List[Dict[str, Any]]]]
+
+# Checks an event before it is accepted: event -> error message or None
+EventValidator = Callable[[Any], Optional[str]]
+
+
+class ActivityIngestQueue:
+    """Accepts activity events into a spool and drains it to Firestore."""
+
+    # Events per Firestore batch (each batch also writes rollups, daily
+    # aggregates, one counter shard and a summary per session; Firestore
+    # allows 500 writes)
+    DRAIN_CHUNK_EVENTS = 200
+
+    # Backoff after a failed drain doubles up to this
+    MAX_RETRY_SECONDS = 60.0
+
+    def __init__(
+        self,
+        write_batch: BatchWriter,
+        backend: SpoolBackend,
+        drain_interval_seconds: float = 1.0,
+        validate_event: Optional[EventValidator] = None,
+    ):
+        """
+        Initialize the queue.
+
+        Args:
+            write_batch: Writes one user's events (FirestoreDB.log_user_activity_batch);
+                raises when the commit fails, per-event errors are rejections
+            backend: Spool holding accepted events
+            drain_interval_seconds: How often the open segment is sealed and drained
+            validate_event: Returns why an event cannot be stored, or None
+                (FirestoreDB.validate_activity_event)
+        """
+        self._write_batch = write_batch
+        self._validate_event = validate_event or _require_event_type
+        self.backend = backend
+        self.drain_interval_seconds = drain_interval_seconds
+
+        self._lock = threading.Lock()
+        self._drain_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._drainer: Optional[threading.Thread] = None
+        self._retry_seconds = 0.0
+
+        self.accepted = 0
+        self.written = 0
+        self.rejected = 0
+        self.failed_drains = 0
+
+        atexit.register(self.close)
+
+        # Segments sealed before a restart or adopted from an exited
+        # instance would otherwise wait for the next enqueue
+        if self.backend.ready_segments():
+            with self._lock:
+                self._ensure_drainer()
+
+    def enqueue(
+        self,
+        user_id: str,
+        events: List[Dict[str, Any]],
+        ip_address: Optional[str] = None,
+        user_agent: Optional[str] = None,
+    ) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """
+        Accept events for asynchronous writing.
+
+        Args:
+            user_id: User's unique identifier
+            events: Event dicts with event_type, data, page_url, demo_id and session_id
+            ip_address: Client IP address
+            user_agent: Browser user agent string
+
+        Returns:
+            Tuple of (event IDs the events will be stored under,
+            per-event errors as {"index", "error"})
+        """
+        received_at = datetime.now(timezone.utc).isoformat()
+        records = []
+        event_ids = []
+        errors = []
+
+        for i, event in enumerate(events):
+            error = self._validate_event(event)
+            if error:
+                errors.append({"index": i, "error": error})
+                continue
+
+            event_id = uuid.uuid4().hex
+            records.append({
+                "id": event_id,
+                "user_id": user_id,
+                "ip_address": ip_address,
+                "user_agent": user_agent,
+                "received_at": received_at,
+                "event": {
+                    "event_type": event["event_type"],
+                    "data": event.get("data", {}),
+                    "page_url": event.get("page_url"),
+                    "demo_id": event.get("demo_id"),
+                    "session_id": event.get("session_id"),
+                },
+            })
+            event_ids.append(event_id)
+
+        if records:
+            self.backend.append(records)
+            with self._lock:
+                self.accepted += len(records)
+                self._ensure_drainer()
+
+        return event_ids, errors
+
+    def drain(self) -> int:
+        """
+        Write all sealed segments to Firestore.
+
+        Stops at the first failed commit; the segment is retried later.
+
+        Returns:
+            Number of events written
+        """
+        with self._drain_lock:
+            written = 0
+            for segment in self.backend.ready_segments():
+                count, complete = self._drain_segment(segment)
+                written += count
+                if not complete:
+                    break
+            return written
+
+    def _drain_segment(self, segment: str) -> Tuple[int, bool]:
+        """Write one segment's pending records; returns (written, finished)."""
+        committed = self.backend.committed_ids(segment)
+
+        # One batch per user and client, in arrival order
+        groups: "OrderedDict[tuple, List[Dict[str, Any]]]" = OrderedDict()
+        for record in self.backend.read(segment):
+            if record["id"] in committed:
+                continue
+            key = (record["user_id"], record.get("ip_address"), record.get("user_agent"))
+            groups.setdefault(key, []).append(record)
+
+        written = 0
+        for (user_id, ip_address, user_agent), records in groups.items():
+            for start in range(0, len(records), self.DRAIN_CHUNK_EVENTS):
+                chunk = records[start:start + self.DRAIN_CHUNK_EVENTS]
+                try:
+                    ids, errors = self._write_batch(
+                        user_id=user_id,
+                        events=[record["event"] for record in chunk],
+                        ip_address=ip_address,
+                        user_agent=user_agent,
+                        received_at=[datetime.fromisoformat(record["received_at"]) for record in chunk],
+                        event_ids=[record["id"] for record in chunk],
+                    )
+                except Exception:
+                    logger.exception("Failed to write %d spooled activity events", len(chunk))
+                    self._record_failure()
+                    return written, False
+
+                if errors:
+                    # Events rejected individually cannot succeed on retry
+                    logger.error("Rejected %d spooled activity events: %s", len(errors), errors)
+                    self.backend.dead_letter([
+                        {**chunk[error["index"]], "error": error["error"]} for error in errors
+                    ])
+                    self.rejected += len(errors)
+
+                self.backend.mark_committed(segment, [record["id"] for record in chunk])
+                written += len(ids)
+                self.written += len(ids)
+
+        self.backend.remove(segment)
+        self._retry_seconds = 0.0
+        return written, True
+
+    def _record_failure(self) -> None:
+        """Back off before the next drain."""
+        self.failed_drains += 1
+        self._retry_seconds = min(
+            max(self._retry_seconds * 2, self.drain_interval_seconds),
+            self.MAX_RETRY_SECONDS,
+        )
+
+    def _ensure_drainer(self) -> None:
+        """Start the background drain thread (caller holds the lock)."""
+        if self._drainer is None or not self._drainer.is_alive():
+            self._drainer = threading.Thread(
+                target=self._run_drainer,
+                name="activity-drainer",
+                daemon=True,
+            )
+            self._drainer.start()
+
+    def _run_drainer(self) -> None:
+        """Seal and drain the spool periodically until the queue is closed."""
+        while not self._stop.wait(self._retry_seconds or self.drain_interval_seconds):
+            try:
+                self.backend.seal()
+                self.drain()
+            except Exception:
+                logger.exception("Activity spool drain failed")
+                self._record_failure()
+
+    def close(self) -> None:
+        """Stop the background thread and try to drain what is left."""
+        self._stop.set()
+        try:
+            self.backend.seal()
+            self.drain()
+        except Exception:
+            logger.exception("Failed to drain the activity spool at shutdown")
+
+    def stats(self) -> Dict[str, Any]:
+        """Get queue counters."""
+        return {
+            "accepted": self.accepted,
+            "written": self.written,
+            "rejected": self.rejected,
+            "failed_drains": self.failed_drains,
+            "ready_segments": len(self.backend.ready_segments()),
+            "retry_seconds": self._retry_seconds,
+        }
+
+
+def _require_event_type(event: Any) -> Optional[str]:
+    """Default validator: only event_type is required."""
+    if not isinstance(event, dict) or not event.get("event_type"):
+        return "event_type is required"
+    return None
@@ -0,0 +1,618 @@
+"""
+In-memory stand-in for Firestore, for offline benchmarking and load testing.
+
+MemoryClient implements the subset of google.cloud.firestore.Client that
+FirestoreDB uses. It stores collections and subcollections of documents,
+with auto-IDs and document listing. Documents can be read, created, set,
+updated and deleted, with last-update-time preconditions. Queries can
+filter, order, project and page with start_after, also over collection
+groups. Write batches and the field transforms (Increment, ArrayUnion,
+ArrayRemove, SERVER_TIMESTAMP and DELETE_FIELD) are applied as Firestore
+applies them.
+
+InMemoryFirestoreDB is FirestoreDB running on top of it, so handlers,
+caches and batching behave exactly as in production.
+
+Every simulated RPC can be delayed by a fixed latency and is counted, which
+makes RPC counts per request measurable on a laptop or CI box.
+
+Select it with DB_BACKEND=memory (see get_db). MEMORY_DB_LATENCY_MS sets
+the per-RPC latency.
+"""
+
+import copy
+import secrets
+import string
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from google.api_core.exceptions import AlreadyExists, FailedPrecondition, NotFound
+from google.cloud import firestore
+from google.cloud.firestore_v1.base_query import FieldFilter
+from google.cloud.firestore_v1.field_path import FieldPath
+from google.cloud.firestore_v1.transforms import ArrayRemove, ArrayUnion, Increment
+
+from .firestore import FirestoreDB
+
+
+_AUTO_ID_ALPHABET = string.ascii_letters + string.digits
+
+
+def _auto_id() -> str:
+    """Generate a 20-character document ID, like Firestore's client-side IDs."""
+    return "".join(secrets.choice(_AUTO_ID_ALPHABET) for _ in range(20))
+
+
+def _get_field(data: Dict[str, Any], field_path: str) -> Tuple[bool, Any]:
+    """Resolve a dotted field path. Returns (found, value)."""
+    value: Any = data
+    for part in field_path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return False, None
+        value = value[part]
+    return True, value
+
+
+def _sort_key(value: Any) -> Tuple[int, Any]:
+    """
+    Ordering key for a field value across types.
+
+    Firestore orders values of different types by type first (null, booleans,
+    numbers, timestamps, strings, bytes, references, arrays, maps), then by
+    value within a type.
+    """
+    if value is None:
+        return 0, 0
+    if isinstance(value, bool):
+        return 1, value
+    if isinstance(value, (int, float)):
+        # NaN sorts before every other number
+        return (2, float("-inf")) if value != value else (3, value)
+    if isinstance(value, datetime):
+        return 4, value
+    if isinstance(value, str):
+        return 5, value
+    if isinstance(value, bytes):
+        return 6, value
+    if isinstance(value, MemoryDocumentReference):
+        return 7, value.path
+    if isinstance(value, (list, tuple)):
+        return 8, tuple(_sort_key(item) for item in value)
+    if isinstance(value, dict):
+        return 9, tuple(sorted((key, _sort_key(item)) for key, item in value.items()))
+    return 10, repr(value)
+
+
+def _apply_value(target: Dict[str, Any], key: str, value: Any) -> None:
+    """Set one field, applying Firestore transforms and sentinels."""
+    if isinstance(value, Increment):
+        current = target.get(key)
+        target[key] = (current if isinstance(current, (int, float)) else 0) + value.value
+    elif isinstance(value, ArrayUnion):
+        current = list(target.get(key) or [])
+        current.extend(item for item in value.values if item not in current)
+        target[key] = current
+    elif isinstance(value, ArrayRemove):
+        target[key] = [item for item in target.get(key) or [] if item not in value.values]
+    elif value is firestore.DELETE_FIELD:
+        target.pop(key, None)
+    elif value is firestore.SERVER_TIMESTAMP:
+        target[key] = datetime.now(timezone.utc)
+    else:
+        target[key] = copy.deepcopy(value)
+
+
+def _merge(target: Dict[str, Any], data: Dict[str, Any]) -> None:
+    """Deep-merge data into target, as set(..., merge=True) does."""
+    for key, value in data.items():
+        if isinstance(value, dict):
+            child = target.get(key)
+            if not isinstance(child, dict):
+                child = target[key] = {}
+            _merge(child, value)
+        else:
+            _apply_value(target, key, value)
+
+
+def _update(target: Dict[str, Any], updates: Dict[str, Any]) -> None:
+    """Apply update() semantics: dotted paths address nested fields, maps are replaced."""
+    for field_path, value in updates.items():
+        *parents, leaf = field_path.split(".")
+        node = target
+        for part in parents:
+            child = node.get(part)
+            if not isinstance(child, dict):
+                child = node[part] = {}
+            node = child
+        _apply_value(node, leaf, value)
+
+
+def _strip_sentinels(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Resolve transforms for a plain set(), where there is no previous value."""
+    result: Dict[str, Any] = {}
+    _merge(result, data)
+    return result
+
+
+_OPERATORS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "in": lambda a, b: a in b,
+    "not-in": lambda a, b: a not in b,
+    "array_contains": lambda a, b: isinstance(a, list) and b in a,
+    "array-contains": lambda a, b: isinstance(a, list) and b in a,
+    "array_contains_any": lambda a, b: isinstance(a, list) and any(item in a for item in b),
+    "array-contains-any": lambda a, b: isinstance(a, list) and any(item in a for item in b),
+}
+
+
+class MemoryStore:
+    """Document storage plus the latency and counters shared by all references."""
+
+    def __init__(self, latency_seconds: float = 0.0):
+        """
+        Initialize the store.
+
+        Args:
+            latency_seconds: Artificial delay added to every simulated RPC
+        """
+        self.latency_seconds = latency_seconds
+        self.collections: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        # Document path -> time of its last write
+        self.update_times: Dict[str, datetime] = {}
+        self._last_update_time = datetime.min.replace(tzinfo=timezone.utc)
+        self.lock = threading.RLock()
+        self.rpcs: Counter = Counter()
+        self.documents_read = 0
+        self.documents_written = 0
+
+    def rpc(self, kind: str) -> None:
+        """Count one simulated RPC and wait out its latency."""
+        with self.lock:
+            self.rpcs[kind] += 1
+        if self.latency_seconds > 0:
+            time.sleep(self.latency_seconds)
+
+    def touch(self, document_path: str) -> None:
+        """Record a write to a document; times strictly increase (caller holds the lock)."""
+        now = max(datetime.now(timezone.utc), self._last_update_time + timedelta(microseconds=1))
+        self._last_update_time = now
+        self.update_times[document_path] = now
+
+    def documents(self, collection_path: str) -> Dict[str, Dict[str, Any]]:
+        """Get the documents of a collection (caller holds the lock)."""
+        return self.collections.setdefault(collection_path, {})
+
+    def stats(self) -> Dict[str, Any]:
+        """Get RPC and document counters."""
+        with self.lock:
+            return {
+                "rpcs": dict(self.rpcs),
+                "total_rpcs": sum(self.rpcs.values()),
+                "documents_read": self.documents_read,
+                "documents_written": self.documents_written,
+                "latency_ms": self.latency_seconds * 1000,
+            }
+
+    def reset_stats(self) -> None:
+        """Zero the counters, keeping the data."""
+        with self.lock:
+            self.rpcs.clear()
+            self.documents_read = 0
+            self.documents_written = 0
+
+
+class MemoryDocumentSnapshot:
+    """Point-in-time copy of a document, like DocumentSnapshot."""
+
+    def __init__(
+        self,
+        reference: "MemoryDocumentReference",
+        data: Optional[Dict[str, Any]],
+        update_time: Optional[datetime] = None,
+    ):
+        self.reference = reference
+        self._data = data
+        self.update_time = update_time
+
+    @property
+    def id(self) -> str:
+        return self.reference.id
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def get(self, field_path: str) -> Any:
+        return _get_field(self._data or {}, field_path)[1]
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+
+class MemoryDocumentReference:
+    """Reference to a document, like DocumentReference."""
+
+    def __init__(self, store: MemoryStore, collection_path: str, document_id: str):
+        self._store = store
+        self._collection_path = collection_path
+        self.id = document_id
+
+    @property
+    def path(self) -> str:
+        return f"{self._collection_path}/{self.id}"
+
+    def collection(self, collection_id: str) -> "MemoryCollectionReference":
+        return MemoryCollectionReference(self._store, f"{self.path}/{collection_id}")
+
+    def get(self) -> MemoryDocumentSnapshot:
+        self._store.rpc("get")
+        with self._store.lock:
+            data = self._store.documents(self._collection_path).get(self.id)
+            self._store.documents_read += 1
+            return MemoryDocumentSnapshot(
+                self, copy.deepcopy(data), self._store.update_times.get(self.path),
+            )
+
+    def set(self, data: Dict[str, Any], merge: bool = False) -> None:
+        self._store.rpc("set")
+        with self._store.lock:
+            self._set(data, merge)
+
+    def create(self, data: Dict[str, Any]) -> None:
+        self._store.rpc("create")
+        with self._store.lock:
+            if self.id in self._store.documents(self._collection_path):
+                raise AlreadyExists(f"Document already exists: {self.path}")
+            self._set(data, merge=False)
+
+    def update(self, updates: Dict[str, Any], option: Optional["MemoryWriteOption"] = None) -> None:
+        self._store.rpc("update")
+        with self._store.lock:
+            self._check_exists()
+            if option is not None:
+                option.check(self)
+            self._update(updates)
+
+    def delete(self) -> None:
+        self._store.rpc("delete")
+        with self._store.lock:
+            self._delete()
+
+    # Unlocked operations, shared with MemoryWriteBatch.commit
+
+    def _set(self, data: Dict[str, Any], merge: bool) -> None:
+        documents = self._store.documents(self._collection_path)
+        if merge and self.id in documents:
+            _merge(documents[self.id], data)
+        else:
+            documents[self.id] = _strip_sentinels(data)
+        self._store.touch(self.path)
+        self._store.documents_written += 1
+
+    def _check_exists(self) -> None:
+        if self.id not in self._store.documents(self._collection_path):
+            raise NotFound(f"No document to update: {self.path}")
+
+    def _update(self, updates: Dict[str, Any]) -> None:
+        _update(self._store.documents(self._collection_path)[self.id], updates)
+        self._store.touch(self.path)
+        self._store.documents_written += 1
+
+    def _delete(self) -> None:
+        self._store.documents(self._collection_path).pop(self.id, None)
+        self._store.update_times.pop(self.path, None)
+        self._store.documents_written += 1
+
+
+class MemoryWriteOption:
+    """Last-update-time precondition, like client.write_option(last_update_time=...)."""
+
+    def __init__(self, last_update_time: datetime):
+        self.last_update_time = last_update_time
+
+    def check(self, reference: MemoryDocumentReference) -> None:
+        """Fail unless the document was last written at last_update_time (caller holds the lock)."""
+        if reference._store.update_times.get(reference.path) != self.last_update_time:
+            raise FailedPrecondition(f"Document was modified: {reference.path}")
+
+
+class MemoryQuery:
+    """
+    Filtered, ordered and limited view of a collection, like Query.
+
+    With all_descendants, collection_path is a collection ID and the query
+    covers every collection with that ID (a collection group); documents
+    are then keyed by their full path instead of their ID.
+    """
+
+    ASCENDING = firestore.Query.ASCENDING
+    DESCENDING = firestore.Query.DESCENDING
+
+    def __init__(
+        self,
+        store: MemoryStore,
+        collection_path: str,
+        filters: Tuple[Tuple[str, str, Any], ...] = (),
+        orders: Tuple[Tuple[str, str], ...] = (),
+        limit_count: Optional[int] = None,
+        start_after_values: Optional[Tuple[Any, ...]] = None,
+        projection: Optional[Tuple[str, ...]] = None,
+        all_descendants: bool = False,
+    ):
+        self._store = store
+        self._collection_path = collection_path
+        self._filters = filters
+        self._orders = orders
+        self._limit = limit_count
+        self._start_after = start_after_values
+        self._projection = projection
+        self._all_descendants = all_descendants
+
+    def _copy(self, **changes: Any) -> "MemoryQuery":
+        params = {
+            "filters": self._filters,
+            "orders": self._orders,
+            "limit_count": self._limit,
+            "start_after_values": self._start_after,
+            "projection": self._projection,
+            "all_descendants": self._all_descendants,
+            **changes,
+        }
+        return MemoryQuery(self._store, self._collection_path, **params)
+
+    def where(
+        self,
+        field_path: Optional[str] = None,
+        op_string: Optional[str] = None,
+        value: Any = None,
+        *,
+        filter: Optional[FieldFilter] = None,
+    ) -> "MemoryQuery":
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        if op_string not in _OPERATORS:
+            raise ValueError(f"Unsupported operator: {op_string}")
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path: str, direction: str = ASCENDING) -> "MemoryQuery":
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count: int) -> "MemoryQuery":
+        return self._copy(limit_count=count)
+
+    def select(self, field_paths: List[str]) -> "MemoryQuery":
+        """Return only these top-level fields of each document."""
+        return self._copy(projection=tuple(field_paths))
+
+    def start_after(self, values: List[Any]) -> "MemoryQuery":
+        """Continue after the given values of the order_by fields (list form only)."""
+        values = tuple(
+            (value.path if self._all_descendants else value.id)
+            if isinstance(value, MemoryDocumentReference) else value
+            for value in values
+        )
+        return self._copy(start_after_values=values)
+
+    def _documents(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Key and data of every queried document (caller holds the lock)."""
+        if not self._all_descendants:
+            return list(self._store.documents(self._collection_path).items())
+        return [
+            (f"{path}/{document_id}", data)
+            for path, documents in self._store.collections.items()
+            if path.rsplit("/", 1)[-1] == self._collection_path
+            for document_id, data in documents.items()
+        ]
+
+    def _reference(self, key: str) -> "MemoryDocumentReference":
+        """Reference to a document by its key from _documents."""
+        if self._all_descendants:
+            collection_path, document_id = key.rsplit("/", 1)
+            return MemoryDocumentReference(self._store, collection_path, document_id)
+        return MemoryDocumentReference(self._store, self._collection_path, key)
+
+    @staticmethod
+    def _order_value(row: Tuple[str, Dict[str, Any]], field_path: str) -> Tuple[bool, Any]:
+        """Resolve an order_by field, where __name__ is the document key."""
+        if field_path == FieldPath.document_id():
+            return True, row[0]
+        return _get_field(row[1], field_path)
+
+    def _after_cursor(self, row: Tuple[str, Dict[str, Any]]) -> bool:
+        """Whether a row sorts strictly after the start_after cursor."""
+        for (field_path, direction), cursor_value in zip(self._orders, self._start_after):
+            value = _sort_key(self._order_value(row, field_path)[1])
+            cursor_value = _sort_key(cursor_value)
+            if value == cursor_value:
+                continue
+            if direction == self.DESCENDING:
+                return value < cursor_value
+            return value > cursor_value
+        return False
+
+    def _matches(self, data: Dict[str, Any]) -> bool:
+        for field_path, op_string, value in self._filters:
+            found, field_value = _get_field(data, field_path)
+            # Documents missing a filtered field never match, as in Firestore
+            if not found:
+                return False
+            try:
+                if not _OPERATORS[op_string](field_value, value):
+                    return False
+            except TypeError:
+                return False
+        return True
+
+    def stream(self) -> Iterator[MemoryDocumentSnapshot]:
+        self._store.rpc("query")
+        with self._store.lock:
+            rows = [(key, data) for key, data in self._documents() if self._matches(data)]
+
+            # Documents missing an order_by field are excluded, as in Firestore
+            for field_path, _ in self._orders:
+                rows = [row for row in rows if self._order_value(row, field_path)[0]]
+
+            # Stable sorts applied from the last key to the first; mixed
+            # types are ranked by type, as in Firestore
+            for field_path, direction in reversed(self._orders):
+                rows.sort(
+                    key=lambda row: _sort_key(self._order_value(row, field_path)[1]),
+                    reverse=direction == self.DESCENDING,
+                )
+
+            if self._start_after is not None:
+                rows = [row for row in rows if self._after_cursor(row)]
+
+            if self._limit is not None:
+                rows = rows[:self._limit]
+
+            # Firestore bills at least one read per query
+            self._store.documents_read += max(len(rows), 1)
+            if self._projection is not None:
+                rows = [
+                    (document_id, {key: data[key] for key in self._projection if key in data})
+                    for document_id, data in rows
+                ]
+
+            snapshots = []
+            for key, data in rows:
+                reference = self._reference(key)
+                snapshots.append(MemoryDocumentSnapshot(
+                    reference, copy.deepcopy(data), self._store.update_times.get(reference.path),
+                ))
+
+        return iter(snapshots)
+
+    def get(self) -> List[MemoryDocumentSnapshot]:
+        return list(self.stream())
+
+
+class MemoryCollectionReference(MemoryQuery):
+    """Reference to a collection, like CollectionReference."""
+
+    def __init__(self, store: MemoryStore, collection_path: str):
+        super().__init__(store, collection_path)
+
+    @property
+    def id(self) -> str:
+        return self._collection_path.rsplit("/", 1)[-1]
+
+    def document(self, document_id: Optional[str] = None) -> MemoryDocumentReference:
+        return MemoryDocumentReference(self._store, self._collection_path, document_id or _auto_id())
+
+    def add(self, data: Dict[str, Any]) -> Tuple[datetime, MemoryDocumentReference]:
+        doc_ref = self.document()
+        doc_ref.set(data)
+        return datetime.now(timezone.utc), doc_ref
+
+    def list_documents(self) -> Iterator[MemoryDocumentReference]:
+        """List documents, including missing ones that only have subcollections."""
+        self._store.rpc("list_documents")
+        prefix = self._collection_path + "/"
+        with self._store.lock:
+            document_ids = set(self._store.documents(self._collection_path))
+            for path, documents in self._store.collections.items():
+                if documents and path.startswith(prefix):
+                    document_ids.add(path[len(prefix):].split("/", 1)[0])
+        return iter([self.document(document_id) for document_id in sorted(document_ids)])
+
+
+class MemoryWriteBatch:
+    """Atomic group of writes, like WriteBatch."""
+
+    def __init__(self, store: MemoryStore):
+        self._store = store
+        self._writes: List[Tuple[str, MemoryDocumentReference, Any, bool]] = []
+
+    def set(self, reference: MemoryDocumentReference, data: Dict[str, Any], merge: bool = False) -> None:
+        self._writes.append(("set", reference, data, merge))
+
+    def update(self, reference: MemoryDocumentReference, updates: Dict[str, Any]) -> None:
+        self._writes.append(("update", reference, updates, False))
+
+    def delete(self, reference: MemoryDocumentReference) -> None:
+        self._writes.append(("delete", reference, None, False))
+
+    def commit(self) -> List[Any]:
+        if len(self._writes) > 500:
+            raise ValueError("A write batch can contain at most 500 operations")
+
+        self._store.rpc("commit")
+        with self._store.lock:
+            # Validate first so a failing batch leaves nothing applied
+            for kind, reference, _, _ in self._writes:
+                if kind == "update":
+                    reference._check_exists()
+
+            for kind, reference, data, merge in self._writes:
+                if kind == "set":
+                    reference._set(data, merge)
+                elif kind == "update":
+                    reference._update(data)
+                else:
+                    reference._delete()
+
+        results = [None] * len(self._writes)
+        self._writes = []
+        return results
+
+
+class MemoryClient:
+    """In-memory replacement for firestore.Client."""
+
+    def __init__(self, latency_seconds: float = 0.0):
+        """
+        Initialize the client.
+
+        Args:
+            latency_seconds: Artificial delay added to every simulated RPC
+        """
+        self.store = MemoryStore(latency_seconds)
+
+    def collection(self, collection_id: str) -> MemoryCollectionReference:
+        return MemoryCollectionReference(self.store, collection_id)
+
+    def collection_group(self, collection_id: str) -> MemoryQuery:
+        return MemoryQuery(self.store, collection_id, all_descendants=True)
+
+    def document(self, document_path: str) -> MemoryDocumentReference:
+        collection_path, document_id = document_path.rsplit("/", 1)
+        return MemoryDocumentReference(self.store, collection_path, document_id)
+
+    def batch(self) -> MemoryWriteBatch:
+        return MemoryWriteBatch(self.store)
+
+    def write_option(self, last_update_time: datetime) -> MemoryWriteOption:
+        return MemoryWriteOption(last_update_time)
+
+
+class InMemoryFirestoreDB(FirestoreDB):
+    """FirestoreDB backed by MemoryClient instead of a GCP project."""
+
+    def __init__(self, latency_seconds: float = 0.0, **kwargs: Any):
+        """
+        Initialize the in-memory database.
+
+        Args:
+            latency_seconds: Artificial delay added to every simulated RPC
+            **kwargs: Passed to FirestoreDB (cache settings)
+        """
+        kwargs.setdefault("project_id", "in-memory")
+        super().__init__(**kwargs)
+        self._client = MemoryClient(latency_seconds)
+
+    def rpc_stats(self) -> Dict[str, Any]:
+        """Get simulated RPC and document counters."""
+        return self._client.store.stats()
+
+    def reset_rpc_stats(self) -> None:
+        """Zero the simulated RPC counters."""
+        self._client.store.reset_stats()
@@ -0,0 +1,227 @@
+"""
+Token revocation list, mirrored in memory.
+
+Revocations are stored in Firestore, one document per revoked token (keyed
+by its `jti`) or per user whose tokens issued before a time are revoked
+(keyed by `user:{user_id}`). Every instance keeps the live entries in two
+dicts and pulls new ones incrementally (`revoked_at` after the last sync),
+so checking a token is a dict lookup; refreshes happen in a background
+thread once the mirror is older than the refresh interval.
+
+Entries carry an `expires_at` (when the last affected token expires); the
+mirror drops them after that, and a Firestore TTL policy on the field can
+delete the documents.
+"""
+
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from google.cloud import firestore
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+from tracing import traced
+
+
+logger = logging.getLogger(__name__)
+
+
+class RevocationList:
+    """In-memory mirror of revoked token IDs and per-user revocation times."""
+
+    # Re-read entries this far behind the newest one seen, so writes from
+    # instances with slightly skewed clocks are not missed
+    SYNC_OVERLAP_SECONDS = 10.0
+
+    def __init__(
+        self,
+        get_client: Callable[[], firestore.Client],
+        collection: str,
+        refresh_interval_seconds: float = 10.0,
+    ):
+        """
+        Initialize the revocation list.
+
+        Args:
+            get_client: Callable returning the Firestore client
+            collection: Revocations collection name
+            refresh_interval_seconds: Maximum age of the mirror before a background refresh
+        """
+        self._get_client = get_client
+        self.collection = collection
+        self.refresh_interval_seconds = refresh_interval_seconds
+
+        # jti -> expires_at (epoch seconds)
+        self._tokens: Dict[str, float] = {}
+        # user_id -> (revoked_before, expires_at) (epoch seconds)
+        self._users: Dict[str, Tuple[float, float]] = {}
+
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.RLock()
+        self._synced_through: Optional[datetime] = None
+        # Time of the last refresh attempt, successful or not
+        self._refreshed_at = 0.0
+        self._refreshing = False
+
+        self.refreshes = 0
+        self.failed_refreshes = 0
+
+    def revoke_token(self, jti: str, user_id: str, expires_at: datetime) -> None:
+        """
+        Revoke a single token.
+
+        Args:
+            jti: Token ID
+            user_id: Token owner
+            expires_at: Token expiry (the entry is not needed after it)
+        """
+        now = datetime.now(timezone.utc)
+        self._get_client().collection(self.collection).document(jti).set({
+            "kind": "token",
+            "jti": jti,
+            "user_id": user_id,
+            "revoked_at": now,
+            "expires_at": expires_at,
+        })
+        with self._lock:
+            self._tokens[jti] = expires_at.timestamp()
+
+    def revoke_user(self, user_id: str, max_token_lifetime: timedelta) -> None:
+        """
+        Revoke every token issued to a user up to now.
+
+        Args:
+            user_id: User whose tokens are revoked
+            max_token_lifetime: Longest validity of a token (how long the entry matters)
+        """
+        now = datetime.now(timezone.utc)
+        # Token iat has one-second resolution: round up so a token issued
+        # earlier in this second is covered too
+        revoked_before = datetime.fromtimestamp(math.ceil(now.timestamp()), tz=timezone.utc)
+        expires_at = revoked_before + max_token_lifetime
+
+        self._get_client().collection(self.collection).document(f"user:{user_id}").set({
+            "kind": "user",
+            "user_id": user_id,
+            "revoked_before": revoked_before,
+            "revoked_at": now,
+            "expires_at": expires_at,
+        })
+        with self._lock:
+            self._users[user_id] = (revoked_before.timestamp(), expires_at.timestamp())
+
+    def is_revoked(self, jti: Optional[str], user_id: str, issued_at: datetime) -> bool:
+        """
+        Check a token against the mirror.
+
+        The first check on an instance loads the list; requests arriving
+        meanwhile wait for that load instead of repeating it. Later checks,
+        including every check after a failed first load, never wait for
+        Firestore and schedule a background refresh when due.
+
+        Args:
+            jti: Token ID (None for tokens issued without one)
+            user_id: Token owner
+            issued_at: Token iat
+
+        Returns:
+            True if the token was revoked
+        """
+        if time.monotonic() - self._refreshed_at > self.refresh_interval_seconds:
+            if self.refreshes == 0 and self.failed_refreshes == 0:
+                # Nothing loaded yet: wait for the list
+                self._load_first()
+            else:
+                self._refresh_in_background()
+
+        if jti is not None and jti in self._tokens:
+            return True
+
+        user_entry = self._users.get(user_id)
+        return user_entry is not None and issued_at.timestamp() < user_entry[0]
+
+    @traced("firestore.refresh_revocations")
+    def refresh(self) -> int:
+        """
+        Pull revocations written since the last sync and drop expired ones.
+
+        Returns:
+            Number of entries read
+        """
+        with self._refresh_lock:
+            try:
+                query = self._get_client().collection(self.collection)
+                if self._synced_through is not None:
+                    since = self._synced_through - timedelta(seconds=self.SYNC_OVERLAP_SECONDS)
+                    query = query.where(filter=FieldFilter("revoked_at", ">", since))
+                docs = [doc.to_dict() for doc in query.order_by("revoked_at").stream()]
+            except Exception:
+                logger.exception("Failed to refresh the token revocation list")
+                self.failed_refreshes += 1
+                # Keep serving the current mirror; retry after the interval
+                self._refreshed_at = time.monotonic()
+                return 0
+
+            now = time.time()
+            with self._lock:
+                for entry in docs:
+                    self._add(entry)
+                self._tokens = {jti: exp for jti, exp in self._tokens.items() if exp > now}
+                self._users = {uid: e for uid, e in self._users.items() if e[1] > now}
+
+            if docs:
+                newest = docs[-1]["revoked_at"]
+                if self._synced_through is None or newest > self._synced_through:
+                    self._synced_through = newest
+            elif self._synced_through is None:
+                self._synced_through = datetime.now(timezone.utc)
+
+            self._refreshed_at = time.monotonic()
+            self.refreshes += 1
+            return len(docs)
+
+    def _load_first(self) -> None:
+        """Load the list once, however many requests are waiting for it."""
+        with self._refresh_lock:
+            # Another request loaded the list (or failed to) while this one waited
+            if self.refreshes == 0 and self.failed_refreshes == 0:
+                self.refresh()
+
+    def _add(self, entry: Dict[str, Any]) -> None:
+        """Apply one revocation document to the mirror (caller holds the lock)."""
+        expires_at = entry["expires_at"].timestamp()
+        if entry.get("kind") == "user":
+            revoked_before = entry["revoked_before"].timestamp()
+            current = self._users.get(entry["user_id"])
+            if current is None or revoked_before > current[0]:
+                self._users[entry["user_id"]] = (revoked_before, expires_at)
+        else:
+            self._tokens[entry["jti"]] = expires_at
+
+    def _refresh_in_background(self) -> None:
+        """Start a refresh thread unless one is already running."""
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run() -> None:
+            try:
+                self.refresh()
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name="revocation-refresh", daemon=True).start()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get mirror size and refresh counters."""
+        return {
+            "revoked_tokens": len(self._tokens),
+            "revoked_users": len(self._users),
+            "refreshes": self.refreshes,
+            "failed_refreshes": self.failed_refreshes,
+            "refresh_interval_seconds": self.refresh_interval_seconds,
+        }
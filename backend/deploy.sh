@@ -35,6 +35,8 @@ ENV_VARS_FILE=".env-vars.yaml"
 # Format: "function_name:entry_point"
 # =============================================================================
 FUNCTIONS=(
+  # Consolidated entry point (all endpoints, routed by method + path)
+  "api:api"
   # Authentication
   "login:login"
   "validate:validate_session"
@@ -58,8 +60,16 @@ FUNCTIONS=(
   "track_activity:track_activity"
   "track_activity_batch:track_activity_batch"
   "get_my_activity:get_my_activity"
+  "get_my_activity_daily:get_my_activity_daily"
   "get_activity_summary:get_activity_summary"
   "get_activity_events:get_activity_events"
+  "export_activity_events:export_activity_events"
+  "get_activity_sessions:get_activity_sessions"
+  "get_activity_daily:get_activity_daily"
+  "get_activity_engagement:get_activity_engagement"
+  "get_activity_feed:get_activity_feed"
+  # Operations
+  "get_metrics:get_metrics"
 )
 
 # =============================================================================
@@ -0,0 +1,80 @@
+"""
+JSON encoding for API responses.
+
+Uses orjson when it is installed and falls back to the standard library
+otherwise. Both encoders write datetimes (including Firestore's
+DatetimeWithNanoseconds) as ISO 8601 strings and anything else they do not
+know with str().
+
+Usage:
+    from json_encoding import dumps
+
+    body = dumps({"created_at": datetime.now(timezone.utc)})
+"""
+
+import json
+from datetime import date, datetime
+from typing import Any, Callable
+
+from tracing import span
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the deployment
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    """Serialize values the encoders do not handle natively."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _dumps_stdlib(data: Any) -> str:
+    return json.dumps(data, default=_default)
+
+
+def _dumps_orjson(data: Any) -> str:
+    # Firestore timestamps are datetime subclasses, which orjson hands to
+    # `default` rather than serializing natively
+    return orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+
+ENCODERS = {"json": _dumps_stdlib}
+if orjson is not None:
+    ENCODERS["orjson"] = _dumps_orjson
+
+ENCODER_NAME = "orjson" if orjson is not None else "json"
+_dumps: Callable[[Any], str] = ENCODERS[ENCODER_NAME]
+
+
+def dumps(data: Any) -> str:
+    """
+    Serialize a response body with the active encoder.
+
+    Args:
+        data: JSON-compatible data (datetimes allowed)
+
+    Returns:
+        JSON string
+    """
+    with span("json.encode"):
+        return _dumps(data)
+
+
+def set_encoder(name: str) -> None:
+    """
+    Select the response encoder.
+
+    Args:
+        name: One of ENCODERS ("json", or "orjson" if installed)
+
+    Raises:
+        ValueError: If the encoder is unknown or not installed
+    """
+    global _dumps, ENCODER_NAME
+    if name not in ENCODERS:
+        raise ValueError(f"Unknown or unavailable JSON encoder: {name}")
+    _dumps = ENCODERS[name]
+    ENCODER_NAME = name
@@ -1,13 +1,19 @@
 """
 Main entry point for GCP Cloud Functions.
 All HTTP function handlers are defined here.
+
+Each handler can be deployed as its own function (legacy targets), or all of
+them can be served by the single `api` target, which routes by method + path.
 """
 
 import functions_framework
-from flask import jsonify, Request
-from functools import wraps
-from typing import Callable, Any, Tuple, Optional
-import json
+import logging
+import os
+import threading
+from datetime import date, datetime, timedelta, timezone
+from flask import jsonify, Request, after_this_request
+from functools import lru_cache, wraps
+from typing import Callable, Any, Dict, Tuple, Optional
 
 from auth import (
     create_access_token,
@@ -15,50 +21,178 @@ from auth import (
     decode_token,
     hash_password,
     verify_password,
+    get_jwt_expiration_hours,
+    password_hash_stats,
+    set_revocation_check,
+    token_cache_stats,
     TokenPayload,
+    PasswordHashBusy,
+    preload_auth,
 )
-from database import get_db
+from activity_export import EXPORT_FORMATS
+from database import StateConflict, get_db
+from json_encoding import dumps
+from router import Router
 from secret_manager import get_secret
+from tracing import end_trace, start_trace, tracing_enabled, SERVER_TIMING_ENABLED, TRACE_LOG_ENABLED
+
+
+logger = logging.getLogger(__name__)
+
+# Route table for the consolidated `api` entry point
+router = Router()
+
+# decode_token rejects tokens revoked by logout or deactivation (checked in memory)
+set_revocation_check(
+    lambda payload: get_db().is_token_revoked(payload.jti, payload.user_id, payload.iat)
+)
+
+
+def warm_up() -> None:
+    """
+    Open the Firestore channel and load the libraries deferred at import.
+    
+    Runs in a background thread while the instance starts, so the first
+    request does not pay for the client library import, credentials, the
+    gRPC handshake or the first revocation list load. Requests arriving
+    earlier wait on the same locks instead of duplicating the work.
+    """
+    try:
+        get_db().warm_up()
+        preload_auth()
+    except Exception:
+        # Requests initialize whatever is still missing on their own
+        logger.exception("Startup warm-up failed")
+
+
+if os.getenv("STARTUP_WARMUP", "true").lower() == "true":
+    threading.Thread(target=warm_up, name="startup-warm-up", daemon=True).start()
+
+# Date-range limits for activity rollup queries (one read per day)
+DEFAULT_RANGE_DAYS = 30
+MAX_RANGE_DAYS = 366
+
+# Largest page accepted by paginated listings
+MAX_PAGE_SIZE = 500
+
+# How long browsers and CDNs may reuse the public demo catalog
+DEMO_CATALOG_MAX_AGE_SECONDS = 60
+
+
+@router.use
+def trace_request(request: Request, handler: Callable) -> Any:
+    """
+    Trace hot-path spans for the request when SERVER_TIMING or TRACE_LOG is set.
+    
+    Adds Server-Timing and X-Request-ID headers and/or writes one structured
+    log line per request. The request ID is taken from X-Cloud-Trace-Context
+    or X-Request-ID when the caller sent one.
+    """
+    if not tracing_enabled():
+        return handler(request)
+    
+    request_id = (
+        request.headers.get("X-Cloud-Trace-Context", "").split("/")[0]
+        or request.headers.get("X-Request-ID")
+    )
+    trace = start_trace(request_id)
+    try:
+        response = handler(request)
+    finally:
+        end_trace()
+    
+    status = response[1] if isinstance(response, tuple) and len(response) == 3 else None
+    if TRACE_LOG_ENABLED:
+        trace.log(method=request.method, path=request.path, status=status)
+    
+    if status is None:
+        return response
+    
+    body, status, headers = response
+    headers = {**headers, "X-Request-ID": trace.request_id}
+    if SERVER_TIMING_ENABLED:
+        headers["Server-Timing"] = trace.server_timing()
+        headers["Access-Control-Expose-Headers"] = "Server-Timing, X-Request-ID"
+        headers["Timing-Allow-Origin"] = headers.get("Access-Control-Allow-Origin", "*")
+    return body, status, headers
+
+
+@router.use
+def flush_audit_log_after_response(request: Request, handler: Callable) -> Any:
+    """
+    Commit audit-log entries buffered by the handler once the response is sent.
+    
+    Keeps the audit write off the request's critical path; the writer's own
+    size/time thresholds and shutdown flush cover anything this misses.
+    """
+    response = handler(request)
+    
+    db = get_db()
+    if db.audit_log.pending:
+        @after_this_request
+        def register_flush(flask_response):
+            flask_response.call_on_close(db.flush_audit_log)
+            return flask_response
+    
+    return response
 
 
 # ============================================
 # CORS and Response Helpers
 # ============================================
 
+@lru_cache(maxsize=4)
+def _cors_header_sets(origins: str) -> Tuple[Dict[str, dict], dict]:
+    """
+    Precompute CORS headers for a CORS_ORIGINS value.
+    
+    Keyed by the raw secret value, so a rotated CORS_ORIGINS yields a new
+    set while unchanged config is computed once.
+    
+    Returns:
+        Tuple of (headers per allowed origin, headers for any other origin)
+    """
+    allowed_origins = [o.strip() for o in origins.split(",")]
+    
+    def headers_for(origin: str) -> dict:
+        return {
+            "Access-Control-Allow-Origin": origin,
+            "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
+            "Access-Control-Allow-Headers": "Content-Type, Authorization",
+            "Access-Control-Allow-Credentials": "true",
+            "Access-Control-Max-Age": "3600",
+        }
+    
+    by_origin = {origin: headers_for(origin) for origin in allowed_origins}
+    # Fallback to first origin if request origin not in allowed list
+    return by_origin, by_origin[allowed_origins[0]]
+
+
 def get_cors_headers(request: Request = None) -> dict:
     """Get CORS headers for responses.
     
     Dynamically sets Access-Control-Allow-Origin based on the request's
     Origin header if it matches one of the allowed origins.
     This is required when using credentials (cookies, auth headers).
+    
+    The returned dict is shared between requests; copy it before changing it.
     """
     origins = get_secret("CORS_ORIGINS", default="http://localhost:8080")
-    allowed_origins = [o.strip() for o in origins.split(",")]
+    by_origin, fallback = _cors_header_sets(origins)
     
     # Determine which origin to allow based on the request
-    origin = None
     if request:
-        request_origin = request.headers.get("Origin", "")
-        if request_origin in allowed_origins:
-            origin = request_origin
-    
-    # Fallback to first origin if request origin not in allowed list
-    if not origin:
-        origin = allowed_origins[0]
+        headers = by_origin.get(request.headers.get("Origin", ""))
+        if headers is not None:
+            return headers
     
-    return {
-        "Access-Control-Allow-Origin": origin,
-        "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
-        "Access-Control-Allow-Headers": "Content-Type, Authorization",
-        "Access-Control-Allow-Credentials": "true",
-        "Access-Control-Max-Age": "3600",
-    }
+    return fallback
 
 
 def cors_response(data: Any, status: int = 200, request: Request = None) -> Tuple[str, int, dict]:
     """Create a response with CORS headers."""
     return (
-        json.dumps(data, default=str),
+        dumps(data),
         status,
         {**get_cors_headers(request), "Content-Type": "application/json"},
     )
@@ -77,6 +211,223 @@ def success_response(data: Any = None, message: str = "Success", request: Reques
     return cors_response(response, 200, request)
 
 
+def accepted_response(data: Any = None, message: str = "Accepted", request: Request = None) -> Tuple[str, int, dict]:
+    """Create a 202 response for work that completes in the background."""
+    response = {"success": True, "message": message}
+    if data is not None:
+        response["data"] = data
+    return cors_response(response, 202, request)
+
+
+# ============================================
+# Request Helpers
+# ============================================
+
+def get_path_param(request: Request, name: str, position: int = -1) -> Optional[str]:
+    """
+    Get a path parameter from the request.
+    
+    Requests dispatched through the `api` entry point carry the parameters
+    extracted by the router. Legacy per-function targets only see the path
+    after the function name, so the parameter is read from its position.
+    
+    Args:
+        request: Incoming request
+        name: Path parameter name (e.g., 'user_id')
+        position: Path segment index used by legacy per-function targets
+        
+    Returns:
+        Parameter value or None if missing
+    """
+    path_params = getattr(request, "path_params", None)
+    if path_params is not None:
+        return path_params.get(name)
+    
+    path_parts = [part for part in request.path.split("/") if part]
+    if len(path_parts) < abs(position):
+        return None
+    return path_parts[position]
+
+
+def get_date_range(request: Request) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """
+    Get the `start`/`end` date range from the query string.
+    
+    Both are YYYY-MM-DD and inclusive. `end` defaults to today (UTC) and
+    `start` to DEFAULT_RANGE_DAYS before it.
+    
+    Args:
+        request: Incoming request
+        
+    Returns:
+        Tuple of (start_date, end_date, error message or None)
+    """
+    try:
+        end = request.args.get("end")
+        end_date = date.fromisoformat(end) if end else datetime.now(timezone.utc).date()
+        start = request.args.get("start")
+        start_date = date.fromisoformat(start) if start else end_date - timedelta(days=DEFAULT_RANGE_DAYS - 1)
+    except ValueError:
+        return None, None, "start and end must be dates in YYYY-MM-DD format"
+    
+    if start_date > end_date:
+        return None, None, "start must not be after end"
+    
+    if (end_date - start_date).days + 1 > MAX_RANGE_DAYS:
+        return None, None, f"Date range cannot exceed {MAX_RANGE_DAYS} days"
+    
+    return start_date.isoformat(), end_date.isoformat(), None
+
+
+def get_time_range(request: Request) -> Tuple[Optional[datetime], Optional[datetime], Optional[str]]:
+    """
+    Get an optional `start`/`end` time range from the query string.
+    
+    Both are ISO 8601 timestamps (UTC unless an offset is given) and
+    inclusive. A plain YYYY-MM-DD `end` covers that whole day.
+    
+    Args:
+        request: Incoming request
+        
+    Returns:
+        Tuple of (start_time, end_time, error message or None)
+    """
+    def parse(value: Optional[str], end_of_day: bool) -> Optional[datetime]:
+        if not value:
+            return None
+        parsed = datetime.fromisoformat(value)
+        if end_of_day and len(value) == 10:
+            parsed += timedelta(days=1, microseconds=-1)
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+    
+    try:
+        start_time = parse(request.args.get("start"), end_of_day=False)
+        end_time = parse(request.args.get("end"), end_of_day=True)
+    except ValueError:
+        return None, None, "start and end must be ISO 8601 timestamps"
+    
+    if start_time and end_time and start_time > end_time:
+        return None, None, "start must not be after end"
+    
+    return start_time, end_time, None
+
+
+def get_page_params(
+    request: Request,
+    default_limit: Optional[int],
+    max_limit: int,
+) -> Tuple[Optional[int], Optional[str], Optional[str]]:
+    """
+    Get `limit`/`cursor` pagination params from the query string.
+    
+    Args:
+        request: Incoming request
+        default_limit: Page size when no limit is given (None for unpaged)
+        max_limit: Largest accepted page size
+        
+    Returns:
+        Tuple of (limit, cursor, error message or None)
+    """
+    cursor = request.args.get("cursor") or None
+    limit = request.args.get("limit")
+    
+    if limit is None:
+        # A cursor always continues a paged listing
+        if default_limit is None and cursor:
+            default_limit = max_limit
+        return default_limit, cursor, None
+    
+    try:
+        limit = int(limit)
+    except ValueError:
+        return None, None, "limit must be an integer"
+    
+    if limit < 1:
+        return None, None, "limit must be at least 1"
+    
+    return min(limit, max_limit), cursor, None
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Check the request's If-None-Match header against an ETag.
+    
+    Args:
+        request: Incoming request
+        etag: Current quoted ETag of the resource
+        
+    Returns:
+        True if the client's cached copy is current (respond 304)
+    """
+    if_none_match = request.headers.get("If-None-Match")
+    if not if_none_match:
+        return False
+    
+    if if_none_match.strip() == "*":
+        return True
+    
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def get_current_user(user_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Get a user's record, no older than their current permission version.
+    
+    The cached record is used unless its perm_version is behind the one in
+    the bulk-refreshed version map, in which case it is re-read.
+    
+    Args:
+        user_id: User's unique identifier
+        
+    Returns:
+        User record, or None if the user does not exist
+    """
+    db = get_db()
+    user = db.get_user_by_id(user_id)
+    state = db.get_permission_state(user_id)
+    if user and state is not None and user.get("perm_version", 0) < state[0]:
+        user = db.get_user_by_id(user_id, use_cache=False)
+    return user
+
+
+def get_current_access(payload: TokenPayload) -> Optional[Dict[str, Any]]:
+    """
+    Get a token holder's current demo access.
+    
+    Answered from the token's claims while its perm_version matches the
+    user's current one (from the bulk-refreshed version map). The user
+    record is only read when the claims are stale or the user is not in
+    the map yet.
+    
+    Args:
+        payload: Verified token payload
+        
+    Returns:
+        Dict with "access" and "quick_access", or None if the user is
+        missing or inactive
+    """
+    db = get_db()
+    state = db.get_permission_state(payload.user_id)
+    
+    if state is not None:
+        perm_version, is_active = state
+        if not is_active:
+            return None
+        if perm_version == payload.perm_version and payload.quick_access is not None:
+            return {"access": payload.access, "quick_access": payload.quick_access}
+    
+    user = get_current_user(payload.user_id)
+    if not user or not user.get("is_active", True):
+        return None
+    
+    return {
+        "access": user.get("access", []),
+        "quick_access": user.get("quick_access", True),
+    }
+
+
 # ============================================
 # Authentication Decorators
 # ============================================
@@ -125,6 +476,7 @@ def require_admin(f: Callable) -> Callable:
 # ============================================
 
 @functions_framework.http
+@router.route("POST", "/auth/login")
 def login(request: Request) -> Tuple[str, int, dict]:
     """
     Authenticate user and return JWT token.
@@ -155,9 +507,9 @@ def login(request: Request) -> Tuple[str, int, dict]:
     # Normalize user_id (lowercase, replace spaces with hyphens)
     user_id = user_id.replace(" ", "-")
     
-    # Get user from database
+    # Get user from database (the token's claims are minted from it)
     db = get_db()
-    user = db.get_user_by_id(user_id)
+    user = get_current_user(user_id)
     
     if not user:
         # Log failed attempt
@@ -166,6 +518,7 @@ def login(request: Request) -> Tuple[str, int, dict]:
             user_id=user_id,
             details={"reason": "user_not_found"},
             ip_address=request.remote_addr,
+            sync=True,
         )
         return error_response("Invalid credentials", 401, request)
     
@@ -175,16 +528,23 @@ def login(request: Request) -> Tuple[str, int, dict]:
             user_id=user_id,
             details={"reason": "account_disabled"},
             ip_address=request.remote_addr,
+            sync=True,
         )
         return error_response("Account is disabled", 401, request)
     
     # Verify password
-    if not verify_password(password, user.get("password_hash", "")):
+    try:
+        password_ok = verify_password(password, user.get("password_hash", ""))
+    except PasswordHashBusy:
+        return error_response("Server busy, please retry", 503, request)
+    
+    if not password_ok:
         db.log_action(
             action="login_failed",
             user_id=user_id,
             details={"reason": "invalid_password"},
             ip_address=request.remote_addr,
+            sync=True,
         )
         return error_response("Invalid credentials", 401, request)
     
@@ -194,6 +554,8 @@ def login(request: Request) -> Tuple[str, int, dict]:
         name=user.get("name", user_id),
         access=user.get("access", []),
         is_admin=user.get("is_admin", False),
+        quick_access=user.get("quick_access", True),
+        perm_version=user.get("perm_version", 0),
     )
     
     # Update last login
@@ -204,6 +566,7 @@ def login(request: Request) -> Tuple[str, int, dict]:
         action="login_success",
         user_id=user_id,
         ip_address=request.remote_addr,
+        sync=True,
     )
     
     return success_response(
@@ -223,6 +586,7 @@ def login(request: Request) -> Tuple[str, int, dict]:
 
 
 @functions_framework.http
+@router.route("POST", "/auth/validate")
 def validate_session(request: Request) -> Tuple[str, int, dict]:
     """
     Validate JWT token and return user info.
@@ -246,10 +610,9 @@ def validate_session(request: Request) -> Tuple[str, int, dict]:
     if not payload:
         return error_response("Invalid or expired token", 401, request)
     
-    # Get fresh quick_access from database
-    db = get_db()
-    user = db.get_user_by_id(payload.user_id)
-    quick_access = user.get("quick_access", True) if user else True
+    # Current quick_access (from claims unless permissions changed)
+    current = get_current_access(payload)
+    quick_access = current["quick_access"] if current else True
     
     return success_response(
         data={
@@ -268,9 +631,10 @@ def validate_session(request: Request) -> Tuple[str, int, dict]:
 
 
 @functions_framework.http
+@router.route("POST", "/auth/logout")
 def logout(request: Request) -> Tuple[str, int, dict]:
     """
-    Logout user (for audit logging purposes).
+    Logout user: revoke the token and record the logout.
     
     POST /auth/logout
     Headers: Authorization: Bearer <token>
@@ -286,10 +650,14 @@ def logout(request: Request) -> Tuple[str, int, dict]:
         payload = decode_token(token)
         if payload:
             db = get_db()
+            # Tokens issued before jti was added cannot be revoked one by one
+            if payload.jti:
+                db.revoke_token(payload.jti, payload.user_id, payload.exp)
             db.log_action(
                 action="logout",
                 user_id=payload.user_id,
                 ip_address=request.remote_addr,
+                sync=True,
             )
     
     return success_response(message="Logged out successfully", request=request)
@@ -300,6 +668,7 @@ def logout(request: Request) -> Tuple[str, int, dict]:
 # ============================================
 
 @functions_framework.http
+@router.route("GET", "/users/access")
 def get_user_access(request: Request) -> Tuple[str, int, dict]:
     """
     Get list of demos the authenticated user can access.
@@ -321,23 +690,16 @@ def get_user_access(request: Request) -> Tuple[str, int, dict]:
     if not payload:
         return error_response("Invalid or expired token", 401, request)
     
-    # Get fresh user data from database
-    db = get_db()
-    user = db.get_user_by_id(payload.user_id)
-    
-    if not user or not user.get("is_active", True):
+    # Current permissions (from claims unless they changed since login)
+    current = get_current_access(payload)
+    if current is None:
         return error_response("User not found or inactive", 401, request)
     
-    return success_response(
-        data={
-            "access": user.get("access", []),
-            "quick_access": user.get("quick_access", True),
-        },
-        request=request,
-    )
+    return success_response(data=current, request=request)
 
 
 @functions_framework.http
+@router.route("POST", "/users/check-access")
 def check_demo_access(request: Request) -> Tuple[str, int, dict]:
     """
     Check if user can access a specific demo.
@@ -371,15 +733,14 @@ def check_demo_access(request: Request) -> Tuple[str, int, dict]:
     if not demo_id:
         return error_response("demo_id is required", 400, request)
     
-    # Get fresh user data from database to check current permissions
-    db = get_db()
-    user = db.get_user_by_id(payload.user_id)
-    
-    if not user or not user.get("is_active", True):
+    # Current permissions (from claims unless they changed since login)
+    current = get_current_access(payload)
+    if current is None:
         return error_response("User not found or inactive", 401, request)
     
-    user_access = user.get("access", [])
-    allowed = demo_id in user_access
+    allowed = demo_id in current["access"]
+    
+    db = get_db()
     
     # Log access attempt for audit
     db.log_action(
@@ -408,6 +769,7 @@ def check_demo_access(request: Request) -> Tuple[str, int, dict]:
 # ============================================
 
 @functions_framework.http
+@router.route("POST", "/admin/users")
 def create_user(request: Request) -> Tuple[str, int, dict]:
     """
     Create a new user (admin only).
@@ -470,7 +832,11 @@ def create_user(request: Request) -> Tuple[str, int, dict]:
         return error_response(f"User '{user_id}' already exists", 409, request)
     
     # Create user
-    password_hash = hash_password(password)
+    try:
+        password_hash = hash_password(password)
+    except PasswordHashBusy:
+        return error_response("Server busy, please retry", 503, request)
+    
     user = db.create_user(
         user_id=user_id,
         name=name,
@@ -489,6 +855,7 @@ def create_user(request: Request) -> Tuple[str, int, dict]:
         user_id=payload.user_id,
         details={"created_user": user_id},
         ip_address=request.remote_addr,
+        sync=True,
     )
     
     # Remove password hash from response
@@ -498,12 +865,16 @@ def create_user(request: Request) -> Tuple[str, int, dict]:
 
 
 @functions_framework.http
+@router.route("GET", "/admin/users")
 def list_users(request: Request) -> Tuple[str, int, dict]:
     """
     List all users (admin only).
     
     GET /admin/users
-    Query params: include_inactive=true (optional)
+    Query params:
+        - include_inactive: true to include inactive users
+        - limit: Page size (max 500); all users are returned without it
+        - cursor: next_cursor from the previous page
     """
     if request.method == "OPTIONS":
         return cors_response({}, 204, request)
@@ -525,13 +896,28 @@ def list_users(request: Request) -> Tuple[str, int, dict]:
     
     include_inactive = request.args.get("include_inactive", "false").lower() == "true"
     
+    limit, cursor, error = get_page_params(request, default_limit=None, max_limit=MAX_PAGE_SIZE)
+    if error:
+        return error_response(error, 400, request)
+    
     db = get_db()
-    users = db.list_users(include_inactive=include_inactive)
+    try:
+        users, next_cursor = db.list_users_page(
+            include_inactive=include_inactive,
+            limit=limit,
+            cursor=cursor,
+        )
+    except ValueError as e:
+        return error_response(str(e), 400, request)
     
-    return success_response(data={"users": users, "count": len(users)}, request=request)
+    return success_response(
+        data={"users": users, "count": len(users), "next_cursor": next_cursor},
+        request=request,
+    )
 
 
 @functions_framework.http
+@router.route("PUT", "/admin/users/<user_id>")
 def update_user(request: Request) -> Tuple[str, int, dict]:
     """
     Update a user (admin only).
@@ -565,11 +951,9 @@ def update_user(request: Request) -> Tuple[str, int, dict]:
         return error_response("Admin privileges required", 403, request)
     
     # Get user_id from path
-    # In GCP Cloud Functions, path params need to be extracted from the path
-    path_parts = request.path.rstrip("/").split("/")
-    if len(path_parts) < 1:
+    user_id = get_path_param(request, "user_id")
+    if not user_id:
         return error_response("user_id is required in path", 400, request)
-    user_id = path_parts[-1]
     
     try:
         body = request.get_json(silent=True) or {}
@@ -578,11 +962,6 @@ def update_user(request: Request) -> Tuple[str, int, dict]:
     
     db = get_db()
     
-    # Check if user exists
-    existing = db.get_user_by_id(user_id)
-    if not existing:
-        return error_response(f"User '{user_id}' not found", 404, request)
-    
     # Build updates
     updates = {}
     if "name" in body:
@@ -590,7 +969,10 @@ def update_user(request: Request) -> Tuple[str, int, dict]:
     if "password" in body:
         if len(body["password"]) < 8:
             return error_response("password must be at least 8 characters", 400, request)
-        updates["password_hash"] = hash_password(body["password"])
+        try:
+            updates["password_hash"] = hash_password(body["password"])
+        except PasswordHashBusy:
+            return error_response("Server busy, please retry", 503, request)
     if "access" in body:
         if not isinstance(body["access"], list):
             return error_response("access must be a list", 400, request)
@@ -605,8 +987,14 @@ def update_user(request: Request) -> Tuple[str, int, dict]:
     if not updates:
         return error_response("No valid fields to update", 400, request)
     
-    # Update user
+    # Update user (fails if the user does not exist)
     updated_user = db.update_user(user_id, updates)
+    if updated_user is None:
+        return error_response(f"User '{user_id}' not found", 404, request)
+    
+    # A deactivated user is signed out everywhere
+    if updates.get("is_active") is False:
+        db.revoke_user_tokens(user_id, timedelta(hours=get_jwt_expiration_hours()))
     
     # Log action
     db.log_action(
@@ -614,6 +1002,7 @@ def update_user(request: Request) -> Tuple[str, int, dict]:
         user_id=payload.user_id,
         details={"updated_user": user_id, "fields": list(updates.keys())},
         ip_address=request.remote_addr,
+        sync=True,
     )
     
     # Remove sensitive data
@@ -623,6 +1012,7 @@ def update_user(request: Request) -> Tuple[str, int, dict]:
 
 
 @functions_framework.http
+@router.route("DELETE", "/admin/users/<user_id>")
 def delete_user(request: Request) -> Tuple[str, int, dict]:
     """
     Deactivate a user (soft delete - admin only).
@@ -649,10 +1039,9 @@ def delete_user(request: Request) -> Tuple[str, int, dict]:
         return error_response("Admin privileges required", 403, request)
     
     # Get user_id from path
-    path_parts = request.path.rstrip("/").split("/")
-    if len(path_parts) < 1:
+    user_id = get_path_param(request, "user_id")
+    if not user_id:
         return error_response("user_id is required in path", 400, request)
-    user_id = path_parts[-1]
     
     # Prevent self-deactivation
     if user_id == payload.user_id:
@@ -660,16 +1049,15 @@ def delete_user(request: Request) -> Tuple[str, int, dict]:
     
     db = get_db()
     
-    # Check if user exists
-    user = db.get_user_by_id(user_id)
-    if not user:
-        return error_response(f"User '{user_id}' not found", 404, request)
-    
-    if not user.get("is_active", True):
+    # Soft delete: just deactivate the user (keep all data and logs)
+    try:
+        if not db.deactivate_user(user_id):
+            return error_response(f"User '{user_id}' not found", 404, request)
+    except StateConflict:
         return error_response(f"User '{user_id}' is already deactivated", 400, request)
     
-    # Soft delete: just deactivate the user (keep all data and logs)
-    db.update_user(user_id, {"is_active": False})
+    # Sign the user out everywhere
+    db.revoke_user_tokens(user_id, timedelta(hours=get_jwt_expiration_hours()))
     
     # Log action
     db.log_action(
@@ -677,12 +1065,14 @@ def delete_user(request: Request) -> Tuple[str, int, dict]:
         user_id=payload.user_id,
         details={"deactivated_user": user_id},
         ip_address=request.remote_addr,
+        sync=True,
     )
     
     return success_response(message=f"User '{user_id}' deactivated successfully. All data and activity logs are preserved.", request=request)
 
 
 @functions_framework.http
+@router.route("POST", "/admin/users/<user_id>/reactivate")
 def reactivate_user(request: Request) -> Tuple[str, int, dict]:
     """
     Reactivate a deactivated user (admin only).
@@ -708,23 +1098,18 @@ def reactivate_user(request: Request) -> Tuple[str, int, dict]:
         return error_response("Admin privileges required", 403, request)
     
     # Get user_id from path
-    path_parts = request.path.rstrip("/").split("/")
-    if len(path_parts) < 2:
+    user_id = get_path_param(request, "user_id", position=-2)
+    if not user_id:
         return error_response("user_id is required in path", 400, request)
-    user_id = path_parts[-2]  # /admin/users/{user_id}/reactivate
     
     db = get_db()
     
-    # Check if user exists
-    user = db.get_user_by_id(user_id)
-    if not user:
-        return error_response(f"User '{user_id}' not found", 404, request)
-    
-    if user.get("is_active", True):
-        return error_response(f"User '{user_id}' is already active", 400, request)
-    
     # Reactivate the user
-    db.update_user(user_id, {"is_active": True})
+    try:
+        if not db.reactivate_user(user_id):
+            return error_response(f"User '{user_id}' not found", 404, request)
+    except StateConflict:
+        return error_response(f"User '{user_id}' is already active", 400, request)
     
     # Log action
     db.log_action(
@@ -732,6 +1117,7 @@ def reactivate_user(request: Request) -> Tuple[str, int, dict]:
         user_id=payload.user_id,
         details={"reactivated_user": user_id},
         ip_address=request.remote_addr,
+        sync=True,
     )
     
     return success_response(message=f"User '{user_id}' reactivated successfully", request=request)
@@ -742,6 +1128,7 @@ def reactivate_user(request: Request) -> Tuple[str, int, dict]:
 # ============================================
 
 @functions_framework.http
+@router.route("POST", "/activity/track")
 def track_activity(request: Request) -> Tuple[str, int, dict]:
     """
     Track user activity events from the frontend.
@@ -756,6 +1143,9 @@ def track_activity(request: Request) -> Tuple[str, int, dict]:
         "data": { ... event-specific data ... }
     }
     
+    With ACTIVITY_INGEST=spool the event is queued and the response is
+    202 Accepted; it is written to Firestore in the background.
+    
     Event Types:
         - session_start: User started a new session
         - session_end: User ended session {duration_seconds: number}
@@ -813,9 +1203,34 @@ def track_activity(request: Request) -> Tuple[str, int, dict]:
     page_url = body.get("page_url")
     demo_id = body.get("demo_id")
     event_data = body.get("data", {})
+    event = {
+        "event_type": event_type,
+        "data": event_data,
+        "page_url": page_url,
+        "demo_id": demo_id,
+        "session_id": session_id,
+    }
     
     db = get_db()
     
+    error = db.validate_activity_event(event)
+    if error:
+        return error_response(error, 400, request)
+    
+    # Spool mode: accept now, write to Firestore in the background
+    if db.activity_queue is not None:
+        event_ids, _ = db.activity_queue.enqueue(
+            user_id=payload.user_id,
+            events=[event],
+            ip_address=request.remote_addr,
+            user_agent=request.headers.get("User-Agent"),
+        )
+        return accepted_response(
+            data={"event_id": event_ids[0]},
+            message="Activity accepted",
+            request=request,
+        )
+    
     # Log the activity event
     event_id = db.log_user_activity(
         user_id=payload.user_id,
@@ -836,6 +1251,7 @@ def track_activity(request: Request) -> Tuple[str, int, dict]:
 
 
 @functions_framework.http
+@router.route("POST", "/activity/track-batch")
 def track_activity_batch(request: Request) -> Tuple[str, int, dict]:
     """
     Track multiple activity events at once (for batching/efficiency).
@@ -848,6 +1264,9 @@ def track_activity_batch(request: Request) -> Tuple[str, int, dict]:
             ...
         ]
     }
+    
+    With ACTIVITY_INGEST=spool the events are queued and the response is
+    202 Accepted; they are written to Firestore in the background.
     """
     if request.method == "OPTIONS":
         return cors_response({}, 204, request)
@@ -876,29 +1295,37 @@ def track_activity_batch(request: Request) -> Tuple[str, int, dict]:
         return error_response("Maximum 100 events per batch", 400, request)
     
     db = get_db()
-    event_ids = []
-    errors = []
     
-    for i, event in enumerate(events):
-        try:
-            event_type = event.get("event_type", "")
-            if not event_type:
-                errors.append({"index": i, "error": "event_type is required"})
-                continue
-            
-            event_id = db.log_user_activity(
-                user_id=payload.user_id,
-                event_type=event_type,
-                event_data=event.get("data", {}),
-                page_url=event.get("page_url"),
-                demo_id=event.get("demo_id"),
-                session_id=event.get("session_id"),
-                ip_address=request.remote_addr,
-                user_agent=request.headers.get("User-Agent"),
+    # Spool mode: accept now, write to Firestore in the background
+    if db.activity_queue is not None:
+        event_ids, errors = db.activity_queue.enqueue(
+            user_id=payload.user_id,
+            events=events,
+            ip_address=request.remote_addr,
+            user_agent=request.headers.get("User-Agent"),
+        )
+        if not event_ids:
+            return cors_response(
+                {"error": "No valid events", "errors": errors, "success": False},
+                400,
+                request,
             )
-            event_ids.append(event_id)
-        except Exception as e:
-            errors.append({"index": i, "error": str(e)})
+        return accepted_response(
+            data={
+                "tracked_count": len(event_ids),
+                "event_ids": event_ids,
+                "errors": errors if errors else None,
+            },
+            message=f"Accepted {len(event_ids)} events",
+            request=request,
+        )
+    
+    event_ids, errors = db.log_user_activity_batch(
+        user_id=payload.user_id,
+        events=events,
+        ip_address=request.remote_addr,
+        user_agent=request.headers.get("User-Agent"),
+    )
     
     return success_response(
         data={
@@ -912,6 +1339,7 @@ def track_activity_batch(request: Request) -> Tuple[str, int, dict]:
 
 
 @functions_framework.http
+@router.route("GET", "/admin/activity/<user_id>/summary")
 def get_activity_summary(request: Request) -> Tuple[str, int, dict]:
     """
     Get activity summary for a user (admin only).
@@ -938,10 +1366,9 @@ def get_activity_summary(request: Request) -> Tuple[str, int, dict]:
         return error_response("Admin privileges required", 403, request)
     
     # Get user_id from path
-    path_parts = request.path.rstrip("/").split("/")
-    if len(path_parts) < 2:
+    user_id = get_path_param(request, "user_id", position=-2)
+    if not user_id:
         return error_response("user_id is required in path", 400, request)
-    user_id = path_parts[-2]  # /admin/activity/{user_id}/summary
     
     db = get_db()
     
@@ -970,6 +1397,7 @@ def get_activity_summary(request: Request) -> Tuple[str, int, dict]:
 
 
 @functions_framework.http
+@router.route("GET", "/admin/activity/<user_id>/events")
 def get_activity_events(request: Request) -> Tuple[str, int, dict]:
     """
     Get activity events for a user (admin only).
@@ -978,9 +1406,12 @@ def get_activity_events(request: Request) -> Tuple[str, int, dict]:
     Headers: Authorization: Bearer <token>
     Query params:
         - limit: Max events to return (default 100, max 500)
+        - cursor: next_cursor from the previous page
         - event_type: Filter by event type
         - demo_id: Filter by demo ID
         - session_id: Filter by session ID
+        - start, end: Optional ISO 8601 time range (inclusive); only the
+          monthly event partitions inside it are read
     """
     if request.method == "OPTIONS":
         return cors_response({}, 204, request)
@@ -1001,13 +1432,17 @@ def get_activity_events(request: Request) -> Tuple[str, int, dict]:
         return error_response("Admin privileges required", 403, request)
     
     # Get user_id from path
-    path_parts = request.path.rstrip("/").split("/")
-    if len(path_parts) < 2:
+    user_id = get_path_param(request, "user_id", position=-2)
+    if not user_id:
         return error_response("user_id is required in path", 400, request)
-    user_id = path_parts[-2]  # /admin/activity/{user_id}/events
     
     # Parse query params
-    limit = min(int(request.args.get("limit", 100)), 500)
+    limit, cursor, error = get_page_params(request, default_limit=100, max_limit=MAX_PAGE_SIZE)
+    if error:
+        return error_response(error, 400, request)
+    start_time, end_time, error = get_time_range(request)
+    if error:
+        return error_response(error, 400, request)
     event_type = request.args.get("event_type")
     demo_id = request.args.get("demo_id")
     session_id = request.args.get("session_id")
@@ -1020,31 +1455,44 @@ def get_activity_events(request: Request) -> Tuple[str, int, dict]:
         return error_response(f"User '{user_id}' not found", 404, request)
     
     # Get events
-    events = db.get_user_events(
-        user_id=user_id,
-        limit=limit,
-        event_type=event_type,
-        demo_id=demo_id,
-        session_id=session_id,
-    )
+    try:
+        events, next_cursor = db.get_user_events_page(
+            user_id=user_id,
+            limit=limit,
+            cursor=cursor,
+            event_type=event_type,
+            demo_id=demo_id,
+            session_id=session_id,
+            start_time=start_time,
+            end_time=end_time,
+        )
+    except ValueError as e:
+        return error_response(str(e), 400, request)
     
     return success_response(
         data={
             "user_id": user_id,
             "events": events,
             "count": len(events),
+            "next_cursor": next_cursor,
         },
         request=request,
     )
 
 
 @functions_framework.http
-def get_my_activity(request: Request) -> Tuple[str, int, dict]:
+@router.route("GET", "/admin/activity/<user_id>/sessions")
+def get_activity_sessions(request: Request) -> Tuple[str, int, dict]:
     """
-    Get your own activity summary (for regular users).
+    Get a user's sessions, most recent first (admin only).
     
-    GET /activity/me
+    GET /admin/activity/{user_id}/sessions
     Headers: Authorization: Bearer <token>
+    Query params:
+        - limit: Max sessions to return (default 50, max 500)
+    
+    Each session has started_at, last_event_at, ended_at, duration_seconds,
+    events, page_views, chat_messages, demos and is_open.
     """
     if request.method == "OPTIONS":
         return cors_response({}, 204, request)
@@ -1052,6 +1500,7 @@ def get_my_activity(request: Request) -> Tuple[str, int, dict]:
     if request.method != "GET":
         return error_response("Method not allowed", 405, request)
     
+    # Check admin auth
     token = get_token_from_request(request)
     if not token:
         return error_response("Missing authorization token", 401, request)
@@ -1060,41 +1509,389 @@ def get_my_activity(request: Request) -> Tuple[str, int, dict]:
     if not payload:
         return error_response("Invalid or expired token", 401, request)
     
+    if not payload.is_admin:
+        return error_response("Admin privileges required", 403, request)
+    
+    # Get user_id from path
+    user_id = get_path_param(request, "user_id", position=-2)
+    if not user_id:
+        return error_response("user_id is required in path", 400, request)
+    
+    limit, _, error = get_page_params(request, default_limit=50, max_limit=MAX_PAGE_SIZE)
+    if error:
+        return error_response(error, 400, request)
+    
     db = get_db()
-    summary = db.get_user_activity_summary(payload.user_id)
     
-    if not summary:
-        return success_response(
-            data={
-                "user_id": payload.user_id,
-                "total_events": 0,
-                "total_sessions": 0,
-                "total_time_seconds": 0,
-                "demos_visited": [],
-            },
-            request=request,
-        )
+    # Check if user exists
+    user = db.get_user_by_id(user_id)
+    if not user:
+        return error_response(f"User '{user_id}' not found", 404, request)
     
-    # Remove internal fields
-    summary.pop("is_tracking_active", None)
+    sessions = db.get_user_sessions(user_id, limit=limit)
     
-    return success_response(data=summary, request=request)
+    return success_response(
+        data={
+            "user_id": user_id,
+            "sessions": sessions,
+            "count": len(sessions),
+        },
+        request=request,
+    )
 
 
-# ============================================
+@functions_framework.http
+@router.route("GET", "/admin/activity/<user_id>/export")
+def export_activity_events(request: Request) -> Tuple[Any, int, dict]:
+    """
+    Export a user's full activity history (admin only).
+    
+    Streams every matching event, oldest first, with chunked transfer
+    encoding; memory use stays flat however many events the user has.
+    
+    GET /admin/activity/{user_id}/export
+    Headers: Authorization: Bearer <token>
+    Query params:
+        - format: ndjson (default) or csv
+        - event_type: Filter by event type
+        - demo_id: Filter by demo ID
+        - start: Only events at or after this ISO 8601 timestamp
+        - end: Only events at or before this ISO 8601 timestamp
+    """
+    if request.method == "OPTIONS":
+        return cors_response({}, 204, request)
+    
+    if request.method != "GET":
+        return error_response("Method not allowed", 405, request)
+    
+    # Check admin auth
+    token = get_token_from_request(request)
+    if not token:
+        return error_response("Missing authorization token", 401, request)
+    
+    payload = decode_token(token)
+    if not payload:
+        return error_response("Invalid or expired token", 401, request)
+    
+    if not payload.is_admin:
+        return error_response("Admin privileges required", 403, request)
+    
+    # Get user_id from path
+    user_id = get_path_param(request, "user_id", position=-2)
+    if not user_id:
+        return error_response("user_id is required in path", 400, request)
+    
+    # Parse query params
+    export_format = EXPORT_FORMATS.get(request.args.get("format", "ndjson").lower())
+    if export_format is None:
+        return error_response(f"format must be one of: {', '.join(EXPORT_FORMATS)}", 400, request)
+    
+    start_time, end_time, error = get_time_range(request)
+    if error:
+        return error_response(error, 400, request)
+    
+    db = get_db()
+    
+    # Check if user exists
+    user = db.get_user_by_id(user_id)
+    if not user:
+        return error_response(f"User '{user_id}' not found", 404, request)
+    
+    events = db.stream_user_events(
+        user_id=user_id,
+        event_type=request.args.get("event_type"),
+        demo_id=request.args.get("demo_id"),
+        start_time=start_time,
+        end_time=end_time,
+    )
+    
+    # No Content-Length, so the body is sent chunked as the generator runs
+    filename = f"activity-{user_id}.{export_format.extension}"
+    headers = {
+        **get_cors_headers(request),
+        "Content-Type": export_format.content_type,
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Cache-Control": "no-store",
+    }
+    return export_format.serialize(events), 200, headers
+
+
+@functions_framework.http
+@router.route("GET", "/activity/me")
+def get_my_activity(request: Request) -> Tuple[str, int, dict]:
+    """
+    Get your own activity summary (for regular users).
+    
+    GET /activity/me
+    Headers: Authorization: Bearer <token>
+    """
+    if request.method == "OPTIONS":
+        return cors_response({}, 204, request)
+    
+    if request.method != "GET":
+        return error_response("Method not allowed", 405, request)
+    
+    token = get_token_from_request(request)
+    if not token:
+        return error_response("Missing authorization token", 401, request)
+    
+    payload = decode_token(token)
+    if not payload:
+        return error_response("Invalid or expired token", 401, request)
+    
+    db = get_db()
+    summary = db.get_user_activity_summary(payload.user_id)
+    
+    if not summary:
+        return success_response(
+            data={
+                "user_id": payload.user_id,
+                "total_events": 0,
+                "total_sessions": 0,
+                "total_time_seconds": 0,
+                "demos_visited": [],
+            },
+            request=request,
+        )
+    
+    # Remove internal fields
+    summary.pop("is_tracking_active", None)
+    summary.pop("sessions_built_at", None)
+    
+    return success_response(data=summary, request=request)
+
+
+@functions_framework.http
+@router.route("GET", "/admin/activity/<user_id>/daily")
+def get_activity_daily(request: Request) -> Tuple[str, int, dict]:
+    """
+    Get a user's activity over a date range (admin only).
+    
+    GET /admin/activity/{user_id}/daily
+    Headers: Authorization: Bearer <token>
+    Query params:
+        - start: First day, YYYY-MM-DD (default 30 days before end)
+        - end: Last day, YYYY-MM-DD (default today, UTC)
+        - demo_id: Only count activity on this demo
+    
+    Answered from daily rollups, one read per day with activity.
+    """
+    if request.method == "OPTIONS":
+        return cors_response({}, 204, request)
+    
+    if request.method != "GET":
+        return error_response("Method not allowed", 405, request)
+    
+    # Check admin auth
+    token = get_token_from_request(request)
+    if not token:
+        return error_response("Missing authorization token", 401, request)
+    
+    payload = decode_token(token)
+    if not payload:
+        return error_response("Invalid or expired token", 401, request)
+    
+    if not payload.is_admin:
+        return error_response("Admin privileges required", 403, request)
+    
+    # Get user_id from path
+    user_id = get_path_param(request, "user_id", position=-2)
+    if not user_id:
+        return error_response("user_id is required in path", 400, request)
+    
+    start_date, end_date, error = get_date_range(request)
+    if error:
+        return error_response(error, 400, request)
+    
+    db = get_db()
+    
+    # Check if user exists
+    user = db.get_user_by_id(user_id)
+    if not user:
+        return error_response(f"User '{user_id}' not found", 404, request)
+    
+    summary = db.get_user_activity_range_summary(
+        user_id=user_id,
+        start_date=start_date,
+        end_date=end_date,
+        demo_id=request.args.get("demo_id"),
+    )
+    
+    return success_response(data=summary, request=request)
+
+
+@functions_framework.http
+@router.route("GET", "/admin/activity/engagement")
+def get_activity_engagement(request: Request) -> Tuple[str, int, dict]:
+    """
+    Get engagement across all users over a date range (admin only).
+    
+    GET /admin/activity/engagement
+    Headers: Authorization: Bearer <token>
+    Query params:
+        - start: First day, YYYY-MM-DD (default 30 days before end)
+        - end: Last day, YYYY-MM-DD (default today, UTC)
+    
+    Returns daily active users, sessions and events, and views, launches
+    and chat messages per demo. Answered from global daily aggregates
+    with a single query.
+    """
+    if request.method == "OPTIONS":
+        return cors_response({}, 204, request)
+    
+    if request.method != "GET":
+        return error_response("Method not allowed", 405, request)
+    
+    # Check admin auth
+    token = get_token_from_request(request)
+    if not token:
+        return error_response("Missing authorization token", 401, request)
+    
+    payload = decode_token(token)
+    if not payload:
+        return error_response("Invalid or expired token", 401, request)
+    
+    if not payload.is_admin:
+        return error_response("Admin privileges required", 403, request)
+    
+    start_date, end_date, error = get_date_range(request)
+    if error:
+        return error_response(error, 400, request)
+    
+    db = get_db()
+    engagement = db.get_activity_engagement(start_date=start_date, end_date=end_date)
+    
+    return success_response(data=engagement, request=request)
+
+
+@functions_framework.http
+@router.route("GET", "/admin/activity/feed")
+def get_activity_feed(request: Request) -> Tuple[str, int, dict]:
+    """
+    Get the latest activity events across all users (admin only).
+    
+    GET /admin/activity/feed
+    Headers: Authorization: Bearer <token>
+    Query params:
+        - limit: Max events to return (default 100, max 500)
+        - cursor: next_cursor from the previous page
+        - event_type: Filter by event type
+        - demo_id: Filter by demo ID
+        - start, end: Optional ISO 8601 time range (inclusive)
+    
+    Events are newest first and include the user_id they belong to.
+    """
+    if request.method == "OPTIONS":
+        return cors_response({}, 204, request)
+    
+    if request.method != "GET":
+        return error_response("Method not allowed", 405, request)
+    
+    # Check admin auth
+    token = get_token_from_request(request)
+    if not token:
+        return error_response("Missing authorization token", 401, request)
+    
+    payload = decode_token(token)
+    if not payload:
+        return error_response("Invalid or expired token", 401, request)
+    
+    if not payload.is_admin:
+        return error_response("Admin privileges required", 403, request)
+    
+    # Parse query params
+    limit, cursor, error = get_page_params(request, default_limit=100, max_limit=MAX_PAGE_SIZE)
+    if error:
+        return error_response(error, 400, request)
+    start_time, end_time, error = get_time_range(request)
+    if error:
+        return error_response(error, 400, request)
+    
+    db = get_db()
+    
+    try:
+        events, next_cursor = db.get_activity_feed_page(
+            limit=limit,
+            cursor=cursor,
+            event_type=request.args.get("event_type"),
+            demo_id=request.args.get("demo_id"),
+            start_time=start_time,
+            end_time=end_time,
+        )
+    except ValueError as e:
+        return error_response(str(e), 400, request)
+    
+    return success_response(
+        data={
+            "events": events,
+            "count": len(events),
+            "next_cursor": next_cursor,
+        },
+        request=request,
+    )
+
+
+@functions_framework.http
+@router.route("GET", "/activity/me/daily")
+def get_my_activity_daily(request: Request) -> Tuple[str, int, dict]:
+    """
+    Get your own activity over a date range (for regular users).
+    
+    GET /activity/me/daily
+    Headers: Authorization: Bearer <token>
+    Query params:
+        - start: First day, YYYY-MM-DD (default 30 days before end)
+        - end: Last day, YYYY-MM-DD (default today, UTC)
+        - demo_id: Only count activity on this demo
+    """
+    if request.method == "OPTIONS":
+        return cors_response({}, 204, request)
+    
+    if request.method != "GET":
+        return error_response("Method not allowed", 405, request)
+    
+    token = get_token_from_request(request)
+    if not token:
+        return error_response("Missing authorization token", 401, request)
+    
+    payload = decode_token(token)
+    if not payload:
+        return error_response("Invalid or expired token", 401, request)
+    
+    start_date, end_date, error = get_date_range(request)
+    if error:
+        return error_response(error, 400, request)
+    
+    db = get_db()
+    summary = db.get_user_activity_range_summary(
+        user_id=payload.user_id,
+        start_date=start_date,
+        end_date=end_date,
+        demo_id=request.args.get("demo_id"),
+    )
+    
+    return success_response(data=summary, request=request)
+
+
+# ============================================
 # Demo Management Endpoints
 # ============================================
 
 @functions_framework.http
+@router.route("GET", "/demos")
 def list_demos(request: Request) -> Tuple[str, int, dict]:
     """
     List all active demos for the portal.
     This is a public endpoint used by the frontend to render demo cards.
     
     GET /demos
-    Query params: include_inactive=true (requires admin auth)
+    Query params:
+        - include_inactive: true to include inactive demos (requires admin auth)
+        - limit: Page size (max 500); the whole catalog is returned without it
+        - cursor: next_cursor from the previous page
     
     Returns: {"success": true, "data": {"demos": [...], "count": N}}
+    (paged requests also get "next_cursor")
     """
     if request.method == "OPTIONS":
         return cors_response({}, 204, request)
@@ -1114,16 +1911,54 @@ def list_demos(request: Request) -> Tuple[str, int, dict]:
         if not payload or not payload.is_admin:
             return error_response("Admin privileges required", 403, request)
     
+    limit, cursor, error = get_page_params(request, default_limit=None, max_limit=MAX_PAGE_SIZE)
+    if error:
+        return error_response(error, 400, request)
+    
     db = get_db()
-    demos = db.list_demos(include_inactive=include_inactive)
     
-    return success_response(
+    # Paged listings go straight to Firestore; the full catalog is cached
+    if limit is not None:
+        try:
+            demos, next_cursor = db.list_demos_page(
+                include_inactive=include_inactive,
+                limit=limit,
+                cursor=cursor,
+            )
+        except ValueError as e:
+            return error_response(str(e), 400, request)
+        
+        return success_response(
+            data={"demos": demos, "count": len(demos), "next_cursor": next_cursor},
+            request=request,
+        )
+    
+    catalog = db.get_demo_catalog(include_inactive=include_inactive)
+    
+    # The public catalog may be reused by browsers and CDNs; the admin view
+    # (with inactive demos) only by the requesting browser, after revalidating
+    cache_headers = {
+        "ETag": catalog["etag"],
+        "Cache-Control": (
+            "private, no-cache" if include_inactive
+            else f"public, max-age={DEMO_CATALOG_MAX_AGE_SECONDS}"
+        ),
+        "Vary": "Origin, Authorization" if include_inactive else "Origin",
+    }
+    
+    if etag_matches(request, catalog["etag"]):
+        return "", 304, {**get_cors_headers(request), **cache_headers}
+    
+    demos = catalog["demos"]
+    body, status, headers = success_response(
         data={"demos": demos, "count": len(demos)},
         request=request,
     )
+    return body, status, {**headers, **cache_headers}
 
 
 @functions_framework.http
+@router.route("POST", "/admin/demos")
 def create_demo(request: Request) -> Tuple[str, int, dict]:
     """
     Create a new demo (admin only).
@@ -1244,6 +2079,7 @@ def create_demo(request: Request) -> Tuple[str, int, dict]:
 
 
 @functions_framework.http
+@router.route("PUT", "/admin/demos/<demo_id>")
 def update_demo(request: Request) -> Tuple[str, int, dict]:
     """
     Update a demo (admin only).
@@ -1284,10 +2120,9 @@ def update_demo(request: Request) -> Tuple[str, int, dict]:
         return error_response("Admin privileges required", 403, request)
     
     # Get demo_id from path
-    path_parts = request.path.rstrip("/").split("/")
-    if len(path_parts) < 1:
+    demo_id = get_path_param(request, "demo_id")
+    if not demo_id:
         return error_response("demo_id is required in path", 400, request)
-    demo_id = path_parts[-1]
     
     try:
         body = request.get_json(silent=True) or {}
@@ -1296,11 +2131,6 @@ def update_demo(request: Request) -> Tuple[str, int, dict]:
     
     db = get_db()
     
-    # Check if demo exists
-    existing = db.get_demo_by_id(demo_id)
-    if not existing:
-        return error_response(f"Demo '{demo_id}' not found", 404, request)
-    
     # Build updates - only include fields that are provided
     updates = {}
     allowed_fields = [
@@ -1320,8 +2150,10 @@ def update_demo(request: Request) -> Tuple[str, int, dict]:
     if not updates:
         return error_response("No valid fields to update", 400, request)
     
-    # Update demo
+    # Update demo (fails if the demo does not exist)
     updated_demo = db.update_demo(demo_id, updates)
+    if updated_demo is None:
+        return error_response(f"Demo '{demo_id}' not found", 404, request)
     
     # Log action
     db.log_action(
@@ -1339,6 +2171,7 @@ def update_demo(request: Request) -> Tuple[str, int, dict]:
 
 
 @functions_framework.http
+@router.route("DELETE", "/admin/demos/<demo_id>")
 def delete_demo(request: Request) -> Tuple[str, int, dict]:
     """
     Deactivate a demo (soft delete - admin only).
@@ -1366,23 +2199,18 @@ def delete_demo(request: Request) -> Tuple[str, int, dict]:
         return error_response("Admin privileges required", 403, request)
     
     # Get demo_id from path
-    path_parts = request.path.rstrip("/").split("/")
-    if len(path_parts) < 1:
+    demo_id = get_path_param(request, "demo_id")
+    if not demo_id:
         return error_response("demo_id is required in path", 400, request)
-    demo_id = path_parts[-1]
     
     db = get_db()
     
-    # Check if demo exists
-    demo = db.get_demo_by_id(demo_id)
-    if not demo:
-        return error_response(f"Demo '{demo_id}' not found", 404, request)
-    
-    if not demo.get("is_active", True):
-        return error_response(f"Demo '{demo_id}' is already deactivated", 400, request)
-    
     # Soft delete
-    db.delete_demo(demo_id)
+    try:
+        if not db.delete_demo(demo_id):
+            return error_response(f"Demo '{demo_id}' not found", 404, request)
+    except StateConflict:
+        return error_response(f"Demo '{demo_id}' is already deactivated", 400, request)
     
     # Log action
     db.log_action(
@@ -1399,6 +2227,7 @@ def delete_demo(request: Request) -> Tuple[str, int, dict]:
 
 
 @functions_framework.http
+@router.route("POST", "/admin/demos/<demo_id>/reactivate")
 def reactivate_demo(request: Request) -> Tuple[str, int, dict]:
     """
     Reactivate a deactivated demo (admin only).
@@ -1425,23 +2254,18 @@ def reactivate_demo(request: Request) -> Tuple[str, int, dict]:
         return error_response("Admin privileges required", 403, request)
     
     # Get demo_id from path (path is /admin/demos/{demo_id}/reactivate)
-    path_parts = request.path.rstrip("/").split("/")
-    if len(path_parts) < 2:
+    demo_id = get_path_param(request, "demo_id", position=-2)
+    if not demo_id:
         return error_response("demo_id is required in path", 400, request)
-    demo_id = path_parts[-2]
     
     db = get_db()
     
-    # Check if demo exists
-    demo = db.get_demo_by_id(demo_id)
-    if not demo:
-        return error_response(f"Demo '{demo_id}' not found", 404, request)
-    
-    if demo.get("is_active", True):
-        return error_response(f"Demo '{demo_id}' is already active", 400, request)
-    
     # Reactivate
-    db.reactivate_demo(demo_id)
+    try:
+        if not db.reactivate_demo(demo_id):
+            return error_response(f"Demo '{demo_id}' not found", 404, request)
+    except StateConflict:
+        return error_response(f"Demo '{demo_id}' is already active", 400, request)
     
     # Log action
     db.log_action(
@@ -1455,3 +2279,81 @@ def reactivate_demo(request: Request) -> Tuple[str, int, dict]:
         message=f"Demo '{demo_id}' reactivated successfully",
         request=request,
     )
+
+
+# ============================================
+# Operations Endpoints
+# ============================================
+
+@functions_framework.http
+@router.route("GET", "/admin/metrics")
+def get_metrics(request: Request) -> Tuple[str, int, dict]:
+    """
+    Get per-instance runtime metrics (admin only).
+    
+    GET /admin/metrics
+    Headers: Authorization: Bearer <token>
+    
+    Metrics are local to the instance that serves the request.
+    """
+    if request.method == "OPTIONS":
+        return cors_response({}, 204, request)
+    
+    if request.method != "GET":
+        return error_response("Method not allowed", 405, request)
+    
+    # Check admin auth
+    token = get_token_from_request(request)
+    if not token:
+        return error_response("Missing authorization token", 401, request)
+    
+    payload = decode_token(token)
+    if not payload:
+        return error_response("Invalid or expired token", 401, request)
+    
+    if not payload.is_admin:
+        return error_response("Admin privileges required", 403, request)
+    
+    db = get_db()
+    
+    return success_response(
+        data={
+            "user_cache": db.user_cache_stats(),
+            "activity_summary_cache": db.activity_summary_cache_stats(),
+            "token_cache": token_cache_stats(),
+            "password_hashing": password_hash_stats(),
+            "audit_log": db.audit_log.stats(),
+            "revocations": db.revocations.stats(),
+            "activity_queue": db.activity_queue.stats() if db.activity_queue else None,
+        },
+        request=request,
+    )
+
+
+# ============================================
+# Consolidated Entry Point
+# ============================================
+
+@functions_framework.http
+def api(request: Request) -> Tuple[str, int, dict]:
+    """
+    Serve every endpoint from a single function.
+    
+    Dispatches by method + path to the handlers above, so the whole portal
+    flow runs on one warm instance pool instead of one pool per endpoint.
+    
+    Examples:
+        POST {API_URL}/auth/login
+        PUT {API_URL}/admin/users/{user_id}
+        POST {API_URL}/admin/demos/{demo_id}/reactivate
+    """
+    match = router.match(request.method, request.path)
+    if match is None:
+        return error_response("Not found", 404, request)
+    
+    if match.handler is None:
+        body, status, headers = error_response("Method not allowed", 405, request)
+        return body, status, {**headers, "Allow": ", ".join(match.allowed_methods)}
+    
+    request.path_params = match.path_params
+    return match.handler(request)
@@ -0,0 +1,185 @@
+"""
+Method + path router for serving every endpoint from a single function.
+
+Each handler in main.py registers the route it serves. The consolidated
+`api` entry point dispatches incoming requests through the router, so all
+endpoints share one warm instance pool instead of cold-starting per function.
+
+Usage:
+    from router import Router
+
+    router = Router()
+
+    @router.route("PUT", "/admin/users/<user_id>")
+    def update_user(request):
+        user_id = request.path_params["user_id"]
+
+Middleware registered with `router.use()` wraps every routed handler, both
+when dispatched by the router and when called as a per-function target.
+"""
+
+import re
+from functools import wraps
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Pattern, Tuple
+
+
+# Matches `<name>` placeholders in route patterns
+_PARAM_PATTERN = re.compile(r"<([a-zA-Z_][a-zA-Z0-9_]*)>")
+
+# Middleware signature: middleware(request, handler) -> response
+Middleware = Callable[[Any, Callable[[Any], Any]], Any]
+
+
+@dataclass
+class Route:
+    """A single path pattern and the handlers registered for it."""
+    pattern: str
+    regex: Pattern
+    handlers: Dict[str, Callable] = field(default_factory=dict)
+
+
+@dataclass
+class RouteMatch:
+    """Result of resolving a request against the route table."""
+    handler: Optional[Callable]
+    path_params: Dict[str, str]
+    allowed_methods: List[str]
+
+
+def _compile_pattern(pattern: str) -> Pattern:
+    """Compile a route pattern like `/admin/users/<user_id>` into a regex."""
+    regex = ""
+    last_end = 0
+    for match in _PARAM_PATTERN.finditer(pattern):
+        regex += re.escape(pattern[last_end:match.start()])
+        regex += f"(?P<{match.group(1)}>[^/]+)"
+        last_end = match.end()
+    regex += re.escape(pattern[last_end:])
+    return re.compile(f"^{regex}$")
+
+
+def _normalize_path(path: str) -> str:
+    """Normalize a request path so `/demos/` and `/demos` match the same route."""
+    return "/" + path.strip("/")
+
+
+class Router:
+    """Dispatches requests to handlers by HTTP method and path."""
+
+    def __init__(self):
+        # Static paths are resolved with a dict lookup, dynamic ones by regex
+        self._static_routes: Dict[str, Route] = {}
+        self._dynamic_routes: List[Route] = []
+        self._middleware: List[Middleware] = []
+
+    def use(self, middleware: Middleware) -> Middleware:
+        """
+        Register middleware that wraps every routed handler.
+
+        Middleware runs in registration order, the first registered being
+        the outermost. It can be used as a decorator.
+
+        Args:
+            middleware: Callable taking (request, handler) and returning the response
+
+        Returns:
+            The middleware, unchanged
+        """
+        self._middleware.append(middleware)
+        return middleware
+
+    def route(self, method: str, pattern: str) -> Callable[[Callable], Callable]:
+        """
+        Register a handler for a method and path pattern.
+
+        Args:
+            method: HTTP method (e.g., "GET", "POST")
+            pattern: Path pattern, with `<name>` for path parameters
+
+        Returns:
+            Decorator that registers the handler wrapped in the middleware chain
+        """
+        def decorator(handler: Callable) -> Callable:
+            @wraps(handler)
+            def wrapped(request, *args, **kwargs):
+                call = lambda req: handler(req, *args, **kwargs)
+                for middleware in reversed(self._middleware):
+                    call = (lambda mw, nxt: lambda req: mw(req, nxt))(middleware, call)
+                return call(request)
+
+            self.add_route(method, pattern, wrapped)
+            return wrapped
+
+        return decorator
+
+    def add_route(self, method: str, pattern: str, handler: Callable) -> None:
+        """Register a handler for a method and path pattern."""
+        pattern = _normalize_path(pattern)
+        method = method.upper()
+
+        if _PARAM_PATTERN.search(pattern):
+            route = next((r for r in self._dynamic_routes if r.pattern == pattern), None)
+            if route is None:
+                route = Route(pattern=pattern, regex=_compile_pattern(pattern))
+                self._dynamic_routes.append(route)
+        else:
+            route = self._static_routes.get(pattern)
+            if route is None:
+                route = Route(pattern=pattern, regex=_compile_pattern(pattern))
+                self._static_routes[pattern] = route
+
+        if method in route.handlers:
+            raise ValueError(f"Route already registered: {method} {pattern}")
+        route.handlers[method] = handler
+
+    def match(self, method: str, path: str) -> Optional[RouteMatch]:
+        """
+        Resolve a method and path to a handler.
+
+        CORS preflight (OPTIONS) requests resolve to any handler registered
+        for the path, since every handler answers its own preflight.
+
+        Args:
+            method: HTTP method of the request
+            path: Request path
+
+        Returns:
+            RouteMatch (with handler None if the method is not allowed),
+            or None if no route matches the path
+        """
+        path = _normalize_path(path)
+        method = method.upper()
+
+        route = self._static_routes.get(path)
+        path_params: Dict[str, str] = {}
+
+        if route is None:
+            for candidate in self._dynamic_routes:
+                match = candidate.regex.match(path)
+                if match:
+                    route = candidate
+                    path_params = match.groupdict()
+                    break
+
+        if route is None:
+            return None
+
+        handler = route.handlers.get(method)
+        if handler is None and method == "OPTIONS":
+            handler = next(iter(route.handlers.values()))
+
+        return RouteMatch(
+            handler=handler,
+            path_params=path_params,
+            allowed_methods=sorted(route.handlers),
+        )
+
+    def routes(self) -> List[Tuple[str, str, Callable]]:
+        """List all registered routes as (method, pattern, handler) tuples."""
+        all_routes = list(self._static_routes.values()) + self._dynamic_routes
+        return [
+            (method, route.pattern, handler)
+            for route in all_routes
+            for method, handler in sorted(route.handlers.items())
+        ]
@@ -0,0 +1,61 @@
+"""
+Benchmark JWT decoding with and without the verified-token cache.
+
+Runs against a throwaway secret taken from the environment, so no Secret
+Manager access is needed.
+
+Usage:
+    python scripts/benchmark_decode_token.py [iterations]
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+os.environ["USE_ENV_SECRETS"] = "true"
+os.environ.setdefault("JWT_SECRET", "benchmark-secret-not-for-production")
+
+from auth import jwt_handler  # noqa: E402
+from secret_manager import get_secret  # noqa: E402
+
+
+def decode_before(token: str):
+    """Decode the way decode_token did before caching: full verify, per-call secret lookups."""
+    payload = jwt_handler.jwt.decode(
+        token,
+        get_secret("JWT_SECRET"),
+        algorithms=[get_secret("JWT_ALGORITHM", default="HS256")],
+    )
+    return jwt_handler.TokenPayload.from_dict(payload)
+
+
+def main(iterations: int = 20000) -> None:
+    token = jwt_handler.create_access_token(
+        user_id="benchmark-user",
+        name="Benchmark User",
+        access=["demo-a", "demo-b", "demo-c"],
+    )
+
+    jwt_handler.clear_token_cache()
+    jwt_handler.decode_token(token)
+
+    results = [
+        ("uncached (before)", lambda: decode_before(token)),
+        ("verify only", lambda: jwt_handler._decode_token_uncached(token)),
+        ("cached (after)", lambda: jwt_handler.decode_token(token)),
+    ]
+
+    print(f"\n⏱️  decode_token, {iterations} iterations\n")
+    baseline = None
+    for label, fn in results:
+        seconds = min(timeit.repeat(fn, number=iterations, repeat=3))
+        per_call_us = seconds / iterations * 1e6
+        baseline = baseline or per_call_us
+        print(f"   {label:<20} {per_call_us:8.2f} µs/call   ({baseline / per_call_us:5.1f}x)")
+    print()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
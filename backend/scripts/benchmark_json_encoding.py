@@ -0,0 +1,95 @@
+"""
+Benchmark response serialization for large admin payloads.
+
+Compares the previous `json.dumps(..., default=str)` with each encoder in
+json_encoding, on payloads shaped like list_users and get_activity_events
+responses.
+
+Usage:
+    python scripts/benchmark_json_encoding.py [iterations]
+"""
+
+import json
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import json_encoding  # noqa: E402
+
+
+class Timestamp(datetime):
+    """Stand-in for Firestore's DatetimeWithNanoseconds (a datetime subclass)."""
+
+
+def _timestamp(offset_seconds: int) -> Timestamp:
+    value = datetime(2026, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=offset_seconds)
+    return Timestamp.fromtimestamp(value.timestamp(), tz=timezone.utc)
+
+
+def list_users_payload(count: int = 200) -> dict:
+    """Response body of GET /admin/users with `count` users."""
+    users = [
+        {
+            "id": f"user-{i}",
+            "name": f"User {i}",
+            "access": ["manhattan-smiles", "peakpoint-ortho", "medtour-cancun"],
+            "quick_access": True,
+            "is_admin": i % 20 == 0,
+            "is_active": True,
+            "created_at": _timestamp(i),
+            "updated_at": _timestamp(i + 60),
+            "last_login": _timestamp(i + 3600),
+        }
+        for i in range(count)
+    ]
+    return {"success": True, "message": "Success", "data": {"users": users, "count": count}}
+
+
+def activity_events_payload(count: int = 500) -> dict:
+    """Response body of GET /admin/activity/{user_id}/events with `count` events."""
+    events = [
+        {
+            "id": f"evt{i:020d}",
+            "event_type": "page_exit" if i % 3 else "page_view",
+            "timestamp": _timestamp(i * 5),
+            "session_id": f"sess-{i // 50}",
+            "page_url": "https://demos.example.com/peakpoint-ortho/index.html",
+            "demo_id": "peakpoint-ortho",
+            "data": {"duration_seconds": i % 120, "scroll_depth": 75},
+            "ip_address": "203.0.113.7",
+            "user_agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 14_0) AppleWebKit/605.1.15",
+        }
+        for i in range(count)
+    ]
+    return {
+        "success": True,
+        "message": "Success",
+        "data": {"user_id": "user-1", "events": events, "count": count},
+    }
+
+
+def main(iterations: int = 200) -> None:
+    payloads = [
+        ("list_users (200)", list_users_payload()),
+        ("activity events (500)", activity_events_payload()),
+    ]
+    encoders = [("json default=str (before)", lambda data: json.dumps(data, default=str))]
+    encoders += list(json_encoding.ENCODERS.items())
+
+    print(f"\n⏱️  Response encoding, {iterations} iterations (active: {json_encoding.ENCODER_NAME})\n")
+    for payload_name, payload in payloads:
+        print(f"   {payload_name}")
+        baseline = None
+        for encoder_name, fn in encoders:
+            seconds = min(timeit.repeat(lambda: fn(payload), number=iterations, repeat=3))
+            per_call_ms = seconds / iterations * 1000
+            baseline = baseline or per_call_ms
+            print(f"     {encoder_name:<28} {per_call_ms:7.3f} ms/call   ({baseline / per_call_ms:5.1f}x)")
+        print()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,164 @@
+"""
+Cold-start import report with a budget check.
+
+Imports `main` in fresh interpreters under `python -X importtime` and reports
+how long the application's own import takes (median of several runs), which
+modules it spends that time in, and whether it fits the budget.
+
+functions_framework and flask are imported first and reported separately:
+the Cloud Functions runtime loads them before it imports `main`, so they
+are paid on every cold start regardless of the application. The startup
+warm-up thread is disabled, so only the import itself is measured.
+
+An uncounted first run writes the bytecode caches, so every measured run
+loads compiled modules as a deployed instance does.
+
+Usage:
+    cd backend
+    python scripts/import_budget.py
+    python scripts/import_budget.py --budget-ms 40 --runs 9
+    python scripts/import_budget.py --json import-times.json
+
+Exits with status 1 when the median import of `main` exceeds --budget-ms.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported before `main`, as the runtime does
+RUNTIME_MODULES = ["functions_framework", "flask"]
+
+DEFAULT_BUDGET_MS = 50.0
+
+
+def run_once() -> List[Tuple[int, str, int, int]]:
+    """
+    Import `main` in a fresh interpreter.
+
+    Returns:
+        importtime entries as (depth, module, self_us, cumulative_us), in
+        the order Python prints them (children before their parent)
+    """
+    env = {
+        **{key: value for key, value in os.environ.items() if key != "PYTHONDONTWRITEBYTECODE"},
+        "PYTHONPATH": BACKEND_DIR,
+        "USE_ENV_SECRETS": "true",
+        "STARTUP_WARMUP": "false",
+    }
+    env.setdefault("JWT_SECRET", "import-budget-" + "x" * 32)
+    env.setdefault("GCP_PROJECT_ID", "import-budget")
+
+    code = f"import {', '.join(RUNTIME_MODULES)}; import main"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing main failed:\n{result.stderr[-2000:]}")
+
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        module = name.lstrip(" ")
+        depth = (len(name) - len(module) - 1) // 2
+        entries.append((depth, module, int(self_us), int(cumulative_us)))
+    return entries
+
+
+def summarize(entries: List[Tuple[int, str, int, int]]) -> Dict[str, object]:
+    """Split one run into runtime imports, `main` and the modules under it."""
+    runtime_us = sum(cum for depth, module, _, cum in entries if depth == 0 and module in RUNTIME_MODULES)
+
+    # `main`'s subtree is printed right before it, after the previous top-level entry
+    main_index = next(i for i, entry in enumerate(entries) if entry[0] == 0 and entry[1] == "main")
+    start = main_index
+    while start > 0 and entries[start - 1][0] > 0:
+        start -= 1
+    subtree = entries[start:main_index]
+
+    return {
+        "runtime_us": runtime_us,
+        "main_us": entries[main_index][3],
+        "children": {module: cum for depth, module, _, cum in subtree if depth == 1},
+        "self": {module: self_us for _, module, self_us, _ in subtree},
+    }
+
+
+def median_by_module(runs: List[Dict[str, int]]) -> Dict[str, float]:
+    """Median time per module across runs (missing counts as 0)."""
+    modules = set().union(*runs)
+    return {module: statistics.median(run.get(module, 0) for run in runs) for module in modules}
+
+
+def top(times: Dict[str, float], count: int) -> List[Tuple[str, float]]:
+    return sorted(times.items(), key=lambda item: item[1], reverse=True)[:count]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Measure the cold-start import time of the backend.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to measure (median is reported)")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="Maximum median import time of main")
+    parser.add_argument("--top", type=int, default=10, help="Modules to list")
+    parser.add_argument("--json", metavar="PATH", help="Also write the results as JSON")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+
+    # Primes the bytecode caches
+    run_once()
+    runs = [summarize(run_once()) for _ in range(args.runs)]
+    main_ms = statistics.median(run["main_us"] for run in runs) / 1000
+    runtime_ms = statistics.median(run["runtime_us"] for run in runs) / 1000
+    children = median_by_module([run["children"] for run in runs])
+    self_times = median_by_module([run["self"] for run in runs])
+    within_budget = main_ms <= args.budget_ms
+
+    print(f"\n⏱️  Cold-start imports (median of {args.runs} runs, {sys.version.split()[0]})")
+    runtime_label = f"Runtime ({', '.join(RUNTIME_MODULES)}):"
+    print(f"   {runtime_label} {runtime_ms:8.1f} ms  (loaded before main)")
+    print(f"   {'main:':<{len(runtime_label)}} {main_ms:8.1f} ms  (budget {args.budget_ms:.0f} ms)")
+
+    print("\n   Imported directly by main (cumulative):")
+    for module, us in top(children, args.top):
+        print(f"     {us / 1000:8.1f} ms  {module}")
+
+    print("\n   Slowest modules under main (self):")
+    for module, us in top(self_times, args.top):
+        print(f"     {us / 1000:8.1f} ms  {module}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "python": sys.version.split()[0],
+                "runs": args.runs,
+                "budget_ms": args.budget_ms,
+                "main_ms": main_ms,
+                "runtime_ms": runtime_ms,
+                "children_ms": {module: us / 1000 for module, us in top(children, len(children))},
+                "self_ms": {module: us / 1000 for module, us in top(self_times, args.top)},
+            }, f, indent=2)
+        print(f"\n   Results written to {args.json}")
+
+    if within_budget:
+        print(f"\n✅ main imports in {main_ms:.1f} ms, within the {args.budget_ms:.0f} ms budget")
+    else:
+        print(f"\n❌ main imports in {main_ms:.1f} ms, over the {args.budget_ms:.0f} ms budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
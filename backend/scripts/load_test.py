@@ -0,0 +1,389 @@
+"""
+Concurrent load test with per-endpoint latency percentiles.
+
+Replays mixed workloads against the routed `api` entry point:
+  - login:    login storms (POST /auth/login)
+  - portal:   portal page loads (validate session, user access, demo list
+              revalidated with If-None-Match like a browser)
+  - activity: activity tracker streams (POST /activity/track-batch)
+  - mixed:    all of the above, weighted like real traffic
+
+Reports p50/p95/p99 latency, throughput and error rate per endpoint.
+
+By default a local server is started in-process on the in-memory database
+(DB_BACKEND=memory) and seeded with test users and demos, so no GCP project
+is needed. Use --url to target a server you started yourself; its users must
+share --password.
+
+Usage:
+    # Self-contained run on the in-memory database
+    python scripts/load_test.py --workload mixed --concurrency 32 --duration 30
+
+    # Simulate Firestore round-trip latency
+    python scripts/load_test.py --workload activity --latency-ms 8
+
+    # Against a locally started server
+    functions-framework --target=api --port=8081
+    python scripts/load_test.py --url http://localhost:8081 --users admin-automatia
+
+    # Save results for a before/after comparison
+    python scripts/load_test.py --json results-before.json
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+DEFAULT_PASSWORD = "LoadTest123!"
+DEMO_IDS = ["manhattan-smiles", "peakpoint-ortho", "harborlight", "restoremotion", "paws-and-pines"]
+
+# Scenario weights for the mixed workload (per iteration of a simulated session)
+MIXED_WEIGHTS = {"login": 1, "portal": 4, "activity": 15}
+
+# Pause before a session retries after a failed login, like a real client
+LOGIN_RETRY_SECONDS = 0.5
+
+
+# ============================================
+# Measurement
+# ============================================
+
+class Recorder:
+    """Collects per-endpoint latencies and outcomes from all workers."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    def record(self, endpoint: str, seconds: float, status: Optional[int], ok: bool) -> None:
+        with self._lock:
+            self.latencies[endpoint].append(seconds)
+            self.statuses[endpoint][status or 0] += 1
+            if not ok:
+                self.errors[endpoint] += 1
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(recorder: Recorder, elapsed: float) -> Dict[str, Dict[str, float]]:
+    """Per-endpoint statistics, plus an overall row."""
+    results = {}
+    everything: List[float] = []
+    total_errors = 0
+
+    for endpoint in sorted(recorder.latencies):
+        values = sorted(recorder.latencies[endpoint])
+        everything.extend(values)
+        errors = recorder.errors[endpoint]
+        total_errors += errors
+        results[endpoint] = _stats(values, errors, elapsed)
+        results[endpoint]["statuses"] = dict(recorder.statuses[endpoint])
+
+    results["TOTAL"] = _stats(sorted(everything), total_errors, elapsed)
+    return results
+
+
+def _stats(values: List[float], errors: int, elapsed: float) -> Dict[str, float]:
+    count = len(values)
+    return {
+        "requests": count,
+        "errors": errors,
+        "error_rate": round(errors / count, 4) if count else 0.0,
+        "rps": round(count / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+        "max_ms": round(values[-1] * 1000, 2) if values else 0.0,
+    }
+
+
+def print_report(results: Dict[str, Dict[str, float]], elapsed: float, args: argparse.Namespace) -> None:
+    print(f"\n📊 Workload '{args.workload}', concurrency {args.concurrency}, {elapsed:.1f}s\n")
+    header = f"   {'endpoint':<32} {'reqs':>7} {'rps':>8} {'err%':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}"
+    print(header)
+    print("   " + "-" * (len(header) - 3))
+    for endpoint, stats in results.items():
+        print(
+            f"   {endpoint:<32} {stats['requests']:>7} {stats['rps']:>8.1f} "
+            f"{stats['error_rate'] * 100:>5.1f}% {stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} "
+            f"{stats['p99_ms']:>8.1f} {stats['max_ms']:>8.1f}"
+        )
+    print("\n   Latencies in ms.")
+
+    failing = {
+        endpoint: stats["statuses"]
+        for endpoint, stats in results.items()
+        if endpoint != "TOTAL" and stats["errors"]
+    }
+    if failing:
+        print("\n   Status codes for endpoints with errors (0 = connection error):")
+        for endpoint, statuses in failing.items():
+            print(f"     {endpoint}: {statuses}")
+    print()
+
+
+# ============================================
+# Simulated client sessions
+# ============================================
+
+class Session:
+    """One simulated portal user, with its own HTTP connection pool."""
+
+    def __init__(self, base_url: str, user_id: str, password: str, recorder: Recorder, batch_size: int):
+        self.base_url = base_url.rstrip("/")
+        self.user_id = user_id
+        self.password = password
+        self.recorder = recorder
+        self.batch_size = batch_size
+        self.http = requests.Session()
+        self.token: Optional[str] = None
+        self.session_id = str(uuid.uuid4())
+        self.demos_etag: Optional[str] = None
+
+    def call(
+        self,
+        endpoint: str,
+        method: str,
+        path: str,
+        ok_statuses: Tuple[int, ...] = (200,),
+        **kwargs,
+    ) -> Optional[requests.Response]:
+        """Make one timed request and record it under `endpoint`."""
+        headers = kwargs.pop("headers", {})
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+
+        started = time.perf_counter()
+        try:
+            response = self.http.request(method, self.base_url + path, headers=headers, timeout=30, **kwargs)
+        except requests.RequestException:
+            self.recorder.record(endpoint, time.perf_counter() - started, None, False)
+            return None
+
+        self.recorder.record(
+            endpoint,
+            time.perf_counter() - started,
+            response.status_code,
+            response.status_code in ok_statuses,
+        )
+        return response
+
+    def login(self) -> None:
+        self.token = None
+        response = self.call(
+            "POST /auth/login",
+            "POST",
+            "/auth/login",
+            json={"user_id": self.user_id, "password": self.password},
+        )
+        if response is not None and response.status_code == 200:
+            self.token = response.json()["data"]["token"]
+            self.session_id = str(uuid.uuid4())
+            self.demos_etag = None
+
+    def ensure_login(self) -> bool:
+        """Log in if needed; back off and return False if that fails."""
+        if not self.token:
+            self.login()
+            if not self.token:
+                time.sleep(LOGIN_RETRY_SECONDS)
+                return False
+        return True
+
+    def portal_load(self) -> None:
+        if not self.ensure_login():
+            return
+
+        self.call("POST /auth/validate", "POST", "/auth/validate")
+        self.call("GET /users/access", "GET", "/users/access")
+
+        headers = {"If-None-Match": self.demos_etag} if self.demos_etag else {}
+        response = self.call("GET /demos", "GET", "/demos", ok_statuses=(200, 304), headers=headers)
+        if response is not None and response.status_code == 200:
+            self.demos_etag = response.headers.get("ETag")
+
+    def activity_batch(self) -> None:
+        if not self.ensure_login():
+            return
+
+        demo_id = random.choice(DEMO_IDS)
+        events = []
+        for i in range(self.batch_size):
+            event_type = random.choice(["page_view", "scroll_depth", "button_click", "page_exit", "chat_message_sent"])
+            data = {"duration_seconds": random.randint(1, 90)} if event_type == "page_exit" else {}
+            events.append({
+                "event_type": event_type,
+                "session_id": self.session_id,
+                "demo_id": demo_id,
+                "page_url": f"https://demos.example.com/{demo_id}/",
+                "data": data,
+            })
+
+        self.call("POST /activity/track-batch", "POST", "/activity/track-batch", json={"events": events})
+
+
+SCENARIOS: Dict[str, Callable[[Session], None]] = {
+    "login": Session.login,
+    "portal": Session.portal_load,
+    "activity": Session.activity_batch,
+}
+
+
+def run_worker(session: Session, workload: str, deadline: float) -> None:
+    """Drive one simulated session until the deadline."""
+    if workload != "login":
+        session.login()
+
+    scenarios = list(MIXED_WEIGHTS)
+    weights = [MIXED_WEIGHTS[name] for name in scenarios]
+
+    while time.monotonic() < deadline:
+        name = random.choices(scenarios, weights)[0] if workload == "mixed" else workload
+        SCENARIOS[name](session)
+
+
+# ============================================
+# Local server
+# ============================================
+
+def start_local_server(args: argparse.Namespace) -> str:
+    """
+    Serve the `api` target in-process on a seeded in-memory database.
+
+    Returns:
+        Base URL of the server
+    """
+    os.environ.setdefault("USE_ENV_SECRETS", "true")
+    os.environ.setdefault("GCP_PROJECT_ID", "load-test")
+    os.environ.setdefault("JWT_SECRET", "load-test-secret-at-least-32-characters-long")
+    os.environ["DB_BACKEND"] = "memory"
+    os.environ["MEMORY_DB_LATENCY_MS"] = str(args.latency_ms)
+
+    import logging
+    import functions_framework
+    from werkzeug.serving import make_server
+
+    from auth import hash_password
+    from database import get_db
+
+    db = get_db()
+    for i, demo_id in enumerate(DEMO_IDS):
+        db.create_demo(
+            demo_id=demo_id,
+            title=demo_id.replace("-", " ").title(),
+            description=f"Load-test demo {demo_id}",
+            icon="🧪",
+            industry="HealthTech",
+            path=f"{demo_id}/index.html",
+            tags=["load-test"],
+            sort_order=i,
+        )
+
+    # One hash for every user: seeding should not take minutes of bcrypt
+    password_hash = hash_password(args.password)
+    for user_id in args.users:
+        db.create_user(
+            user_id=user_id,
+            name=user_id,
+            password_hash=password_hash,
+            access=DEMO_IDS,
+        )
+
+    source = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+    app = functions_framework.create_app(target="api", source=source)
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", args.port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    db.reset_rpc_stats()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+# ============================================
+# Entry point
+# ============================================
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Concurrent load test for the booking API.")
+    parser.add_argument("--url", help="Base URL of a running `api` server (default: start one locally)")
+    parser.add_argument("--workload", choices=["mixed", *SCENARIOS], default="mixed")
+    parser.add_argument("--concurrency", type=int, default=16, help="Simulated sessions running in parallel")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds to run")
+    parser.add_argument("--batch-size", type=int, default=20, help="Events per activity batch")
+    parser.add_argument("--users", nargs="+", help="User IDs to log in as (default: seeded loadtest-N users)")
+    parser.add_argument("--password", default=DEFAULT_PASSWORD, help="Password shared by the users")
+    parser.add_argument("--port", type=int, default=0, help="Port for the local server (default: any free port)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Simulated Firestore latency per RPC (local only)")
+    parser.add_argument("--json", metavar="PATH", help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    if not args.users:
+        args.users = [f"loadtest-{i}" for i in range(args.concurrency)]
+    return args
+
+
+def main() -> None:
+    args = parse_args()
+    base_url = args.url or start_local_server(args)
+
+    print(f"\n🚀 Load testing {base_url} ({args.workload}, {args.concurrency} sessions, {args.duration:.0f}s)")
+
+    recorder = Recorder()
+    deadline = time.monotonic() + args.duration
+    workers = [
+        threading.Thread(
+            target=run_worker,
+            args=(
+                Session(base_url, args.users[i % len(args.users)], args.password, recorder, args.batch_size),
+                args.workload,
+                deadline,
+            ),
+            daemon=True,
+        )
+        for i in range(args.concurrency)
+    ]
+
+    started = time.monotonic()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.monotonic() - started
+
+    results = summarize(recorder, elapsed)
+    print_report(results, elapsed, args)
+
+    if not args.url:
+        from database import get_db
+        rpc_stats = get_db().rpc_stats()
+        print(f"   Simulated Firestore RPCs: {rpc_stats['total_rpcs']} {rpc_stats['rpcs']}\n")
+        results["firestore_rpcs"] = rpc_stats
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"workload": args.workload, "concurrency": args.concurrency, "results": results}, f, indent=2)
+        print(f"   Results written to {args.json}\n")
+
+
+if __name__ == "__main__":
+    main()
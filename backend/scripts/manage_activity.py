@@ -0,0 +1,76 @@
+"""
+Maintenance jobs for per-user activity events.
+
+Commands:
+    migrate  Move events written before monthly partitioning into partitions
+             (run once after upgrading; until then they are still read,
+             at the cost of an extra query per read)
+    purge    Delete events older than ACTIVITY_RETENTION_DAYS
+             (run periodically, e.g. daily, unless a TTL policy is enabled)
+
+Usage:
+    cd backend
+    export GCP_PROJECT_ID=your-project-id
+    export GOOGLE_APPLICATION_CREDENTIALS=/path/to/service-account.json
+    python scripts/manage_activity.py migrate
+    ACTIVITY_RETENTION_DAYS=365 python scripts/manage_activity.py purge
+"""
+
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import get_db
+
+
+def migrate_events():
+    """Move every user's unpartitioned events into monthly partitions."""
+    print("\n📦 Moving activity events into monthly partitions...")
+
+    db = get_db()
+    total = 0
+    for user_id in db.list_activity_user_ids():
+        moved = db.migrate_legacy_events(user_id)
+        if moved:
+            print(f"  ✅ {user_id}: moved {moved} events")
+        total += moved
+
+    print(f"\n✨ Migration complete! Events moved: {total}")
+
+
+def purge_events():
+    """Delete every user's events past the retention period."""
+    days = os.getenv("ACTIVITY_RETENTION_DAYS")
+    print(f"\n🧹 Deleting activity events older than {days} days...")
+
+    result = get_db().purge_expired_activity()
+
+    print("\n✨ Purge complete!")
+    print(f"   Users scanned: {result['users']}")
+    print(f"   Events deleted: {result['events_deleted']}")
+
+
+COMMANDS = {
+    "migrate": migrate_events,
+    "purge": purge_events,
+}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or sys.argv[1] not in COMMANDS:
+        print(f"Usage: python scripts/manage_activity.py [{'|'.join(COMMANDS)}]")
+        sys.exit(1)
+
+    # Check environment
+    if not os.getenv("GCP_PROJECT_ID"):
+        print("❌ Error: GCP_PROJECT_ID environment variable is required")
+        print("   export GCP_PROJECT_ID=your-project-id")
+        sys.exit(1)
+
+    if sys.argv[1] == "purge" and not os.getenv("ACTIVITY_RETENTION_DAYS"):
+        print("❌ Error: ACTIVITY_RETENTION_DAYS environment variable is required")
+        sys.exit(1)
+
+    COMMANDS[sys.argv[1]]()
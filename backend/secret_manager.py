@@ -10,24 +10,52 @@ Usage:
     
     jwt_secret = get_secret("JWT_SECRET")
     gcp_project = get_secret("GCP_PROJECT_ID")
+
+Fetched secrets are cached for SECRET_CACHE_TTL_SECONDS. Once an entry is
+stale, callers keep getting the cached value while a background thread
+fetches the current version, so rotated secrets are picked up without a
+redeploy and without blocking requests.
 """
 
+import logging
 import os
-from typing import Optional, Dict
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Dict, List, Tuple
 from functools import lru_cache
 
+from tracing import traced
+
+
+logger = logging.getLogger(__name__)
+
+# How long a fetched secret is served before it is refreshed
+SECRET_CACHE_TTL_SECONDS = float(os.getenv("SECRET_CACHE_TTL_SECONDS", "300"))
+
+# Maximum concurrent Secret Manager calls during preload
+PRELOAD_MAX_WORKERS = 8
+
+# Cache for secrets to avoid repeated API calls: cache_key -> (value, fetched_at)
+_secrets_cache: Dict[str, Tuple[str, float]] = {}
+_cache_lock = threading.Lock()
+
+# Keys with a background refresh in progress
+_refreshing: set = set()
+_refresh_executor: Optional[ThreadPoolExecutor] = None
 
-# Cache for secrets to avoid repeated API calls
-_secrets_cache: Dict[str, str] = {}
+# Callbacks invoked with the secret ID when a refresh observes a new value
+_refresh_listeners: List[Callable[[str], None]] = []
 
 # Flag to determine if we should use environment variables as fallback
 # Set USE_ENV_SECRETS=true for local development without Secret Manager
 _use_env_fallback = os.getenv("USE_ENV_SECRETS", "false").lower() == "true"
 
 
+@lru_cache(maxsize=1)
 def _get_project_id() -> str:
     """
-    Get the GCP project ID.
+    Get the GCP project ID (memoized once resolved).
     
     In Cloud Run, this is available via metadata server.
     Otherwise, falls back to environment variable.
@@ -62,6 +90,78 @@ def _get_secret_manager_client():
     return secretmanager.SecretManagerServiceClient()
 
 
+def _fetch_secret(secret_id: str, version: str) -> str:
+    """Fetch a secret version from GCP Secret Manager, bypassing the cache."""
+    project_id = _get_project_id()
+    client = _get_secret_manager_client()
+    
+    name = f"projects/{project_id}/secrets/{secret_id}/versions/{version}"
+    response = client.access_secret_version(request={"name": name})
+    return response.payload.data.decode("UTF-8")
+
+
+def _store(cache_key: str, value: str) -> None:
+    """Cache a value, stamping it with the current time."""
+    with _cache_lock:
+        _secrets_cache[cache_key] = (value, time.monotonic())
+
+
+def _schedule_refresh(secret_id: str, version: str, cache_key: str) -> None:
+    """Refresh a stale secret in the background, at most once at a time per key."""
+    global _refresh_executor
+    
+    with _cache_lock:
+        if cache_key in _refreshing:
+            return
+        _refreshing.add(cache_key)
+        if _refresh_executor is None:
+            _refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="secret-refresh")
+        executor = _refresh_executor
+    
+    executor.submit(_refresh, secret_id, version, cache_key)
+
+
+def _refresh(secret_id: str, version: str, cache_key: str) -> None:
+    """Fetch the current value of a cached secret and notify listeners if it changed."""
+    try:
+        value = _fetch_secret(secret_id, version)
+    except Exception:
+        # Keep serving the cached value; the next stale read retries
+        logger.warning("Failed to refresh secret '%s'", secret_id, exc_info=True)
+        with _cache_lock:
+            _refreshing.discard(cache_key)
+        return
+    
+    with _cache_lock:
+        previous = _secrets_cache.get(cache_key)
+        _secrets_cache[cache_key] = (value, time.monotonic())
+        _refreshing.discard(cache_key)
+        listeners = list(_refresh_listeners)
+    
+    if previous is not None and previous[0] != value:
+        logger.info("Secret '%s' changed", secret_id)
+        for listener in listeners:
+            try:
+                listener(secret_id)
+            except Exception:
+                logger.exception("Secret refresh listener failed for '%s'", secret_id)
+
+
+def add_refresh_listener(listener: Callable[[str], None]) -> None:
+    """
+    Register a callback run when a background refresh sees a new secret value.
+    
+    Lets modules that derive state from a secret (e.g. resolved JWT
+    settings) drop it after a rotation.
+    
+    Args:
+        listener: Called with the secret ID that changed
+    """
+    with _cache_lock:
+        _refresh_listeners.append(listener)
+
+
+@traced("secrets.get")
 def get_secret(
     secret_id: str,
     default: Optional[str] = None,
@@ -71,7 +171,8 @@ def get_secret(
     Get a secret from GCP Secret Manager.
     
     This function:
-    1. Checks the in-memory cache first
+    1. Checks the in-memory cache first (stale entries are still returned
+       and refreshed in the background)
     2. If USE_ENV_SECRETS=true, uses environment variables
     3. Otherwise, fetches from GCP Secret Manager
     
@@ -93,8 +194,13 @@ def get_secret(
     """
     # Check cache first
     cache_key = f"{secret_id}:{version}"
-    if cache_key in _secrets_cache:
-        return _secrets_cache[cache_key]
+    cached = _secrets_cache.get(cache_key)
+    if cached is not None:
+        value, fetched_at = cached
+        # Environment values cannot change in-process, so they never go stale
+        if not _use_env_fallback and time.monotonic() - fetched_at >= SECRET_CACHE_TTL_SECONDS:
+            _schedule_refresh(secret_id, version, cache_key)
+        return value
     
     # Use environment variables if fallback is enabled (for local development)
     if _use_env_fallback:
@@ -104,26 +210,21 @@ def get_secret(
                 f"Secret '{secret_id}' not found in environment variables. "
                 f"Set {secret_id} or disable USE_ENV_SECRETS to use Secret Manager."
             )
-        _secrets_cache[cache_key] = value
+        _store(cache_key, value)
         return value
     
     # Fetch from GCP Secret Manager
     try:
-        project_id = _get_project_id()
-        client = _get_secret_manager_client()
-        
-        name = f"projects/{project_id}/secrets/{secret_id}/versions/{version}"
-        response = client.access_secret_version(request={"name": name})
-        value = response.payload.data.decode("UTF-8")
+        value = _fetch_secret(secret_id, version)
         
         # Cache the value
-        _secrets_cache[cache_key] = value
+        _store(cache_key, value)
         return value
         
     except Exception as e:
-        # If we have a default, use it
+        # If we have a default, use it (a later refresh may find the secret)
         if default is not None:
-            _secrets_cache[cache_key] = default
+            _store(cache_key, default)
             return default
         
         raise ValueError(
@@ -160,9 +261,47 @@ def clear_cache() -> None:
     
     Useful for testing or when you need to refresh secrets.
     """
-    global _secrets_cache
-    _secrets_cache = {}
+    with _cache_lock:
+        _secrets_cache.clear()
     _get_secret_manager_client.cache_clear()
+    _get_project_id.cache_clear()
+
+
+def _get_secrets_concurrently(secret_ids: list[str]) -> Dict[str, ValueError]:
+    """
+    Fetch several secrets into the cache in parallel.
+    
+    Args:
+        secret_ids: List of secret IDs to fetch
+        
+    Returns:
+        Errors keyed by the secret IDs that could not be fetched
+    """
+    if not secret_ids:
+        return {}
+    
+    # Resolve the project ID once up front instead of racing on it
+    if not _use_env_fallback:
+        try:
+            _get_project_id()
+        except ValueError:
+            pass
+    
+    def fetch(secret_id: str) -> Optional[ValueError]:
+        try:
+            get_secret(secret_id)
+            return None
+        except ValueError as e:
+            return e
+    
+    workers = min(PRELOAD_MAX_WORKERS, len(secret_ids))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="secret-preload") as executor:
+        results = executor.map(fetch, secret_ids)
+        return {
+            secret_id: error
+            for secret_id, error in zip(secret_ids, results)
+            if error is not None
+        }
 
 
 def preload_secrets(secret_ids: list[str]) -> None:
@@ -170,6 +309,7 @@ def preload_secrets(secret_ids: list[str]) -> None:
     Preload multiple secrets into cache.
     
     Useful during application startup to fail fast if secrets are missing.
+    Secrets are fetched concurrently.
     
     Args:
         secret_ids: List of secret IDs to preload
@@ -177,8 +317,9 @@ def preload_secrets(secret_ids: list[str]) -> None:
     Raises:
         ValueError: If any secret is not found
     """
-    for secret_id in secret_ids:
-        get_secret(secret_id)
+    errors = _get_secrets_concurrently(secret_ids)
+    if errors:
+        raise next(iter(errors.values()))
 
 
 # List of required secrets for this application
@@ -204,13 +345,7 @@ def validate_secrets() -> None:
     Raises:
         ValueError: If any required secret is missing
     """
-    missing = []
-    
-    for secret_id in REQUIRED_SECRETS:
-        try:
-            get_secret(secret_id)
-        except ValueError:
-            missing.append(secret_id)
+    missing = list(_get_secrets_concurrently(REQUIRED_SECRETS))
     
     if missing:
         raise ValueError(
@@ -0,0 +1,52 @@
+"""
+Shared fixtures.
+
+Tests run against the in-memory database (database/memory.py), so no GCP
+project or credentials are needed:
+
+    cd backend
+    python -m pytest -q
+"""
+
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Read when config and main are imported
+os.environ.setdefault("USE_ENV_SECRETS", "true")
+os.environ.setdefault("GCP_PROJECT_ID", "tests")
+os.environ.setdefault("JWT_SECRET", "tests-" + "x" * 32)
+os.environ.setdefault("DB_BACKEND", "memory")
+os.environ.setdefault("STARTUP_WARMUP", "false")
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """A fresh in-memory database, also returned by get_db()."""
+    from database import firestore as firestore_module
+    from database.memory import InMemoryFirestoreDB
+
+    database = InMemoryFirestoreDB()
+    monkeypatch.setattr(firestore_module, "_db_instance", database)
+    yield database
+    database.audit_log.close()
+
+
+@pytest.fixture
+def client(db):
+    """Flask test client dispatching every path through main.api."""
+    import flask
+    import main
+
+    app = flask.Flask("tests")
+    app.add_url_rule(
+        "/<path:path>",
+        "api",
+        lambda path: main.api(flask.request),
+        methods=["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"],
+    )
+    return app.test_client()
@@ -0,0 +1,78 @@
+"""Access decisions from token claims guarded by the permission version."""
+
+import pytest
+
+import main
+from auth import create_access_token, decode_token
+
+
+@pytest.fixture
+def amy(db):
+    db.create_user("amy", "Amy", "hash", ["d1"])
+    return db.get_user_by_id("amy")
+
+
+def token_payload(user, **claims):
+    token = create_access_token(
+        user_id=user["id"],
+        name=user["name"],
+        access=claims.get("access", user["access"]),
+        quick_access=user["quick_access"],
+        perm_version=claims.get("perm_version", user["perm_version"]),
+    )
+    return decode_token(token)
+
+
+def change_on_other_instance(db, user_id, updates):
+    """Write a permission change directly, as another instance would."""
+    db.client.collection(db.USERS_COLLECTION).document(user_id).update(updates)
+    # The local version map is refreshed after its TTL
+    db._permission_versions.clear()
+
+
+def test_current_claims_need_no_user_read(db, amy):
+    payload = token_payload(amy)
+    db.get_permission_versions()
+    db._user_cache.clear()
+    db.reset_rpc_stats()
+
+    assert main.get_current_access(payload) == {"access": ["d1"], "quick_access": True}
+    assert db.rpc_stats()["total_rpcs"] == 0
+
+
+def test_stale_claims_fall_back_to_current_record(db, amy):
+    payload = token_payload(amy)
+    change_on_other_instance(db, "amy", {"access": ["d2"], "perm_version": 1})
+
+    # The cached record predates the new version, so it is re-read
+    assert main.get_current_access(payload)["access"] == ["d2"]
+    assert db.get_user_by_id("amy")["perm_version"] == 1
+
+
+def test_deactivated_user_has_no_access(db, amy):
+    payload = token_payload(amy)
+    change_on_other_instance(db, "amy", {"is_active": False, "perm_version": 1})
+
+    assert main.get_current_access(payload) is None
+
+
+def test_user_missing_from_version_map_is_read(db, amy):
+    payload = token_payload(amy)
+    db._permission_versions.set("users", {})
+
+    assert main.get_current_access(payload)["access"] == ["d1"]
+
+
+def test_login_mints_current_version_after_change_elsewhere(client, db):
+    from auth import hash_password
+
+    db.create_user("amy", "Amy", hash_password("secret"), ["d1"])
+    assert db.get_user_by_id("amy")["perm_version"] == 0
+    change_on_other_instance(db, "amy", {"access": ["d1", "d2"], "perm_version": 1})
+
+    response = client.post("/auth/login", json={"user_id": "amy", "password": "secret"})
+
+    payload = decode_token(response.json["data"]["token"])
+    assert payload.perm_version == 1
+    assert payload.access == ["d1", "d2"]
+    assert main.get_current_access(payload)["access"] == ["d1", "d2"]
@@ -0,0 +1,126 @@
+"""Buffered audit-log writer."""
+
+import time
+
+import pytest
+
+from database.audit_log import AuditLogWriter
+from database.memory import MemoryClient
+
+
+@pytest.fixture
+def memory_client():
+    return MemoryClient()
+
+
+def make_writer(client, **kwargs):
+    """Writer whose background flush waits longer than any test."""
+    kwargs.setdefault("flush_interval_seconds", 60.0)
+    return AuditLogWriter(get_client=lambda: client, collection="audit_logs", **kwargs)
+
+
+def logged_ids(client):
+    return {doc.id for doc in client.collection("audit_logs").stream()}
+
+
+def fail_commits(monkeypatch, client):
+    def fail_commit(self):
+        raise RuntimeError("unavailable")
+
+    monkeypatch.setattr(type(client.batch()), "commit", fail_commit)
+
+
+def test_entries_are_committed_in_one_batch(memory_client):
+    writer = make_writer(memory_client)
+    entry_ids = [writer.write({"action": "access_demo", "n": i}) for i in range(3)]
+    assert logged_ids(memory_client) == set()
+
+    memory_client.store.reset_stats()
+    assert writer.flush() == 3
+
+    assert memory_client.store.stats()["rpcs"] == {"commit": 1}
+    assert logged_ids(memory_client) == set(entry_ids)
+    assert writer.pending == 0
+
+
+def test_sync_entries_are_written_immediately(memory_client):
+    writer = make_writer(memory_client)
+
+    entry_id = writer.write({"action": "login_success"}, sync=True)
+
+    assert logged_ids(memory_client) == {entry_id}
+    assert writer.pending == 0
+
+
+def test_large_flush_is_split_into_batches(memory_client, monkeypatch):
+    monkeypatch.setattr(AuditLogWriter, "MAX_BATCH_WRITES", 2)
+    writer = make_writer(memory_client)
+    for i in range(5):
+        writer.write({"n": i})
+    memory_client.store.reset_stats()
+
+    assert writer.flush() == 5
+    assert memory_client.store.stats()["rpcs"] == {"commit": 3}
+
+
+def test_failed_commit_keeps_entries_for_next_flush(memory_client, monkeypatch):
+    writer = make_writer(memory_client)
+    entry_ids = [writer.write({"n": i}) for i in range(2)]
+
+    with monkeypatch.context() as patch:
+        fail_commits(patch, memory_client)
+        assert writer.flush() == 0
+
+    assert writer.failed_flushes == 1
+    assert writer.pending == 2
+    assert writer.flush() == 2
+    assert logged_ids(memory_client) == set(entry_ids)
+
+
+def test_buffer_is_bounded_while_commits_fail(memory_client, monkeypatch):
+    writer = make_writer(memory_client, max_buffered=3)
+    for i in range(5):
+        writer.write({"n": i})
+
+    fail_commits(monkeypatch, memory_client)
+    writer.flush()
+
+    assert writer.pending == 3
+    assert writer.dropped == 2
+
+
+def test_full_buffer_is_flushed_in_the_background(memory_client):
+    writer = make_writer(memory_client, flush_size=3)
+    for i in range(3):
+        writer.write({"n": i})
+
+    deadline = time.monotonic() + 5
+    while writer.written < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert writer.written == 3
+    assert len(logged_ids(memory_client)) == 3
+
+
+def test_close_commits_remaining_entries(memory_client):
+    writer = make_writer(memory_client)
+    entry_id = writer.write({"action": "logout"})
+
+    writer.close()
+
+    assert logged_ids(memory_client) == {entry_id}
+
+
+def test_request_entries_are_flushed_after_the_response(client, db):
+    from auth import create_access_token
+
+    token = create_access_token("amy", "Amy", [])
+    db.log_action("access_demo", "amy")
+    assert db.audit_log.pending == 1
+
+    # Any routed request flushes what is buffered once its response closes
+    response = client.get("/users/access", headers={"Authorization": f"Bearer {token}"})
+    response.close()
+
+    assert db.audit_log.pending == 0
+    assert db.audit_log.written == 1
@@ -0,0 +1,85 @@
+"""Sharded activity counters and the user activity document."""
+
+import itertools
+
+import pytest
+
+from database import firestore as firestore_module
+
+
+@pytest.fixture
+def spread_shards(monkeypatch):
+    """Pick counter shards in turn instead of at random."""
+    shards = itertools.count()
+    monkeypatch.setattr(firestore_module.random, "randrange", lambda n: next(shards) % n)
+
+
+def test_counters_are_spread_over_shards_and_summed(db, spread_shards):
+    db.create_user("amy", "Amy", "hash", [])
+    db.log_user_activity("amy", "session_start", session_id="s1")
+    db.log_user_activity("amy", "page_view", demo_id="d1", session_id="s1")
+    db.log_user_activity("amy", "page_view", demo_id="d2", session_id="s1")
+    db.log_user_activity_batch("amy", [
+        {"event_type": "page_exit", "data": {"duration_seconds": 12}},
+        {"event_type": "page_view", "demo_id": "d1"},
+    ])
+
+    shards = list(db._get_user_counter_shards_ref("amy").stream())
+    assert len(shards) == 4
+
+    summary = db.get_user_activity_summary("amy")
+    assert summary["total_events"] == 5
+    assert summary["total_sessions"] == 1
+    assert summary["total_time_seconds"] == 12
+    assert sorted(summary["demos_visited"]) == ["d1", "d2"]
+
+
+def test_first_write_creates_activity_document(db):
+    db.log_user_activity("ghost", "page_view")
+
+    doc = db._get_user_activity_ref("ghost").get()
+    assert doc.exists
+    assert doc.to_dict()["user_id"] == "ghost"
+    assert "ghost" in db.list_activity_user_ids()
+
+
+def test_activity_document_is_merged_once(db):
+    db.create_user("amy", "Amy", "hash", [])
+    db.log_user_activity("amy", "page_view")
+    parent = db._get_user_activity_ref("amy")
+    written_at = parent.get().update_time
+
+    db.log_user_activity("amy", "page_view")
+    db.log_user_activity_batch("amy", [{"event_type": "page_view"}])
+
+    assert parent.get().update_time == written_at
+
+
+def test_merge_keeps_paused_tracking(db):
+    db.create_user("amy", "Amy", "hash", [])
+    db.initialize_user_activity("amy", "Amy")
+    db._get_user_activity_ref("amy").update({"is_tracking_active": False})
+    db._activity_docs_ensured.clear()
+
+    db.log_user_activity("amy", "page_view")
+
+    assert db._get_user_activity_ref("amy").get().to_dict()["is_tracking_active"] is False
+
+
+@pytest.mark.parametrize("log", [
+    lambda db: db.log_user_activity("ghost", "page_view"),
+    lambda db: db.log_user_activity_batch("ghost", [{"event_type": "page_view"}], raise_commit_errors=True),
+])
+def test_failed_commit_does_not_mark_document_created(db, monkeypatch, log):
+    def fail_commit(self):
+        raise RuntimeError("unavailable")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(type(db.client.batch()), "commit", fail_commit)
+        with pytest.raises(RuntimeError):
+            log(db)
+
+    assert db._activity_docs_ensured.get("ghost") is None
+
+    log(db)
+    assert db._get_user_activity_ref("ghost").get().exists
@@ -0,0 +1,86 @@
+"""Cached demo catalog and list_demos revalidation."""
+
+import pytest
+
+from auth import create_access_token
+
+
+@pytest.fixture
+def demos(db):
+    db.create_demo("d1", "Demo 1", "First", "*", "HealthTech", "/d1.html", [])
+    db.create_demo("d2", "Demo 2", "Second", "*", "Legal", "/d2.html", [])
+    db.delete_demo("d2")
+    db.reset_rpc_stats()
+
+
+def admin_headers():
+    return {"Authorization": f"Bearer {create_access_token('admin', 'Admin', [], is_admin=True)}"}
+
+
+def test_catalog_is_read_once(db, demos):
+    catalog = db.get_demo_catalog()
+    assert db.get_demo_catalog() == catalog
+
+    assert db.rpc_stats()["rpcs"] == {"query": 1}
+    assert [demo["id"] for demo in catalog["demos"]] == ["d1"]
+
+
+def test_etag_depends_only_on_contents(db, demos):
+    etag = db.get_demo_catalog()["etag"]
+
+    db.invalidate_demo_catalog()
+    assert db.get_demo_catalog()["etag"] == etag
+    assert db.get_demo_catalog(include_inactive=True)["etag"] != etag
+
+    db.update_demo("d1", {"title": "Renamed"})
+    assert db.get_demo_catalog()["etag"] != etag
+
+
+def test_list_demos_sends_etag(client, demos):
+    response = client.get("/demos")
+
+    assert response.status_code == 200
+    assert response.headers["ETag"].startswith('"')
+    assert response.headers["Cache-Control"].startswith("public, max-age=")
+    assert response.json["data"]["count"] == 1
+
+
+@pytest.mark.parametrize("if_none_match", ["{etag}", "W/{etag}", '"other", {etag}', "*"])
+def test_current_etag_gets_not_modified(client, demos, if_none_match):
+    etag = client.get("/demos").headers["ETag"]
+
+    response = client.get("/demos", headers={"If-None-Match": if_none_match.format(etag=etag)})
+
+    assert response.status_code == 304
+    assert response.get_data() == b""
+    assert response.headers["ETag"] == etag
+
+
+def test_changed_catalog_is_sent_again(client, db, demos):
+    etag = client.get("/demos").headers["ETag"]
+    db.reactivate_demo("d2")
+
+    response = client.get("/demos", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json["data"]["count"] == 2
+
+
+def test_admin_catalog_is_private(client, demos):
+    assert client.get("/demos?include_inactive=true").status_code == 401
+
+    response = client.get("/demos?include_inactive=true", headers=admin_headers())
+
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "private, no-cache"
+    assert "Authorization" in response.headers["Vary"]
+    assert response.json["data"]["count"] == 2
+
+
+def test_paged_listing_bypasses_the_catalog(client, db, demos):
+    response = client.get("/demos?limit=1")
+
+    assert response.status_code == 200
+    assert "ETag" not in response.headers
+    assert db._demo_catalog_cache.get(False) is None
@@ -0,0 +1,80 @@
+"""Daily engagement aggregated over all users."""
+
+from datetime import datetime, timezone
+
+import pytest
+
+from auth import create_access_token
+from database import firestore as firestore_module
+
+
+def at(day):
+    return datetime(2026, 3, day, 12, tzinfo=timezone.utc)
+
+
+def log(db, user_id, day, *events):
+    _, errors = db.log_user_activity_batch(user_id, list(events), received_at=[at(day)] * len(events))
+    assert not errors
+
+
+@pytest.fixture
+def activity(db):
+    log(db, "amy", 1,
+        {"event_type": "session_start", "session_id": "s1"},
+        {"event_type": "page_view", "demo_id": "d1"},
+        {"event_type": "page_view", "demo_id": "d2"})
+    log(db, "bob", 1,
+        {"event_type": "page_view", "demo_id": "d2"},
+        {"event_type": "demo_launched", "demo_id": "d2"})
+    log(db, "amy", 2,
+        {"event_type": "chat_message_sent", "demo_id": "d1"})
+    db.reset_rpc_stats()
+
+
+def test_engagement_sums_all_users(db, activity):
+    engagement = db.get_activity_engagement("2026-03-01", "2026-03-02")
+
+    assert engagement["totals"]["events"] == 6
+    assert engagement["totals"]["sessions"] == 1
+    # amy was active on both days
+    assert engagement["totals"]["active_users"] == 2
+    assert [(day["date"], day["active_users"], day["events"]) for day in engagement["days"]] == [
+        ("2026-03-01", 2, 5),
+        ("2026-03-02", 1, 1),
+    ]
+    assert db.rpc_stats()["rpcs"] == {"query": 1}
+
+
+def test_demos_are_ordered_by_views(db, activity):
+    demos = db.get_activity_engagement("2026-03-01", "2026-03-31")["demos"]
+
+    assert [demo["demo_id"] for demo in demos] == ["d2", "d1"]
+    assert (demos[0]["views"], demos[0]["launches"]) == (2, 1)
+    assert demos[1]["chat_messages"] == 1
+
+
+def test_days_are_spread_over_shards(db, monkeypatch):
+    shards = iter(range(100))
+    monkeypatch.setattr(firestore_module.random, "randrange", lambda n: next(shards) % n)
+    for user_id in ["amy", "bob", "cy"]:
+        log(db, user_id, 1, {"event_type": "page_view", "demo_id": "d1"})
+
+    stored = list(db.client.collection(db.ACTIVITY_DAILY_COLLECTION).stream())
+
+    assert len(stored) > 1
+    assert len(stored) <= db.ACTIVITY_DAILY_SHARDS
+    engagement = db.get_activity_engagement("2026-03-01", "2026-03-01")
+    assert engagement["totals"]["views"] == 3
+    assert engagement["totals"]["active_users"] == 3
+
+
+def test_engagement_endpoint(client, activity):
+    admin = {"Authorization": f"Bearer {create_access_token('admin', 'Admin', [], is_admin=True)}"}
+    user = {"Authorization": f"Bearer {create_access_token('amy', 'Amy', [])}"}
+
+    response = client.get("/admin/activity/engagement?start=2026-03-01&end=2026-03-01", headers=admin)
+    assert response.status_code == 200
+    assert response.json["data"]["totals"]["active_users"] == 2
+
+    assert client.get("/admin/activity/engagement", headers=user).status_code == 403
+    assert client.get("/admin/activity/engagement?start=2026-03-02&end=2026-03-01", headers=admin).status_code == 400
@@ -0,0 +1,148 @@
+"""Streaming activity exports."""
+
+import csv
+import io
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import activity_export
+from activity_export import EXPORT_FORMATS, TRUNCATED_MESSAGE, csv_chunks, ndjson_chunks
+from auth import create_access_token
+
+
+@pytest.fixture
+def amy(db):
+    db.create_user("amy", "Amy", "hash", [])
+    now = datetime.now(timezone.utc)
+    times = [now - timedelta(days=5 * i) for i in range(10)]
+    event_ids, errors = db.log_user_activity_batch(
+        "amy", [{"event_type": "page_view", "demo_id": "d1"} for _ in times], received_at=times,
+    )
+    assert not errors
+    db.reset_rpc_stats()
+    return [event_id for _, event_id in sorted(zip(times, event_ids))]
+
+
+def admin_headers():
+    return {"Authorization": f"Bearer {create_access_token('admin', 'Admin', [], is_admin=True)}"}
+
+
+def failing_events(count):
+    for i in range(count):
+        yield {"id": f"e{i}", "event_type": "page_view"}
+    raise RuntimeError("unavailable")
+
+
+def test_stream_reads_oldest_first_in_pages(db, amy, monkeypatch):
+    monkeypatch.setattr(db, "EVENT_EXPORT_PAGE_SIZE", 3)
+    paginate = db._paginate
+    page_sizes = []
+
+    def record_page(*args, **kwargs):
+        page, cursor = paginate(*args, **kwargs)
+        page_sizes.append(len(page))
+        return page, cursor
+
+    monkeypatch.setattr(db, "_paginate", record_page)
+
+    events = list(db.stream_user_events("amy"))
+
+    assert [event["id"] for event in events] == amy
+    assert sum(page_sizes) == len(amy)
+    assert max(page_sizes) == 3
+
+
+def test_stream_is_read_lazily(db, amy, monkeypatch):
+    monkeypatch.setattr(db, "EVENT_EXPORT_PAGE_SIZE", 3)
+    db._list_event_partitions("amy")
+    db.reset_rpc_stats()
+
+    events = db.stream_user_events("amy")
+    assert next(events)["id"] == amy[0]
+
+    assert db.rpc_stats()["rpcs"]["query"] <= 2
+
+
+def test_csv_is_sent_in_chunks(monkeypatch):
+    monkeypatch.setattr(activity_export, "CHUNK_ROWS", 2)
+    events = [{"id": f"e{i}", "event_type": "page_view"} for i in range(5)]
+
+    chunks = list(csv_chunks(events))
+
+    assert len(chunks) == 3
+    rows = list(csv.reader(io.StringIO("".join(chunks))))
+    assert rows[0] == activity_export.CSV_COLUMNS
+    assert [row[0] for row in rows[1:]] == [f"e{i}" for i in range(5)]
+
+
+def test_empty_csv_export_has_header():
+    assert list(csv_chunks([])) == [",".join(activity_export.CSV_COLUMNS) + "\r\n"]
+
+
+@pytest.mark.parametrize("value", ["=HYPERLINK(\"x\")", "+1", "-1", "@SUM(A1)", "\tx", "\rx"])
+def test_csv_neutralises_formulas(value):
+    chunks = csv_chunks([{"id": "e1", "page_url": value, "data": {"note": value}}])
+
+    row = list(csv.reader(io.StringIO("".join(chunks))))[1]
+    assert row[activity_export.CSV_COLUMNS.index("page_url")] == "'" + value
+    # JSON-encoded data starts with "{"
+    assert json.loads(row[activity_export.CSV_COLUMNS.index("data")]) == {"note": value}
+
+
+def test_csv_keeps_numbers_and_plain_text():
+    chunks = csv_chunks([{"id": "e1", "page_url": "https://example.com/-x", "data": -1}])
+
+    row = list(csv.reader(io.StringIO("".join(chunks))))[1]
+    assert row[activity_export.CSV_COLUMNS.index("page_url")] == "https://example.com/-x"
+    assert row[activity_export.CSV_COLUMNS.index("data")] == "-1"
+
+
+def test_truncated_csv_ends_with_error_row():
+    chunks = []
+    with pytest.raises(RuntimeError):
+        for chunk in csv_chunks(failing_events(2)):
+            chunks.append(chunk)
+
+    rows = list(csv.reader(io.StringIO("".join(chunks))))
+    assert len(rows) == 4
+    assert rows[-1][0] == f"#ERROR: {TRUNCATED_MESSAGE} after 2 events"
+
+
+def test_truncated_ndjson_ends_with_error_line():
+    chunks = []
+    with pytest.raises(RuntimeError):
+        for chunk in ndjson_chunks(failing_events(2)):
+            chunks.append(chunk)
+
+    lines = [json.loads(line) for line in "".join(chunks).splitlines()]
+    assert [line.get("id") for line in lines[:2]] == ["e0", "e1"]
+    assert lines[-1] == {"error": TRUNCATED_MESSAGE, "events_written": 2}
+
+
+def test_export_endpoint_streams_csv(client, amy):
+    response = client.get("/admin/activity/amy/export?format=csv", headers=admin_headers())
+
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == EXPORT_FORMATS["csv"].content_type
+    assert 'filename="activity-amy.csv"' in response.headers["Content-Disposition"]
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert [row[0] for row in rows[1:]] == amy
+
+
+def test_export_endpoint_defaults_to_ndjson(client, amy):
+    response = client.get("/admin/activity/amy/export?event_type=page_view", headers=admin_headers())
+
+    assert response.status_code == 200
+    lines = response.get_data(as_text=True).splitlines()
+    assert [json.loads(line)["id"] for line in lines] == amy
+
+
+@pytest.mark.parametrize("path, status", [
+    ("/admin/activity/amy/export?format=xlsx", 400),
+    ("/admin/activity/amy/export?start=yesterday", 400),
+    ("/admin/activity/nobody/export", 404),
+])
+def test_export_endpoint_errors(client, amy, path, status):
+    assert client.get(path, headers=admin_headers()).status_code == status
@@ -0,0 +1,218 @@
+"""Activity spool: segments, orphan adoption and draining."""
+
+import functools
+import json
+import os
+import time
+
+import pytest
+
+from database.ingest import ActivityIngestQueue, FileSpool, SpoolBackend
+
+
+@pytest.fixture
+def queue(db, tmp_path):
+    """Spool queue draining into the in-memory database (drained by hand)."""
+    activity_queue = db.enable_activity_spool(str(tmp_path))
+    activity_queue._ensure_drainer = lambda: None
+    return activity_queue
+
+
+def spooled_record(record_id, event):
+    """A spool record as enqueue writes it."""
+    return {
+        "id": record_id,
+        "user_id": "amy",
+        "ip_address": None,
+        "user_agent": None,
+        "received_at": "2026-01-15T10:00:00+00:00",
+        "event": event,
+    }
+
+
+def test_spool_backend_is_abstract():
+    with pytest.raises(TypeError):
+        SpoolBackend()
+
+
+def test_file_spool_segment_lifecycle(tmp_path):
+    spool = FileSpool(str(tmp_path))
+    spool.append([{"id": "a"}, {"id": "b"}])
+    spool.append([{"id": "c"}])
+    assert spool.ready_segments() == []
+
+    spool.seal()
+    (segment,) = spool.ready_segments()
+    assert [record["id"] for record in spool.read(segment)] == ["a", "b", "c"]
+
+    spool.mark_committed(segment, ["a", "b"])
+    assert spool.committed_ids(segment) == {"a", "b"}
+
+    spool.remove(segment)
+    assert spool.ready_segments() == []
+
+
+def test_file_spool_adopts_segments_of_exited_owner(tmp_path):
+    previous = FileSpool(str(tmp_path))
+    previous.append([{"id": "a"}])
+    previous.seal()
+    previous.append([{"id": "b"}])
+    # The lock is released when the owning process exits
+    previous._owner_lock.close()
+
+    spool = FileSpool(str(tmp_path))
+
+    records = [record["id"] for segment in spool.ready_segments() for record in spool.read(segment)]
+    assert sorted(records) == ["a", "b"]
+    assert not os.path.exists(tmp_path / f"{previous._owner}.lock")
+
+
+def test_queue_drains_adopted_segments_without_new_events(db, tmp_path):
+    previous = FileSpool(str(tmp_path))
+    previous.append([spooled_record("a", {"event_type": "page_view"})])
+    previous.seal()
+    previous._owner_lock.close()
+
+    queue = ActivityIngestQueue(
+        write_batch=functools.partial(db.log_user_activity_batch, raise_commit_errors=True),
+        backend=FileSpool(str(tmp_path)),
+        drain_interval_seconds=0.01,
+    )
+
+    deadline = time.monotonic() + 5
+    while queue.backend.ready_segments() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert queue.backend.ready_segments() == []
+    assert queue.accepted == 0
+    assert queue.written == 1
+    queue.close()
+    assert [event["id"] for event in db.get_user_events("amy")] == ["a"]
+
+
+def test_file_spool_leaves_segments_of_running_owner(tmp_path):
+    running = FileSpool(str(tmp_path))
+    running.append([{"id": "a"}])
+    running.seal()
+
+    spool = FileSpool(str(tmp_path))
+
+    assert spool.ready_segments() == []
+    assert len(running.ready_segments()) == 1
+
+
+def test_enqueue_rejects_invalid_events(queue):
+    event_ids, errors = queue.enqueue("amy", [
+        {"event_type": "page_view", "session_id": "s1"},
+        {"event_type": "page_exit", "data": {"duration_seconds": "abc"}},
+        {"event_type": "page_view", "session_id": "a/b"},
+        {"event_type": "page_view", "session_id": ["s1"]},
+        {"data": {}},
+        "page_view",
+    ])
+
+    assert len(event_ids) == 1
+    assert [error["index"] for error in errors] == [1, 2, 3, 4, 5]
+    assert queue.accepted == 1
+
+
+def test_drain_writes_accepted_events(db, queue):
+    event_ids, _ = queue.enqueue("amy", [
+        {"event_type": "session_start", "session_id": "s1"},
+        {"event_type": "page_exit", "session_id": "s1", "data": {"duration_seconds": 5}},
+    ])
+    queue.backend.seal()
+
+    assert queue.drain() == 2
+    assert sorted(event["id"] for event in db.get_user_events("amy")) == sorted(event_ids)
+    assert db.get_user_activity_summary("amy")["total_time_seconds"] == 5
+    assert queue.backend.ready_segments() == []
+
+
+def test_drain_dead_letters_rejected_events(db, queue, tmp_path):
+    # Spooled before validation, e.g. by an older version
+    queue.backend.append([
+        spooled_record("bad", {"event_type": "page_exit", "data": {"duration_seconds": "abc"}}),
+        spooled_record("good", {"event_type": "page_view"}),
+    ])
+    queue.backend.append([spooled_record("all-bad", {"event_type": "page_view", "session_id": "__x__"})])
+    queue.backend.seal()
+
+    assert queue.drain() == 1
+    assert queue.backend.ready_segments() == []
+    assert [event["id"] for event in db.get_user_events("amy")] == ["good"]
+    assert queue.stats()["rejected"] == 2
+    assert queue.failed_drains == 0
+
+    with open(tmp_path / FileSpool.DEAD_LETTER_FILE) as f:
+        rejected = [json.loads(line) for line in f]
+    assert sorted(record["id"] for record in rejected) == ["all-bad", "bad"]
+    assert all(record["error"] for record in rejected)
+
+
+def test_drain_retries_failed_commits(db, queue, monkeypatch):
+    queue.enqueue("amy", [{"event_type": "page_view"}])
+    queue.backend.seal()
+
+    def fail_commit(self):
+        raise RuntimeError("unavailable")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(type(db.client.batch()), "commit", fail_commit)
+        assert queue.drain() == 0
+
+    assert queue.failed_drains == 1
+    assert len(queue.backend.ready_segments()) == 1
+    assert db.get_user_events("amy") == []
+
+    assert queue.drain() == 1
+    assert queue.backend.ready_segments() == []
+    assert len(db.get_user_events("amy")) == 1
+
+
+def test_drain_skips_records_already_committed(db, queue):
+    event_ids, _ = queue.enqueue("amy", [{"event_type": "page_view"}, {"event_type": "page_view"}])
+    queue.backend.seal()
+    (segment,) = queue.backend.ready_segments()
+    queue.backend.mark_committed(segment, event_ids[:1])
+
+    assert queue.drain() == 1
+    assert [event["id"] for event in db.get_user_events("amy")] == event_ids[1:]
+
+
+def auth_headers(user_id):
+    from auth import create_access_token
+
+    return {"Authorization": f"Bearer {create_access_token(user_id, user_id, [])}"}
+
+
+def test_track_batch_rejects_batch_without_valid_events(client, queue):
+    response = client.post("/activity/track-batch", headers=auth_headers("amy"), json={"events": [
+        {"event_type": "page_exit", "data": {"duration_seconds": "abc"}},
+        {"event_type": "page_view", "session_id": "__x__"},
+    ]})
+
+    assert response.status_code == 400
+    assert [error["index"] for error in response.json["errors"]] == [0, 1]
+    assert queue.accepted == 0
+
+
+def test_track_batch_accepts_valid_events_of_a_batch(client, queue):
+    response = client.post("/activity/track-batch", headers=auth_headers("amy"), json={"events": [
+        {"event_type": "page_view", "session_id": "s1"},
+        {"event_type": "page_view", "session_id": "a/b"},
+    ]})
+
+    assert response.status_code == 202
+    assert response.json["data"]["tracked_count"] == 1
+    assert [error["index"] for error in response.json["data"]["errors"]] == [1]
+
+
+def test_track_rejects_invalid_event(client, queue):
+    response = client.post("/activity/track", headers=auth_headers("amy"), json={
+        "event_type": "page_view",
+        "session_id": {"id": "s1"},
+    })
+
+    assert response.status_code == 400
+    assert queue.accepted == 0
@@ -0,0 +1,102 @@
+"""Events written before monthly partitioning, until they are migrated."""
+
+from datetime import datetime, timedelta, timezone
+
+
+def log_events(db, user_id, days):
+    """Log one partitioned event per day for the last `days` days."""
+    now = datetime.now(timezone.utc)
+    times = [now - timedelta(days=day) for day in range(days)]
+    event_ids, errors = db.log_user_activity_batch(
+        user_id=user_id,
+        events=[{"event_type": "page_view", "session_id": "s1"} for _ in times],
+        received_at=times,
+    )
+    assert not errors
+    return dict(zip(event_ids, times))
+
+
+def write_legacy_events(db, user_id, count, event_type="page_view"):
+    """Write events where they were stored before partitioning."""
+    legacy_ref = db._get_user_legacy_events_ref(user_id)
+    now = datetime.now(timezone.utc)
+    written = {}
+    for i in range(count):
+        timestamp = now - timedelta(days=10 * i, hours=1)
+        legacy_ref.document(f"legacy{i}").set({"event_type": event_type, "timestamp": timestamp})
+        written[f"legacy{i}"] = timestamp
+    return written
+
+
+def collect_pages(db, user_id, limit):
+    """Follow event cursors to the end; returns every page."""
+    pages = []
+    cursor = None
+    while True:
+        events, cursor = db.get_user_events_page(user_id, limit=limit, cursor=cursor)
+        pages.append(events)
+        if cursor is None:
+            return pages
+
+
+def test_event_cursors_include_unmigrated_events(db):
+    logged = log_events(db, "amy", days=60)
+    logged.update(write_legacy_events(db, "amy", 5))
+
+    pages = collect_pages(db, "amy", limit=6)
+    streamed = [event["id"] for event in db.stream_user_events("amy")]
+
+    expected = sorted(logged, key=logged.get, reverse=True)
+    assert [event["id"] for page in pages for event in page] == expected
+    assert streamed == expected[::-1]
+
+    assert db.migrate_legacy_events("amy") == 5
+    assert [event["id"] for event in db.get_user_events("amy", limit=None)] == expected
+
+
+def test_unmigrated_events_are_filtered(db):
+    log_events(db, "amy", days=3)
+    write_legacy_events(db, "amy", 2, event_type="demo_open")
+
+    events = db.get_user_events("amy", event_type="demo_open")
+
+    assert sorted(event["id"] for event in events) == ["legacy0", "legacy1"]
+
+
+def test_migration_removes_the_extra_query(db):
+    log_events(db, "amy", days=3)
+    write_legacy_events(db, "amy", 2)
+    db.get_user_events("amy")
+    db.reset_rpc_stats()
+    db.get_user_events("amy")
+    before = db.rpc_stats()["rpcs"]["query"]
+
+    db.migrate_legacy_events("amy")
+    db.reset_rpc_stats()
+    events = db.get_user_events("amy")
+
+    assert len(events) == 5
+    assert db.rpc_stats()["rpcs"]["query"] == before - 1
+    assert list(db._get_user_legacy_events_ref("amy").stream()) == []
+
+
+def test_migration_can_be_resumed(db, monkeypatch):
+    write_legacy_events(db, "amy", 5)
+    monkeypatch.setattr(db, "EVENT_MAINTENANCE_BATCH_SIZE", 2)
+
+    assert db.migrate_legacy_events("amy") == 5
+    assert db.migrate_legacy_events("amy") == 0
+    assert len(db.get_user_events("amy")) == 5
+
+
+def test_purge_deletes_old_unmigrated_events(db):
+    log_events(db, "amy", days=3)
+    write_legacy_events(db, "amy", 5)
+
+    deleted = db.purge_user_events("amy", datetime.now(timezone.utc) - timedelta(days=15))
+
+    # legacy2..legacy4 are 20, 30 and 40 days old
+    assert deleted == 3
+    assert sorted(event["id"] for event in db.get_user_events("amy") if event["id"].startswith("legacy")) == [
+        "legacy0", "legacy1",
+    ]
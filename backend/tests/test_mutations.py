@@ -0,0 +1,131 @@
+"""User and demo mutations: round trips, results and state conflicts."""
+
+import pytest
+
+from database import StateConflict
+
+
+@pytest.fixture
+def amy(db):
+    db.create_user("amy", "Amy", "hash", ["d1"])
+    db.reset_rpc_stats()
+    return db.get_user_by_id("amy")
+
+
+@pytest.fixture
+def demo(db):
+    db.create_demo("d1", "Demo", "A demo", "*", "HealthTech", "/d1.html", ["tag"])
+    db.reset_rpc_stats()
+
+
+def admin_headers(db):
+    from auth import create_access_token
+
+    db.create_user("admin", "Admin", "hash", [], is_admin=True)
+    token = create_access_token("admin", "Admin", [], is_admin=True)
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_update_of_cached_user_is_one_write(db, amy):
+    user = db.update_user("amy", {"name": "Amy B"})
+
+    assert db.rpc_stats()["rpcs"] == {"update": 1}
+    assert user["name"] == "Amy B"
+    assert user["access"] == ["d1"]
+    assert user["perm_version"] == 0
+
+
+def test_permission_update_returns_and_caches_new_version(db, amy):
+    user = db.update_user("amy", {"access": ["d1", "d2"]})
+
+    assert user["access"] == ["d1", "d2"]
+    assert user["perm_version"] == 1
+    db.reset_rpc_stats()
+    assert db.get_user_by_id("amy")["perm_version"] == 1
+    assert db.rpc_stats()["total_rpcs"] == 0
+
+
+def test_update_survives_cache_eviction(db, amy, monkeypatch):
+    monkeypatch.setattr(db._user_cache, "get", lambda key: None)
+
+    user = db.update_user("amy", {"name": "Amy B"})
+
+    assert user["name"] == "Amy B"
+
+
+def test_update_of_missing_user_returns_none(db):
+    assert db.update_user("nobody", {"name": "X"}) is None
+    assert db.rpc_stats()["rpcs"] == {"update": 1}
+
+
+def test_deactivate_and_reactivate_user(db, amy):
+    assert db.deactivate_user("amy") is True
+    assert db.get_user_by_id("amy")["is_active"] is False
+    assert db.get_user_by_id("amy")["perm_version"] == 1
+
+    with pytest.raises(StateConflict):
+        db.deactivate_user("amy")
+
+    assert db.reactivate_user("amy") is True
+    with pytest.raises(StateConflict):
+        db.reactivate_user("amy")
+
+    assert db.deactivate_user("nobody") is False
+
+
+def test_update_demo_returns_full_record_without_reads(db, demo):
+    db.get_demo_catalog()
+    db.reset_rpc_stats()
+
+    updated = db.update_demo("d1", {"title": "New title"})
+
+    assert db.rpc_stats()["rpcs"] == {"update": 1}
+    assert updated["title"] == "New title"
+    assert updated["industry"] == "HealthTech"
+    assert db.update_demo("missing", {"title": "X"}) is None
+
+
+def test_demo_state_conflicts(db, demo):
+    assert db.delete_demo("d1") is True
+    with pytest.raises(StateConflict):
+        db.delete_demo("d1")
+    assert db.reactivate_demo("d1") is True
+    with pytest.raises(StateConflict):
+        db.reactivate_demo("d1")
+    assert db.delete_demo("missing") is False
+
+
+@pytest.mark.parametrize("method, path, status", [
+    ("delete", "/admin/users/amy", 200),
+    ("post", "/admin/users/amy/reactivate", 400),
+    ("delete", "/admin/users/nobody", 404),
+    ("delete", "/admin/demos/d1", 200),
+    ("post", "/admin/demos/d1/reactivate", 400),
+    ("delete", "/admin/demos/missing", 404),
+])
+def test_state_changes_map_to_status_codes(client, db, amy, demo, method, path, status):
+    response = getattr(client, method)(path, headers=admin_headers(db))
+
+    assert response.status_code == status
+
+
+def test_update_endpoint_returns_full_record(client, db, amy):
+    response = client.put("/admin/users/amy", json={"name": "Amy B"}, headers=admin_headers(db))
+
+    assert response.status_code == 200
+    assert response.json["data"]["access"] == ["d1"]
+    assert "password_hash" not in response.json["data"]
+
+
+def test_login_after_access_change_gets_current_version(client, db):
+    from auth import decode_token, hash_password
+
+    db.create_user("amy", "Amy", hash_password("secret"), ["d1"])
+    db.get_user_by_id("amy")
+    db.update_user("amy", {"access": ["d1", "d2"]})
+
+    response = client.post("/auth/login", json={"user_id": "amy", "password": "secret"})
+
+    payload = decode_token(response.json["data"]["token"])
+    assert payload.perm_version == 1
+    assert payload.access == ["d1", "d2"]
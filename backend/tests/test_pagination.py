@@ -0,0 +1,112 @@
+"""Cursor encoding and paginated listings."""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from database.firestore import FirestoreDB
+
+
+def test_cursor_round_trip():
+    timestamp = datetime(2026, 3, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+    values = [timestamp, "name", 3, None, "doc-id"]
+
+    cursor = FirestoreDB._encode_cursor("events", values)
+
+    assert "=" not in cursor
+    assert FirestoreDB._decode_cursor("events", cursor, len(values)) == values
+
+
+@pytest.mark.parametrize("cursor, kind, length", [
+    (FirestoreDB._encode_cursor("users", ["a", "b"]), "events", 2),
+    (FirestoreDB._encode_cursor("events", ["a", "b"]), "events", 3),
+    ("not a cursor", "events", 2),
+    ("", "events", 2),
+])
+def test_decode_cursor_rejects_invalid(cursor, kind, length):
+    with pytest.raises(ValueError):
+        FirestoreDB._decode_cursor(kind, cursor, length)
+
+
+def collect_pages(get_page, limit):
+    """Follow next cursors to the end; returns every page."""
+    pages = []
+    cursor = None
+    while True:
+        items, cursor = get_page(limit=limit, cursor=cursor)
+        pages.append(items)
+        if cursor is None:
+            return pages
+
+
+def test_paginate_continues_after_cursor(db):
+    for i in range(7):
+        db.create_user(f"user{i}", f"User {i}", "hash", [])
+
+    pages = collect_pages(db.list_users_page, limit=3)
+
+    assert [len(page) for page in pages] == [3, 3, 1]
+    user_ids = [user["id"] for page in pages for user in page]
+    assert sorted(user_ids) == [f"user{i}" for i in range(7)]
+    assert len(set(user_ids)) == 7
+
+
+def test_paginate_exact_multiple_has_no_empty_last_page(db):
+    for i in range(6):
+        db.create_user(f"user{i}", f"User {i}", "hash", [])
+
+    pages = collect_pages(db.list_users_page, limit=3)
+
+    assert [len(page) for page in pages] == [3, 3]
+
+
+def test_paginate_rejects_cursor_of_another_listing(db):
+    db.create_user("user0", "User 0", "hash", [])
+    cursor = FirestoreDB._encode_cursor("events", [datetime.now(timezone.utc), "x"])
+
+    with pytest.raises(ValueError):
+        db.list_users_page(limit=1, cursor=cursor)
+
+
+def log_events_over_months(db, user_id, months):
+    """Log one event per day for the last `months` * 30 days."""
+    now = datetime.now(timezone.utc)
+    times = [now - timedelta(days=day) for day in range(months * 30)]
+    event_ids, errors = db.log_user_activity_batch(
+        user_id=user_id,
+        events=[{"event_type": "page_view", "session_id": "s1"} for _ in times],
+        received_at=times,
+    )
+    assert not errors
+    return dict(zip(event_ids, times))
+
+
+@pytest.mark.parametrize("limit", [1, 4, 30, 31, 200])
+def test_event_cursors_span_partitions(db, limit):
+    logged = log_events_over_months(db, "amy", months=4)
+    assert len(db._list_event_partitions("amy", use_cache=False)) > 1
+
+    pages = collect_pages(
+        lambda limit, cursor: db.get_user_events_page("amy", limit=limit, cursor=cursor),
+        limit,
+    )
+
+    events = [event for page in pages for event in page]
+    assert all(len(page) <= limit for page in pages)
+    assert [event["id"] for event in events] == sorted(logged, key=logged.get, reverse=True)
+
+
+def test_event_cursors_with_filters_and_time_range(db):
+    logged = log_events_over_months(db, "amy", months=3)
+    start = datetime.now(timezone.utc) - timedelta(days=45)
+
+    pages = collect_pages(
+        lambda limit, cursor: db.get_user_events_page(
+            "amy", limit=limit, cursor=cursor, session_id="s1", start_time=start,
+        ),
+        limit=7,
+    )
+
+    expected = [event_id for event_id, time in logged.items() if time >= start]
+    assert sorted(event["id"] for page in pages for event in page) == sorted(expected)
+
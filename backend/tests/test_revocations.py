@@ -0,0 +1,110 @@
+"""Token revocation list mirror."""
+
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from database.memory import MemoryClient
+from database.revocations import RevocationList
+
+
+def make_list(client, refresh_interval_seconds=10.0):
+    """Revocation list over a (memory) client."""
+    return RevocationList(
+        get_client=lambda: client,
+        collection="revoked_tokens",
+        refresh_interval_seconds=refresh_interval_seconds,
+    )
+
+
+def test_revoked_token_is_rejected():
+    revocations = make_list(MemoryClient())
+    issued_at = datetime.now(timezone.utc)
+
+    revocations.revoke_token("jti-1", "amy", issued_at + timedelta(hours=1))
+
+    assert revocations.is_revoked("jti-1", "amy", issued_at)
+    assert not revocations.is_revoked("jti-2", "amy", issued_at)
+    assert not revocations.is_revoked(None, "amy", issued_at)
+
+
+def test_user_revocation_covers_tokens_issued_before_it():
+    revocations = make_list(MemoryClient())
+    issued_before = datetime.now(timezone.utc) - timedelta(minutes=5)
+
+    revocations.revoke_user("amy", timedelta(hours=1))
+
+    assert revocations.is_revoked("jti-1", "amy", issued_before)
+    assert not revocations.is_revoked("jti-1", "amy", datetime.now(timezone.utc) + timedelta(seconds=2))
+    assert not revocations.is_revoked("jti-1", "bob", issued_before)
+
+
+def test_other_instance_loads_revocations():
+    client = MemoryClient()
+    issued_at = datetime.now(timezone.utc) - timedelta(minutes=1)
+    make_list(client).revoke_token("jti-1", "amy", issued_at + timedelta(hours=1))
+
+    other = make_list(client)
+
+    assert other.is_revoked("jti-1", "amy", issued_at)
+    assert other.refreshes == 1
+
+
+def test_refresh_pulls_new_revocations_and_drops_expired():
+    client = MemoryClient()
+    writer = make_list(client)
+    reader = make_list(client)
+    issued_at = datetime.now(timezone.utc) - timedelta(minutes=1)
+    reader.refresh()
+
+    writer.revoke_token("jti-1", "amy", issued_at + timedelta(hours=1))
+    writer.revoke_token("jti-2", "amy", datetime.now(timezone.utc) - timedelta(seconds=1))
+    reader.refresh()
+
+    assert "jti-1" in reader._tokens
+    assert "jti-2" not in reader._tokens
+
+
+def test_first_load_runs_once_for_concurrent_checks():
+    client = MemoryClient(latency_seconds=0.05)
+    revocations = make_list(client)
+    client.store.reset_stats()
+    issued_at = datetime.now(timezone.utc)
+
+    threads = [
+        threading.Thread(target=revocations.is_revoked, args=("jti", "amy", issued_at))
+        for _ in range(10)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert revocations.refreshes == 1
+    assert client.store.stats()["rpcs"] == {"query": 1}
+
+
+class UnavailableClient:
+    """Client whose every query fails."""
+
+    def __init__(self):
+        self.attempts = 0
+
+    def collection(self, name):
+        self.attempts += 1
+        raise RuntimeError("unavailable")
+
+
+def test_failed_first_load_is_not_retried_synchronously():
+    client = UnavailableClient()
+    revocations = make_list(client, refresh_interval_seconds=0.0)
+    issued_at = datetime.now(timezone.utc)
+
+    assert not revocations.is_revoked("jti", "amy", issued_at)
+    assert revocations.failed_refreshes == 1
+
+    # Later checks refresh in the background instead of waiting
+    started = time.monotonic()
+    for _ in range(5):
+        revocations.is_revoked("jti", "amy", issued_at)
+    assert time.monotonic() - started < 0.5
@@ -0,0 +1,102 @@
+"""Daily activity rollups and the date-range endpoints."""
+
+from datetime import datetime, timezone
+
+import pytest
+
+from auth import create_access_token
+
+
+def at(day, hour=12):
+    return datetime(2026, 3, day, hour, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def amy(db):
+    db.create_user("amy", "Amy", "hash", ["d1", "d2"])
+    events = [
+        ({"event_type": "session_start", "session_id": "s1"}, at(1)),
+        ({"event_type": "page_view", "demo_id": "d1", "session_id": "s1"}, at(1)),
+        ({"event_type": "chat_message_sent", "demo_id": "d1", "session_id": "s1"}, at(1)),
+        ({"event_type": "page_exit", "demo_id": "d1", "session_id": "s1", "data": {"duration_seconds": 30}}, at(1)),
+        ({"event_type": "demo_launched", "demo_id": "d2"}, at(2)),
+        ({"event_type": "page_view", "demo_id": "d2"}, at(4)),
+    ]
+    _, errors = db.log_user_activity_batch(
+        "amy", [event for event, _ in events], received_at=[time for _, time in events],
+    )
+    assert not errors
+    db.reset_rpc_stats()
+
+
+def auth_headers(user_id, is_admin=False):
+    return {"Authorization": f"Bearer {create_access_token(user_id, user_id, [], is_admin=is_admin)}"}
+
+
+def test_range_summary_sums_daily_rollups(db, amy):
+    summary = db.get_user_activity_range_summary("amy", "2026-03-01", "2026-03-03")
+
+    assert summary["totals"] == {
+        "events": 5, "sessions": 1, "time_seconds": 30,
+        "chat_messages": 1, "views": 1, "launches": 1,
+    }
+    assert [day["date"] for day in summary["days"]] == ["2026-03-01", "2026-03-02"]
+    assert summary["days"][0]["events"] == 4
+    assert summary["demos"]["d1"]["time_seconds"] == 30
+    assert summary["demos"]["d2"]["launches"] == 1
+    # One query for the range, however many events were logged
+    assert db.rpc_stats()["rpcs"] == {"query": 1}
+
+
+def test_range_summary_for_one_demo(db, amy):
+    summary = db.get_user_activity_range_summary("amy", "2026-03-01", "2026-03-31", demo_id="d2")
+
+    assert [day["date"] for day in summary["days"]] == ["2026-03-02", "2026-03-04"]
+    assert summary["totals"]["events"] == 2
+    assert summary["totals"]["views"] == 1
+    assert list(summary["demos"]) == ["d2"]
+
+
+def test_range_without_activity_is_empty(db, amy):
+    summary = db.get_user_activity_range_summary("amy", "2026-04-01", "2026-04-30")
+
+    assert summary["days"] == []
+    assert summary["totals"]["events"] == 0
+
+
+def test_my_daily_endpoint(client, amy):
+    response = client.get("/activity/me/daily?start=2026-03-02&end=2026-03-04", headers=auth_headers("amy"))
+
+    assert response.status_code == 200
+    assert response.json["data"]["totals"]["events"] == 2
+    assert response.json["data"]["start_date"] == "2026-03-02"
+
+
+def test_daily_endpoint_defaults_to_a_range_ending_today(client, amy):
+    response = client.get("/activity/me/daily", headers=auth_headers("amy"))
+
+    assert response.status_code == 200
+    assert response.json["data"]["end_date"] == datetime.now(timezone.utc).date().isoformat()
+
+
+@pytest.mark.parametrize("query", [
+    "start=2026-03-05&end=2026-03-01",
+    "start=2026-13-01",
+    "start=yesterday",
+    "start=2025-01-01&end=2026-03-01",
+])
+def test_daily_endpoint_rejects_invalid_ranges(client, amy, query):
+    response = client.get(f"/activity/me/daily?{query}", headers=auth_headers("amy"))
+
+    assert response.status_code == 400
+
+
+def test_admin_daily_endpoint(client, db, amy):
+    headers = auth_headers("admin", is_admin=True)
+
+    response = client.get("/admin/activity/amy/daily?start=2026-03-01&end=2026-03-31&demo_id=d1", headers=headers)
+    assert response.status_code == 200
+    assert response.json["data"]["totals"]["chat_messages"] == 1
+
+    assert client.get("/admin/activity/nobody/daily", headers=headers).status_code == 404
+    assert client.get("/admin/activity/amy/daily", headers=auth_headers("amy")).status_code == 403
@@ -0,0 +1,114 @@
+"""Route matching and dispatch through the `api` entry point."""
+
+import pytest
+
+from router import Router
+
+
+@pytest.fixture
+def router():
+    routes = Router()
+    routes.add_route("GET", "/demos", lambda request: "list demos")
+    routes.add_route("POST", "/demos", lambda request: "create demo")
+    routes.add_route("PUT", "/admin/users/<user_id>", lambda request: "update user")
+    routes.add_route("DELETE", "/admin/users/<user_id>", lambda request: "delete user")
+    routes.add_route("POST", "/admin/users/<user_id>/deactivate", lambda request: "deactivate user")
+    return routes
+
+
+@pytest.mark.parametrize("method, path, result, params", [
+    ("GET", "/demos", "list demos", {}),
+    ("post", "/demos/", "create demo", {}),
+    ("PUT", "/admin/users/amy", "update user", {"user_id": "amy"}),
+    ("DELETE", "admin/users/amy/", "delete user", {"user_id": "amy"}),
+    ("POST", "/admin/users/amy/deactivate", "deactivate user", {"user_id": "amy"}),
+])
+def test_match_by_method_and_path(router, method, path, result, params):
+    match = router.match(method, path)
+
+    assert match.handler(None) == result
+    assert match.path_params == params
+
+
+def test_unknown_path_does_not_match(router):
+    assert router.match("GET", "/nope") is None
+    assert router.match("PUT", "/admin/users/amy/extra/segments") is None
+
+
+def test_wrong_method_lists_allowed_methods(router):
+    match = router.match("PATCH", "/admin/users/amy")
+
+    assert match.handler is None
+    assert match.allowed_methods == ["DELETE", "PUT"]
+
+
+def test_options_matches_any_handler_of_the_path(router):
+    assert router.match("OPTIONS", "/demos").handler is not None
+    assert router.match("OPTIONS", "/admin/users/amy").path_params == {"user_id": "amy"}
+    assert router.match("OPTIONS", "/nope") is None
+
+
+def test_duplicate_route_is_rejected(router):
+    with pytest.raises(ValueError):
+        router.add_route("GET", "/demos/", lambda request: None)
+
+
+def test_middleware_wraps_handlers_in_registration_order():
+    routes = Router()
+    calls = []
+
+    @routes.use
+    def outer(request, handler):
+        calls.append("outer")
+        return handler(request)
+
+    @routes.use
+    def inner(request, handler):
+        calls.append("inner")
+        return handler(request)
+
+    @routes.route("GET", "/ping")
+    def ping(request):
+        calls.append("handler")
+        return "pong"
+
+    assert routes.match("GET", "/ping").handler(None) == "pong"
+    assert calls == ["outer", "inner", "handler"]
+
+
+def test_api_not_found(client):
+    response = client.get("/nope")
+
+    assert response.status_code == 404
+    assert response.json["success"] is False
+
+
+def test_api_method_not_allowed(client):
+    response = client.patch("/admin/users/amy")
+
+    assert response.status_code == 405
+    assert response.headers["Allow"] == "DELETE, PUT"
+
+
+def test_api_answers_preflight(client):
+    response = client.options("/admin/users/amy/reactivate")
+
+    assert response.status_code == 204
+    assert "OPTIONS" in response.headers["Access-Control-Allow-Methods"]
+
+
+def test_api_passes_path_params(client, db):
+    from auth import create_access_token
+
+    db.create_user("admin", "Admin", "hash", [], is_admin=True)
+    db.create_user("amy", "Amy", "hash", [])
+    token = create_access_token("admin", "Admin", [], is_admin=True)
+
+    response = client.put(
+        "/admin/users/amy",
+        json={"name": "Amy B"},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 200
+    assert db.get_user_by_id("amy")["name"] == "Amy B"
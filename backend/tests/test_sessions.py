@@ -0,0 +1,149 @@
+"""Session summaries: kept up to date on write, built once for older history."""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from auth import create_access_token
+
+
+NOW = datetime.now(timezone.utc)
+
+
+def log(db, session_id, *events, start=None):
+    """Log events a minute apart, starting at `start` (default: just now)."""
+    start = start or NOW - timedelta(minutes=len(events))
+    times = [start + timedelta(minutes=i) for i in range(len(events))]
+    _, errors = db.log_user_activity_batch(
+        "amy",
+        [{"session_id": session_id, **event} for event in events],
+        received_at=times,
+    )
+    assert not errors
+
+
+def forget_sessions(db, user_id):
+    """Drop the summaries, as for history logged before they were kept."""
+    for doc in db._get_user_sessions_ref(user_id).stream():
+        doc.reference.delete()
+    db._get_user_activity_ref(user_id).update({"sessions_built_at": None})
+    db._activity_summary_cache.clear()
+
+
+@pytest.fixture
+def amy(db):
+    # As the create-user endpoint does
+    db.create_user("amy", "Amy", "hash", [])
+    db.initialize_user_activity("amy", "Amy")
+    # Ended an hour ago
+    log(
+        db, "s1",
+        {"event_type": "session_start"},
+        {"event_type": "page_view", "demo_id": "d1"},
+        {"event_type": "chat_message_sent", "demo_id": "d1"},
+        {"event_type": "session_end", "data": {"duration_seconds": 90}},
+        start=NOW - timedelta(hours=1),
+    )
+    # Still open
+    log(
+        db, "s2",
+        {"event_type": "session_start"},
+        {"event_type": "page_view", "demo_id": "d2"},
+    )
+
+
+def by_id(sessions):
+    return {session["session_id"]: session for session in sessions}
+
+
+def test_summaries_are_kept_on_write(db, amy):
+    db.get_user_activity_summary("amy")
+    db.reset_rpc_stats()
+
+    sessions = db.get_user_sessions("amy")
+
+    assert [session["session_id"] for session in sessions] == ["s2", "s1"]
+    assert db.rpc_stats()["rpcs"] == {"query": 1}
+
+    s1, s2 = by_id(sessions)["s1"], by_id(sessions)["s2"]
+    assert (s1["events"], s1["page_views"], s1["chat_messages"]) == (4, 1, 1)
+    assert s1["duration_seconds"] == 90
+    assert s1["demos"] == ["d1"]
+    assert s1["is_open"] is False
+    assert s2["is_open"] is True
+    assert s2["duration_seconds"] == 60
+
+
+def test_idle_session_is_closed(db):
+    log(db, "s1", {"event_type": "session_start"}, start=NOW - timedelta(hours=2))
+
+    (session,) = db.get_user_sessions("amy")
+
+    assert session["is_open"] is False
+    assert session["ended_at"] is None
+
+
+def test_summaries_are_built_once_for_older_history(db, amy):
+    expected = by_id(db.get_user_sessions("amy"))
+    forget_sessions(db, "amy")
+
+    built = by_id(db.get_user_sessions("amy"))
+
+    assert built.keys() == expected.keys()
+    for session_id, session in built.items():
+        for name in ["events", "page_views", "chat_messages", "demos", "is_open", "duration_seconds"]:
+            assert session[name] == expected[session_id][name]
+    assert db.get_user_activity_summary("amy")["sessions_built_at"] is not None
+
+    db.reset_rpc_stats()
+    db.get_user_sessions("amy")
+    assert db.rpc_stats()["rpcs"] == {"query": 1}
+
+
+def test_build_skips_unusable_session_ids(db, amy):
+    partition_id = db._event_partition_id(NOW)
+    db._get_user_events_ref("amy", partition_id).document("old").set({
+        "event_type": "page_view",
+        "session_id": "a/b",
+        "timestamp": NOW - timedelta(minutes=5),
+    })
+    forget_sessions(db, "amy")
+
+    assert sorted(by_id(db.get_user_sessions("amy"))) == ["s1", "s2"]
+
+
+def test_build_rescans_open_session_written_during_scan(db, amy, monkeypatch):
+    forget_sessions(db, "amy")
+    # The open session's summary exists, its events are incremented into it
+    log(db, "s2", {"event_type": "page_view", "demo_id": "d2"}, start=NOW - timedelta(seconds=30))
+    scan = db._scan_sessions
+    scans = []
+
+    def scan_with_concurrent_event(user_id):
+        sessions = scan(user_id)
+        if not scans:
+            # Another request logs an event after the scan read the events
+            log(db, "s2", {"event_type": "page_view"}, start=NOW - timedelta(seconds=10))
+        scans.append(sorted(sessions))
+        return sessions
+
+    monkeypatch.setattr(db, "_scan_sessions", scan_with_concurrent_event)
+
+    db.build_user_sessions("amy")
+
+    # Only the open session whose precondition failed is scanned again
+    assert scans == [["s1", "s2"], ["s1", "s2"]]
+    s2 = by_id(db.get_user_sessions("amy"))["s2"]
+    assert s2["events"] == 4
+    assert s2["page_views"] == 3
+
+
+def test_sessions_endpoint(client, db, amy):
+    headers = {"Authorization": f"Bearer {create_access_token('admin', 'Admin', [], is_admin=True)}"}
+
+    response = client.get("/admin/activity/amy/sessions?limit=1", headers=headers)
+
+    assert response.status_code == 200
+    assert response.json["data"]["count"] == 1
+    assert response.json["data"]["sessions"][0]["session_id"] == "s2"
+    assert client.get("/admin/activity/nobody/sessions", headers=headers).status_code == 404
@@ -0,0 +1,120 @@
+"""Per-instance TTL cache and the user records kept in it."""
+
+from cache import TTLCache
+from database.memory import InMemoryFirestoreDB
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = TTLCache(ttl_seconds=10, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl_seconds=30)
+
+    clock.now = 10
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_cached_values_are_copies():
+    cache = TTLCache()
+    value = {"access": ["d1"]}
+    cache.set("amy", value)
+
+    value["access"].append("d2")
+    cache.get("amy")["access"].append("d3")
+
+    assert cache.get("amy") == {"access": ["d1"]}
+
+
+def test_update_applies_to_live_entries_only():
+    clock = FakeClock()
+    cache = TTLCache(ttl_seconds=10, clock=clock)
+    cache.set("amy", {"name": "Amy"})
+
+    assert cache.update("amy", {"name": "Amy B"}) is True
+    assert cache.get("amy") == {"name": "Amy B"}
+    assert cache.update("bob", {"name": "Bob"}) is False
+
+    clock.now = 10
+    assert cache.update("amy", {"name": "Amy C"}) is False
+    assert cache.get("amy") is None
+
+
+def test_zero_ttl_disables_the_cache():
+    cache = TTLCache(ttl_seconds=0)
+    cache.set("a", 1)
+
+    assert not cache.enabled
+    assert cache.get("a") is None
+
+
+def test_user_reads_are_served_from_cache(db):
+    db.create_user("amy", "Amy", "hash", [])
+    db.reset_rpc_stats()
+
+    # Written through on create
+    assert db.get_user_by_id("amy")["name"] == "Amy"
+    assert db.rpc_stats()["total_rpcs"] == 0
+
+    db.get_user_by_id("amy", use_cache=False)
+    assert db.rpc_stats()["rpcs"] == {"get": 1}
+
+
+def test_missing_users_are_not_cached(db):
+    assert db.get_user_by_id("nobody") is None
+    assert db.get_user_by_id("nobody") is None
+    assert db.rpc_stats()["rpcs"] == {"get": 2}
+
+
+def test_last_login_is_written_through(db):
+    db.create_user("amy", "Amy", "hash", [])
+    db.reset_rpc_stats()
+
+    db.update_last_login("amy")
+
+    assert db.get_user_by_id("amy")["last_login"] is not None
+    assert db.rpc_stats()["rpcs"] == {"update": 1}
+
+
+def test_deactivation_drops_cached_record(db):
+    db.create_user("amy", "Amy", "hash", [])
+
+    db.deactivate_user("amy")
+    db.reset_rpc_stats()
+
+    assert db.get_user_by_id("amy")["is_active"] is False
+    assert db.rpc_stats()["rpcs"] == {"get": 1}
+
+
+def test_user_cache_can_be_disabled():
+    db = InMemoryFirestoreDB(user_cache_ttl_seconds=0)
+    db.create_user("amy", "Amy", "hash", [])
+    db.reset_rpc_stats()
+
+    db.get_user_by_id("amy")
+
+    assert db.rpc_stats()["rpcs"] == {"get": 1}
+    assert db.user_cache_stats()["size"] == 0
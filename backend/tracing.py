@@ -0,0 +1,183 @@
+"""
+Lightweight per-request tracing of hot-path operations.
+
+Code marks its expensive steps with `span(name)` or `@traced(name)`. While a
+request trace is active, span durations are aggregated by name; otherwise a
+span costs one context-variable lookup.
+
+Spans are grouped by the prefix of their name (`firestore.get_user_by_id` is
+in group `firestore`). A span opened inside another span of the same group
+is not recorded, so nested calls are not counted twice, and a call served
+from a cache calls `discard_span()` so it is not reported as backend time.
+
+A finished trace can be rendered as a `Server-Timing` header and/or written
+as one structured (JSON) log line per request, controlled by:
+    SERVER_TIMING=true   add Server-Timing to responses
+    TRACE_LOG=true       log each request's spans to stdout
+
+Usage:
+    from tracing import span, traced
+
+    with span("bcrypt.verify"):
+        ...
+
+    @traced("firestore.get_user_by_id")
+    def get_user_by_id(self, user_id): ...
+"""
+
+import json
+import os
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Dict, Iterator, List, Optional
+
+
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING", "false").lower() == "true"
+TRACE_LOG_ENABLED = os.getenv("TRACE_LOG", "false").lower() == "true"
+
+
+class Trace:
+    """Span timings collected for one request."""
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.started_at = time.perf_counter()
+        # name -> [count, total seconds], in first-seen order
+        self.spans: Dict[str, List[float]] = {}
+        # Open spans, innermost last: [name, group, recorded]
+        self._open: List[list] = []
+
+    def enter(self, name: str) -> list:
+        """Open a span; it is recorded only if no span of its group is open."""
+        group = name.split(".", 1)[0]
+        frame = [name, group, all(open_frame[1] != group for open_frame in self._open)]
+        self._open.append(frame)
+        return frame
+
+    def exit(self, frame: list, seconds: float) -> None:
+        """Close a span opened by enter()."""
+        self._open.remove(frame)
+        if frame[2]:
+            self.add(frame[0], seconds)
+
+    def discard(self) -> None:
+        """Do not record the innermost open span."""
+        if self._open:
+            self._open[-1][2] = False
+
+    def add(self, name: str, seconds: float) -> None:
+        entry = self.spans.get(name)
+        if entry is None:
+            self.spans[name] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+
+    @property
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started_at) * 1000
+
+    def server_timing(self) -> str:
+        """Render spans as a Server-Timing header value (durations in ms)."""
+        metrics = [
+            f'{_metric_name(name)};dur={total * 1000:.2f};desc="{name} x{int(count)}"'
+            for name, (count, total) in self.spans.items()
+        ]
+        metrics.append(f"total;dur={self.elapsed_ms:.2f}")
+        return ", ".join(metrics)
+
+    def log(self, **fields) -> None:
+        """Write the trace as one structured log line (Cloud Logging JSON format)."""
+        entry = {
+            "severity": "INFO",
+            "message": "request trace",
+            "request_id": self.request_id,
+            **fields,
+            "duration_ms": round(self.elapsed_ms, 2),
+            "spans": {
+                name: {"count": int(count), "ms": round(total * 1000, 2)}
+                for name, (count, total) in self.spans.items()
+            },
+        }
+        sys.stdout.write(json.dumps(entry, default=str) + "\n")
+        sys.stdout.flush()
+
+
+_current: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+
+
+def _metric_name(name: str) -> str:
+    """Server-Timing metric names are tokens: no dots, spaces or quotes."""
+    return "".join(c if c.isalnum() or c in "-_" else "_" for c in name)
+
+
+def tracing_enabled() -> bool:
+    """Whether requests should be traced at all."""
+    return SERVER_TIMING_ENABLED or TRACE_LOG_ENABLED
+
+
+def start_trace(request_id: Optional[str] = None) -> Trace:
+    """Begin collecting spans for the current request."""
+    trace = Trace(request_id or uuid.uuid4().hex)
+    _current.set(trace)
+    return trace
+
+
+def end_trace() -> Optional[Trace]:
+    """Stop collecting spans and return the finished trace."""
+    trace = _current.get()
+    _current.set(None)
+    return trace
+
+
+def current_trace() -> Optional[Trace]:
+    """Get the active trace, if any."""
+    return _current.get()
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time a block under `name` in the active trace (no-op without one)."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+
+    frame = trace.enter(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.exit(frame, time.perf_counter() - started)
+
+
+def discard_span() -> None:
+    """Leave the innermost open span out of the trace (e.g. a cache hit)."""
+    trace = _current.get()
+    if trace is not None:
+        trace.discard()
+
+
+def traced(name: str) -> Callable[[Callable], Callable]:
+    """Decorator timing every call of a function as span `name`."""
+    def decorator(fn: Callable) -> Callable:
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            trace = _current.get()
+            if trace is None:
+                return fn(*args, **kwargs)
+
+            frame = trace.enter(name)
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                trace.exit(frame, time.perf_counter() - started)
+
+        return wrapper
+
+    return decorator